@@ -1,6 +1,7 @@
 import streamlit as st
-from core.config import get_google_api_key, hide_streamlit_style
+from core.config import get_google_api_key, hide_streamlit_style, LLM_CACHE_ARQUIVO, LLM_CACHE_MAX_BYTES
 from core.embeddings import init_embeddings
+from core.llm_cache import ativar_cache_llm
 from core.locale import TRANSLATIONS  # Importa o novo arquivo de traduções
 from ui.sidebar import render_sidebar
 from ui.tabs.chat_tab import render_chat_tab
@@ -32,6 +33,8 @@ st.session_state['lang'] = lang_map[selected_lang_label]
 texts = TRANSLATIONS[st.session_state['lang']] # Carrega os textos do idioma selecionado
 
 # --- INICIALIZAÇÃO E RENDERIZAÇÃO ---
+# Respostas do LLM ficam em cache no disco, reaproveitadas por todas as sessões e processos
+ativar_cache_llm(LLM_CACHE_ARQUIVO, LLM_CACHE_MAX_BYTES)
 hide_streamlit_style()
 st.title(texts["app_title"])
 
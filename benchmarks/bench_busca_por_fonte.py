@@ -0,0 +1,70 @@
+"""
+Benchmark da busca restrita a um arquivo (core/vector_index.py).
+
+Compara o filtro do LangChain (vizinhos globais filtrados em Python, fetch_k=20)
+com a busca pelo mapa de fontes, em coleções de 10, 100 e 1000 documentos.
+Mede a latência média e quantos dos k fragmentos esperados cada busca devolve.
+
+Uso: python -m benchmarks.bench_busca_por_fonte --fragmentos 20 --dim 256 --consultas 50
+"""
+import argparse
+import time
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from core.vector_index import buscar_na_fonte, obter_mapa_fontes
+
+
+class EmbeddingsSemUso(Embeddings):
+    """As buscas usam vetores prontos; o modelo nunca é chamado."""
+
+    def embed_documents(self, textos):
+        raise NotImplementedError
+
+    def embed_query(self, texto):
+        raise NotImplementedError
+
+
+def montar_colecao(n_docs, fragmentos, dim, rng):
+    vetores = rng.standard_normal((n_docs * fragmentos, dim)).astype(np.float32)
+    textos = [f"doc{d}-frag{f}" for d in range(n_docs) for f in range(fragmentos)]
+    metadados = [{"source": f"doc{d}.pdf"} for d in range(n_docs) for _ in range(fragmentos)]
+    vs = FAISS.from_embeddings(zip(textos, vetores.tolist()), EmbeddingsSemUso(), metadatas=metadados)
+    return vs, vetores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fragmentos", type=int, default=20, help="fragmentos por documento")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'docs':>6} {'filtro LC (ms)':>15} {'acertos LC':>11} {'mapa (ms)':>10} {'acertos mapa':>13}")
+    for n_docs in (10, 100, 1000):
+        vs, vetores = montar_colecao(n_docs, args.fragmentos, args.dim, rng)
+        obter_mapa_fontes(vs)  # montado uma vez, como numa coleção já carregada
+        tempo_lc = tempo_mapa = acertos_lc = acertos_mapa = 0
+        for _ in range(args.consultas):
+            fonte = f"doc{rng.integers(n_docs)}.pdf"
+            consulta = rng.standard_normal(args.dim).astype(np.float32)
+
+            inicio = time.perf_counter()
+            docs = vs.similarity_search_by_vector(consulta.tolist(), k=args.k, filter={"source": fonte})
+            tempo_lc += time.perf_counter() - inicio
+            acertos_lc += len(docs)
+
+            inicio = time.perf_counter()
+            resultado = buscar_na_fonte(vs, consulta, fonte, args.k)
+            tempo_mapa += time.perf_counter() - inicio
+            acertos_mapa += len(resultado)
+
+        total = args.consultas * args.k
+        print(f"{n_docs:>6} {tempo_lc / args.consultas * 1000:>15.3f} {acertos_lc / total:>11.0%} "
+              f"{tempo_mapa / args.consultas * 1000:>10.3f} {acertos_mapa / total:>13.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark da abertura de coleções salvas (services/collections.py).
+
+Compara o formato antigo (FAISS.load_local: índice lido inteiro e docstore em pickle)
+com o formato atual (índice mapeado em memória e docstore SQLite lido sob demanda),
+medindo o tempo de abertura e o de uma primeira busca com leitura dos fragmentos.
+O padrão fica abaixo de FAISS_MIN_VETORES_APROXIMADO, onde a coleção é gravada com índice plano
+(o caso mais comum); com mais fragmentos ela passa a IVF.
+
+Uso: python -m benchmarks.bench_carregar_colecao --fragmentos 20000 --dim 768
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+import services.collections as colecoes
+from core.config import FAISS_MIN_VETORES_APROXIMADO
+
+
+class EmbeddingsSemUso(Embeddings):
+    def embed_documents(self, textos):
+        raise NotImplementedError
+
+    def embed_query(self, texto):
+        raise NotImplementedError
+
+
+def arquivo_mapeado(caminho: Path) -> str:
+    """Se o arquivo aparece entre os mapeamentos de memória do processo (só no Linux)."""
+    if not os.path.exists("/proc/self/maps"):
+        return "?"
+    with open("/proc/self/maps") as f:
+        return "sim" if str(caminho) in f.read() else "não"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fragmentos", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vetores = rng.standard_normal((args.fragmentos, args.dim)).astype(np.float32)
+    textos = [f"Fragmento {i}. " + "Texto de cláusula contratual. " * 40 for i in range(args.fragmentos)]
+    metadados = [{"source": f"contrato_{i // 50}.pdf", "page": i % 50} for i in range(args.fragmentos)]
+    vs = FAISS.from_embeddings(zip(textos, vetores.tolist()), EmbeddingsSemUso(), metadatas=metadados)
+    consulta = rng.standard_normal(args.dim).astype(np.float32).tolist()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        diretorio = Path(diretorio)
+        vs.save_local(str(diretorio / "antigo"))
+        with mock.patch.object(colecoes, "COLECOES_DIR", diretorio), mock.patch.object(colecoes, "st"):
+            colecoes.salvar_colecao_atual("atual", vs, [])
+
+        inicio = time.perf_counter()
+        antigo = FAISS.load_local(str(diretorio / "antigo"), EmbeddingsSemUso(), allow_dangerous_deserialization=True)
+        abertura_antigo = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        antigo.similarity_search_by_vector(consulta, k=5)
+        busca_antigo = time.perf_counter() - inicio
+
+        manifesto = colecoes._ler_manifesto(diretorio / "atual")
+        inicio = time.perf_counter()
+        atual = colecoes._abrir_vector_store(diretorio / "atual" / manifesto["base"], EmbeddingsSemUso())
+        abertura_atual = time.perf_counter() - inicio
+        mapeado = arquivo_mapeado(diretorio / "atual" / manifesto["base"] / "index.faiss")
+        inicio = time.perf_counter()
+        atual.similarity_search_by_vector(consulta, k=5)
+        busca_atual = time.perf_counter() - inicio
+
+    print(f"{args.fragmentos} fragmentos (índice aproximado a partir de {FAISS_MIN_VETORES_APROXIMADO}), "
+          f"índice gravado: {manifesto['indice']['fabrica']}, mapeado em memória: {mapeado}")
+    print(f"{'formato':<30} {'abertura (ms)':>14} {'1ª busca (ms)':>14}")
+    print(f"{'pickle + índice em RAM':<30} {abertura_antigo * 1000:>14.1f} {busca_antigo * 1000:>14.1f}")
+    print(f"{'SQLite + índice mmap':<30} {abertura_atual * 1000:>14.1f} {busca_atual * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark da deduplicação de fragmentos na ingestão (core/dedup.py).
+
+Gera uma carteira sintética de contratos de fornecedores em que cada contrato tem cláusulas
+próprias e as mesmas cláusulas padrão (confidencialidade, LGPD, foro), algumas com pequenas
+variações de redação. Mede quantos fragmentos deixam de ir para o modelo de embeddings e
+para o índice, e o tempo da deduplicação. A cláusula de qualificação muda só o nome da
+contratada; fragmentos de empresas diferentes nunca podem ser juntados.
+
+Uso: python -m benchmarks.bench_deduplicacao --contratos 200 --proprias 20
+"""
+import argparse
+import random
+import time
+from langchain_core.documents import Document
+from core.dedup import deduplicar_documentos
+
+PADRAO = [
+    "CLÁUSULA DE CONFIDENCIALIDADE. As partes obrigam-se a manter em sigilo todas as informações técnicas, "
+    "comerciais e financeiras a que tiverem acesso em razão deste contrato, durante sua vigência e por 5 anos após "
+    "o seu término, respondendo por perdas e danos decorrentes da divulgação indevida a terceiros.",
+    "CLÁUSULA DE PROTEÇÃO DE DADOS. A CONTRATADA tratará os dados pessoais recebidos exclusivamente para a execução "
+    "do objeto contratual, em conformidade com a Lei nº 13.709/2018 (LGPD), adotando medidas de segurança técnicas e "
+    "administrativas aptas a proteger os dados de acessos não autorizados e de situações acidentais ou ilícitas.",
+    "CLÁUSULA DE FORO. Fica eleito o foro da Comarca de São Paulo, Estado de São Paulo, para dirimir quaisquer "
+    "questões oriundas do presente contrato, com renúncia expressa a qualquer outro, por mais privilegiado que seja.",
+]
+QUALIFICACAO = (
+    "CLÁUSULA DE QUALIFICAÇÃO. São partes deste contrato a empresa contratante, qualificada no preâmbulo, e a "
+    "contratada abaixo, que declara ter poderes para assinar o presente instrumento e cumprir todas as obrigações "
+    "nele previstas, inclusive as de sigilo e de proteção de dados. Contratada: {empresa}. As partes obrigam-se a "
+    "manter em sigilo todas as informações técnicas, comerciais e financeiras a que tiverem acesso em razão deste "
+    "contrato, durante sua vigência e por 5 anos após o seu término, respondendo por perdas e danos decorrentes "
+    "da divulgação indevida a terceiros."
+)
+EMPRESAS = [
+    "Alfa Comércio Ltda", "Beta Indústria SA", "Gama Serviços Eireli", "Delta Logística Ltda", "Ômega Tecnologia SA",
+    "Sigma Engenharia Ltda", "Kappa Alimentos SA", "Lambda Transportes Ltda", "Zeta Construções SA", "Teta Consultoria Ltda",
+]
+VARIACOES = [("obrigam-se a manter", "se obrigam a manter"), ("Fica eleito", "Elegem as partes"), ("exclusivamente", "unicamente")]
+
+
+def gerar_carteira(contratos: int, proprias: int, rng: random.Random):
+    documentos, empresas = [], {}
+    for c in range(contratos):
+        nome = f"fornecedor_{c}.pdf"
+        empresas[nome] = rng.choice(EMPRESAS)
+        documentos.append(Document(page_content=QUALIFICACAO.format(empresa=empresas[nome]), metadata={"source": nome, "page": 0}))
+        for p in range(proprias):
+            texto = (f"CLÁUSULA {p + 1}. O fornecedor {c} entregará o item {rng.randint(1, 10 ** 6)} no prazo de "
+                     f"{rng.randint(5, 90)} dias, ao preço unitário de R$ {rng.randint(100, 99999)},00, conforme a "
+                     f"proposta {rng.randint(1, 10 ** 5)} e o cronograma do anexo {p}.")
+            documentos.append(Document(page_content=texto, metadata={"source": nome, "page": p}))
+        for i, texto in enumerate(PADRAO):
+            if rng.random() < 0.3:
+                antes, depois = rng.choice(VARIACOES)
+                texto = texto.replace(antes, depois)
+            if rng.random() < 0.3:
+                texto = texto.replace(" ", "  ", 3)  # diferença de diagramação
+            documentos.append(Document(page_content=texto, metadata={"source": nome, "page": proprias + i}))
+    return documentos, empresas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contratos", type=int, default=200)
+    parser.add_argument("--proprias", type=int, default=20, help="cláusulas próprias por contrato")
+    args = parser.parse_args()
+
+    documentos, empresas = gerar_carteira(args.contratos, args.proprias, random.Random(0))
+    inicio = time.perf_counter()
+    unicos = deduplicar_documentos(documentos)
+    tempo = time.perf_counter() - inicio
+
+    caracteres = sum(len(d.page_content) for d in documentos)
+    caracteres_unicos = sum(len(d.page_content) for d in unicos)
+    referencias = max(len(d.metadata.get("referencias", [None])) for d in unicos)
+    print(f"fragmentos: {len(documentos)} -> {len(unicos)} ({1 - len(unicos) / len(documentos):.1%} a menos)")
+    print(f"caracteres enviados ao modelo de embeddings: {caracteres} -> {caracteres_unicos} "
+          f"({1 - caracteres_unicos / caracteres:.1%} a menos)")
+    print(f"maior número de referências de um fragmento: {referencias}")
+    juntados_indevidamente = sum(
+        1 for d in unicos
+        if d.page_content.startswith("CLÁUSULA DE QUALIFICAÇÃO")
+        and len({empresas[r["source"]] for r in d.metadata.get("referencias", [d.metadata])}) > 1
+    )
+    print(f"qualificações de empresas diferentes juntadas: {juntados_indevidamente}")
+    print(f"tempo: {tempo * 1000:.0f} ms ({len(documentos) / tempo:.0f} fragmentos/s)")
+
+
+if __name__ == "__main__":
+    main()
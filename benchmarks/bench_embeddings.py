@@ -0,0 +1,97 @@
+"""
+Benchmark da etapa de embeddings em lotes (core/embedding_batches.py).
+
+Um modelo de embeddings falso imita a API: latência fixa por requisição mais um custo por
+texto, e uma fração das requisições falha com erro transitório (503). Compara o fluxo antigo
+(`FAISS.from_documents`, uma chamada com todos os fragmentos e sem retentativa) com lotes de
+tamanhos e concorrências diferentes, medindo vazão, requisições repetidas e pico de memória.
+
+Uso: python -m benchmarks.bench_embeddings --fragmentos 5000 --latencia 0.2 --falhas 0.05
+"""
+import argparse
+import random
+import threading
+import time
+import tracemalloc
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from core.concurrency import LimitadorTaxa
+from core.embedding_batches import indexar_documentos_em_lotes
+
+
+class EmbeddingsFalsos(Embeddings):
+    """Vetores aleatórios com latência de rede simulada e falhas transitórias."""
+
+    def __init__(self, dim: int, latencia: float, por_texto: float, taxa_falhas: float):
+        self.dim, self.latencia, self.por_texto, self.taxa_falhas = dim, latencia, por_texto, taxa_falhas
+        self.requisicoes = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    def embed_documents(self, textos):
+        with self._lock:
+            self.requisicoes += 1
+            falhou = self._rng.random() < self.taxa_falhas
+            self.falhas += falhou
+        time.sleep(self.latencia + self.por_texto * len(textos))
+        if falhou:
+            raise RuntimeError("Error embedding content: 503 Service Unavailable")
+        return np.random.default_rng(len(textos)).standard_normal((len(textos), self.dim)).astype(np.float32).tolist()
+
+    def embed_query(self, texto):
+        return self.embed_documents([texto])[0]
+
+
+def medir(rotulo, funcao, modelo, total):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        vector_store = funcao()
+        resultado = f"{vector_store.index.ntotal} vetores"
+    except Exception as e:
+        resultado = f"falhou ({e})"
+    tempo = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    print(f"{rotulo:<26} {tempo:>9.2f} {total / tempo:>12.0f} {modelo.requisicoes:>8} {modelo.falhas:>7} {pico:>10.1f}  {resultado}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fragmentos", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos por requisição")
+    parser.add_argument("--por-texto", type=float, default=0.002, help="segundos adicionais por texto")
+    parser.add_argument("--falhas", type=float, default=0.05, help="fração de requisições com erro transitório")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[25, 50, 100])
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    documentos = [
+        Document(page_content=f"Fragmento {i}: cláusula de reajuste pelo IPCA. " * 20, metadata={"source": f"c{i // 100}.pdf"})
+        for i in range(args.fragmentos)
+    ]
+    # Sem limite de taxa efetivo: o benchmark mede só lotes e concorrência
+    limitador = LimitadorTaxa(1e6)
+
+    def novo_modelo():
+        return EmbeddingsFalsos(args.dim, args.latencia, args.por_texto, args.falhas)
+
+    print(f"{'modo':<26} {'tempo (s)':>9} {'fragmentos/s':>12} {'requis.':>8} {'falhas':>7} {'pico (MB)':>10}")
+    modelo = novo_modelo()
+    medir("from_documents (antigo)", lambda: FAISS.from_documents(documentos, modelo), modelo, args.fragmentos)
+    for tamanho in args.lotes:
+        for workers in args.concorrencia:
+            modelo = novo_modelo()
+            medir(
+                f"lote {tamanho}, {workers} em voo",
+                lambda: indexar_documentos_em_lotes(documentos, modelo, tamanho, max_workers=workers, limitador=limitador),
+                modelo, args.fragmentos,
+            )
+
+
+if __name__ == "__main__":
+    main()
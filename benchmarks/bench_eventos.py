@@ -0,0 +1,80 @@
+"""
+Benchmark offline da extração de prazos em paralelo (services/events.py), pelo motor do LLM.
+
+Um LLM falso com latência injetada devolve erros 429 quando recebe mais
+requisições por segundo do que o limite simulado, imitando a cota da API.
+
+Uso: python -m benchmarks.bench_eventos --docs 50 --latencia 0.4 --limite-rps 8 --workers 8
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+from core.llm_engine import MotorLLM
+from core.model_router import modelo_da_tarefa
+from services.events import processar_eventos_em_paralelo
+
+
+class LLMFalsoComCota(Runnable):
+    """Responde com um evento fixo e rejeita chamadas acima de `limite_rps`."""
+
+    def __init__(self, latencia: float, limite_rps: float):
+        self.latencia = latencia
+        self.limite_rps = limite_rps
+        self.chamadas = 0
+        self.rejeitadas = 0
+        self._janela = deque()
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt, config=None, **kwargs):
+        with self._lock:
+            agora = time.monotonic()
+            while self._janela and agora - self._janela[0] > 1.0:
+                self._janela.popleft()
+            if len(self._janela) >= self.limite_rps:
+                self.rejeitadas += 1
+                raise RuntimeError("429 Resource exhausted (simulado)")
+            self._janela.append(agora)
+            self.chamadas += 1
+        time.sleep(self.latencia)
+        resposta = {
+            "eventos": [{"descricao_evento": "Vencimento", "data_evento_str": "2026-01-31", "trecho_relevante": "..."}],
+            "arquivo_fonte": "contrato.pdf",
+        }
+        return AIMessage(content=json.dumps(resposta))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--latencia", type=float, default=0.4)
+    parser.add_argument("--limite-rps", type=float, default=8)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=900, help="taxa inicial do limitador, acima da cota simulada")
+    args = parser.parse_args()
+
+    docs = [{"nome": f"contrato_{i:03d}.pdf", "texto": "Vigência até 31/01/2026."} for i in range(args.docs)]
+
+    # Fluxo antigo: uma chamada por vez seguida de sleep fixo de 1.2s
+    estimado_sequencial = args.docs * (args.latencia + 1.2)
+
+    llm = LLMFalsoComCota(args.latencia, args.limite_rps)
+    motor = MotorLLM(max_concorrencia=args.workers, max_por_modelo=args.workers, requisicoes_por_minuto=args.rpm, vagas_interativas=0)
+    inicio = time.perf_counter()
+    eventos, erros = processar_eventos_em_paralelo(docs, lambda modelo: llm, "pt", motor=motor)
+    decorrido = time.perf_counter() - inicio
+
+    assert [e["Arquivo"] for e in eventos] == [d["nome"] for d in docs], "ordem de saída diferente da entrada"
+    print(f"documentos: {args.docs}  latência: {args.latencia}s  cota simulada: {args.limite_rps} req/s  workers: {args.workers}")
+    print(f"sequencial (estimado): {estimado_sequencial:.1f}s")
+    print(f"paralelo adaptativo:   {decorrido:.1f}s  ({estimado_sequencial / decorrido:.1f}x)  "
+          f"vazão: {args.docs / decorrido:.1f} docs/s")
+    print(f"429 simulados: {llm.rejeitadas}  erros finais: {len(erros)}  "
+          f"taxa final do limitador: {motor.estado()['requisicoes_por_minuto'][modelo_da_tarefa('eventos')]:.0f} req/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark da leitura da camada de texto dos PDFs (services/pdf_text.py).
+
+Gera um corpus sintético de contratos e compara o fluxo antigo (um arquivo por vez,
+gravado em disco e lido pelo caminho do arquivo) com a leitura em memória, sequencial
+e num pool com diferentes números de processos. A escala esperada é quase linear
+até o número de núcleos da máquina.
+
+Antes das medições, confere que os processos do pool não executam de novo o script principal
+quando `__main__` é como o do `streamlit run` (com `__file__` e sem `__spec__`).
+
+Uso: python -m benchmarks.bench_extracao_pdf --arquivos 64 --paginas 30 --processos 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+import fitz
+from services.pdf_text import extrair_paginas_pdf, iterar_paginas_em_paralelo
+
+CLAUSULA = (
+    "CLÁUSULA {n} - O CONTRATANTE pagará à CONTRATADA o valor mensal de R$ {valor},00, "
+    "reajustado anualmente pelo IPCA, mediante apresentação de nota fiscal até o quinto dia útil. "
+)
+
+
+def gerar_pdf(paginas: int, semente: int) -> bytes:
+    doc = fitz.open()
+    for num in range(paginas):
+        texto = "".join(CLAUSULA.format(n=num * 10 + i, valor=semente * 100 + i) for i in range(10))
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), texto, fontsize=9)
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def extrair_com_arquivo_temporario(pdf_bytes: bytes, diretorio: Path) -> int:
+    # Fluxo antigo: cada upload era gravado em disco antes de ser aberto pelo caminho
+    caminho = diretorio / "temp_contrato.pdf"
+    caminho.write_bytes(pdf_bytes)
+    try:
+        doc = fitz.open(str(caminho))
+        paginas = sum(1 for pagina in doc if pagina.get_text("text").strip())
+        doc.close()
+        return paginas
+    finally:
+        os.remove(caminho)
+
+
+def verificar_main_do_streamlit():
+    """Sobe um pool com um `__main__` falso, como o do Streamlit, e falha se algum filho executar o script."""
+    with tempfile.TemporaryDirectory() as diretorio:
+        marcador = Path(diretorio) / "script_executado"
+        script = Path(diretorio) / "app.py"
+        script.write_text(f"open({str(marcador)!r}, 'a').write('x')\n")
+        main_falso = types.ModuleType("__main__")
+        main_falso.__file__ = str(script)
+        original = sys.modules["__main__"]
+        sys.modules["__main__"] = main_falso
+        try:
+            inicio = time.perf_counter()
+            resultados = list(iterar_paginas_em_paralelo([gerar_pdf(1, i) for i in range(2)], 2))
+            tempo = time.perf_counter() - inicio
+        finally:
+            sys.modules["__main__"] = original
+        assert all(paginas for _, paginas in resultados)
+        assert not marcador.exists(), "os processos do pool executaram o script principal"
+    print(f"__main__ do Streamlit: script não reexecutado nos filhos, 2 PDFs em {tempo:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--arquivos", type=int, default=64)
+    parser.add_argument("--paginas", type=int, default=30)
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    verificar_main_do_streamlit()
+
+    corpus = [gerar_pdf(args.paginas, i) for i in range(args.arquivos)]
+    total_paginas = args.arquivos * args.paginas
+    print(f"{args.arquivos} PDFs, {total_paginas} páginas, {os.cpu_count()} núcleos")
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        inicio = time.perf_counter()
+        for pdf_bytes in corpus:
+            extrair_com_arquivo_temporario(pdf_bytes, Path(diretorio))
+        referencia = time.perf_counter() - inicio
+
+    print(f"{'modo':<28} {'tempo (s)':>10} {'páginas/s':>10} {'speedup':>8}")
+    print(f"{'arquivo temporário, 1 proc.':<28} {referencia:>10.2f} {total_paginas / referencia:>10.0f} {1.0:>8.2f}")
+
+    inicio = time.perf_counter()
+    for pdf_bytes in corpus:
+        extrair_paginas_pdf(pdf_bytes)
+    tempo = time.perf_counter() - inicio
+    print(f"{'memória, sequencial':<28} {tempo:>10.2f} {total_paginas / tempo:>10.0f} {referencia / tempo:>8.2f}")
+
+    for processos in args.processos:
+        if processos <= 1:
+            continue
+        # Aquecimento: sobe os processos do pool antes de medir
+        list(iterar_paginas_em_paralelo(corpus[:processos], processos))
+        inicio = time.perf_counter()
+        paginas = sum(len(p) for _, p in iterar_paginas_em_paralelo(corpus, processos))
+        tempo = time.perf_counter() - inicio
+        assert paginas == total_paginas
+        rotulo = f"memória, {processos} processos"
+        print(f"{rotulo:<28} {tempo:>10.2f} {total_paginas / tempo:>10.0f} {referencia / tempo:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark da fragmentação por cláusula (services/clause_splitter.py) contra o
+RecursiveCharacterTextSplitter(1500, 200) usado antes na indexação.
+
+Gera contratos sintéticos com cláusulas de tamanhos variados, quebrados em páginas em linhas
+arbitrárias (como num PDF), e uma pergunta por fato escondido numa cláusula; o fato
+não cita o item, só o título da cláusula. Os embeddings são
+TF-IDF sobre o vocabulário dos fragmentos, determinísticos e sem API: servem para comparar os divisores,
+não para medir a qualidade absoluta da busca. Um acerto é um fragmento recuperado, do contrato
+certo, que contém a linha do fato inteira.
+
+Uso: python -m benchmarks.bench_fragmentacao --contratos 50 --clausulas 25 --k 4
+"""
+import argparse
+import random
+import re
+import time
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from services.clause_splitter import DivisorClausulas
+
+FRASES = [
+    "As obrigações previstas nesta cláusula serão cumpridas conforme o cronograma acordado entre as partes.",
+    "A CONTRATADA manterá registros atualizados de todas as atividades executadas.",
+    "Eventuais alterações dependerão de aditivo contratual assinado pelos representantes legais.",
+    "O descumprimento sujeitará a parte infratora às penalidades previstas neste instrumento.",
+    "As comunicações entre as partes serão feitas por escrito, com comprovação de recebimento.",
+]
+
+
+def gerar_contrato(c: int, clausulas: int, rng: random.Random, nome: str):
+    texto, perguntas = [], []
+    for k in range(1, clausulas + 1):
+        item = f"item{c}x{k}"
+        dias = rng.randint(5, 180)
+        paragrafos = [" ".join(rng.choice(FRASES) for _ in range(rng.randint(2, 6))) for _ in range(rng.randint(1, 6))]
+        # O fato não repete o item: só o título da cláusula diz a que ele se refere
+        posicao = rng.randrange(len(paragrafos) + 1)
+        paragrafos.insert(posicao, f"O prazo de entrega é de {dias} dias corridos contados da emissão do pedido.")
+        subitens = "\n".join(f"{k}.{i + 1} {p}" for i, p in enumerate(paragrafos))
+        texto.append(f"CLÁUSULA {k} - DAS CONDIÇÕES DO {item.upper()}\n{subitens}")
+        perguntas.append((f"Qual o prazo de entrega do {item}?", nome, f"{k}.{posicao + 1} {paragrafos[posicao]}"))
+    return "\n\n".join(texto), perguntas
+
+
+def paginar(texto: str, rng: random.Random, nome: str):
+    documentos, inicio, pagina = [], 0, 0
+    while inicio < len(texto):
+        fim = min(len(texto), inicio + rng.randint(2500, 3500))
+        if fim < len(texto):
+            # Como num PDF, a página termina numa linha, mas no meio de qualquer cláusula ou parágrafo
+            fim = texto.rfind("\n", inicio + 1, fim) + 1 or fim
+        documentos.append(Document(page_content=texto[inicio:fim].rstrip("\n"), metadata={"source": nome, "page": pagina}))
+        inicio, pagina = fim, pagina + 1
+    return documentos
+
+
+def contar_palavras(textos, vocabulario):
+    matriz = np.zeros((len(textos), len(vocabulario)), dtype=np.float32)
+    for i, texto in enumerate(textos):
+        for palavra in re.findall(r"\w+", texto.lower()):
+            if palavra in vocabulario:
+                matriz[i, vocabulario[palavra]] += 1
+    return matriz
+
+
+def embed(contagens, idf):
+    matriz = np.log1p(contagens) * idf
+    return matriz / (np.linalg.norm(matriz, axis=1, keepdims=True) + 1e-9)
+
+
+def avaliar(rotulo, divisor, paginas, perguntas, k):
+    inicio = time.perf_counter()
+    fragmentos = divisor.split_documents(paginas)
+    tempo = time.perf_counter() - inicio
+    caracteres = sum(len(f.page_content) for f in fragmentos)
+    vocabulario = {}
+    for fragmento in fragmentos:
+        for palavra in re.findall(r"\w+", fragmento.page_content.lower()):
+            vocabulario.setdefault(palavra, len(vocabulario))
+    contagens = contar_palavras([f.page_content for f in fragmentos], vocabulario)
+    # TF-IDF sobre os próprios fragmentos: termos raros (como o item perguntado) pesam mais
+    idf = np.log((1 + len(fragmentos)) / (1 + (contagens > 0).sum(axis=0))) + 1
+    vetores = embed(contagens, idf)
+    consultas = embed(contar_palavras([p for p, _, _ in perguntas], vocabulario), idf)
+    melhores = np.argsort(-(consultas @ vetores.T), axis=1)[:, :k]
+    acertos = sum(
+        any(fragmentos[j].metadata["source"] == fonte and fato in fragmentos[j].page_content for j in linha)
+        for linha, (_, fonte, fato) in zip(melhores, perguntas)
+    )
+    contexto = np.mean([sum(len(fragmentos[j].page_content) for j in linha) for linha in melhores])
+    print(f"{rotulo:<30} {len(fragmentos):>10} {caracteres / 4:>14.0f} {acertos / len(perguntas):>9.1%} "
+          f"{contexto:>14.0f} {tempo * 1000:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contratos", type=int, default=50)
+    parser.add_argument("--clausulas", type=int, default=25)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--tamanho", type=int, default=1500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    paginas, perguntas = [], []
+    for c in range(args.contratos):
+        nome = f"contrato_{c}.pdf"
+        texto, perguntas_contrato = gerar_contrato(c, args.clausulas, rng, nome)
+        paginas.extend(paginar(texto, rng, nome))
+        perguntas.extend(perguntas_contrato)
+
+    print(f"{len(paginas)} páginas, {len(perguntas)} perguntas, top-{args.k}")
+    print(f"{'divisor':<30} {'fragmentos':>10} {'tokens embed.':>14} {'acertos':>9} {'contexto (ch)':>14} {'tempo (ms)':>10}")
+    avaliar("recursivo 1500/200 (antigo)", RecursiveCharacterTextSplitter(chunk_size=args.tamanho, chunk_overlap=200), paginas, perguntas, args.k)
+    avaliar("por cláusula", DivisorClausulas(chunk_size=args.tamanho), paginas, perguntas, args.k)
+
+
+if __name__ == "__main__":
+    main()
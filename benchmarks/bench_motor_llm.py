@@ -0,0 +1,158 @@
+"""
+Benchmark offline do motor do LLM (core/llm_engine.py): latência do chat enquanto uma
+extração em massa ocupa a cota da API.
+
+Um LLM falso com latência injetada devolve erros 429 acima de `limite_rps` requisições por
+segundo. Compara o fluxo antigo (cada extração em threads com seu próprio limitador, como
+eventos e dashboard em sessões diferentes, e o chat chamando o modelo direto, com retentativas)
+com tudo passando pelo motor, o chat em prioridade interativa. O último caso repete o motor com um
+cliente que refaz o 429 dentro da própria chamada, como o ChatGoogleGenerativeAI original
+(ver ChatGeminiSemRetentativas em core/llm_registry.py): o erro nunca chega ao motor e a vaga fica presa.
+Com `--folga` acima de 1 (cota configurada maior que a real) o motor também recebe 429.
+
+Uso: python -m benchmarks.bench_motor_llm --extracoes 2 --lote 80 --perguntas 20 --latencia 0.4 --limite-rps 8
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+from core.concurrency import LimitadorAdaptativo, eh_erro_transitorio, executar_com_retentativas, mapear_em_paralelo
+from core.llm_engine import PRIORIDADE_INTERATIVA, PRIORIDADE_LOTE, MotorLLM
+
+
+class LLMFalsoComCota(Runnable):
+    """Responde após `latencia` segundos e rejeita chamadas acima de `limite_rps`."""
+
+    model = "falso"
+
+    def __init__(self, latencia: float, limite_rps: float):
+        self.latencia = latencia
+        self.limite_rps = limite_rps
+        self.rejeitadas = 0
+        self._janela = deque()
+        self._lock = threading.Lock()
+
+    def _admitir(self):
+        with self._lock:
+            agora = time.monotonic()
+            while self._janela and agora - self._janela[0] > 1.0:
+                self._janela.popleft()
+            if len(self._janela) >= self.limite_rps:
+                self.rejeitadas += 1
+                raise RuntimeError("429 Resource exhausted (simulado)")
+            self._janela.append(agora)
+
+    def invoke(self, prompt, config=None, **kwargs):
+        self._admitir()
+        time.sleep(self.latencia)
+        return AIMessage(content="ok")
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        self._admitir()
+        await asyncio.sleep(self.latencia)
+        return AIMessage(content="ok")
+
+
+class LLMFalsoComRetryInterno(LLMFalsoComCota):
+    """
+    Retry do langchain-google-genai 1.0.1 dentro do `ainvoke`: até 10 tentativas, esperando
+    2·2ⁿ segundos (entre 1 e 60), multiplicados por `escala` para o benchmark não demorar.
+    """
+
+    def __init__(self, latencia: float, limite_rps: float, escala: float):
+        super().__init__(latencia, limite_rps)
+        self.escala = escala
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        for tentativa in range(10):
+            try:
+                return await super().ainvoke(prompt, config, **kwargs)
+            except RuntimeError:
+                if tentativa == 9:
+                    raise
+                await asyncio.sleep(self.escala * min(60, max(1, 2 * 2 ** tentativa)))
+
+
+def perguntar_durante(lotes, perguntar, perguntas: int, intervalo: float):
+    """Roda cada lote numa thread e faz as perguntas do chat em sequência enquanto eles correm."""
+    threads = [threading.Thread(target=lote) for lote in lotes]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    latencias = []
+    for _ in range(perguntas):
+        time.sleep(intervalo)
+        t = time.perf_counter()
+        perguntar()
+        latencias.append(time.perf_counter() - t)
+    for thread in threads:
+        thread.join()
+    return latencias, time.perf_counter() - inicio
+
+
+def resumo(rotulo, latencias, total, llm, motor=None):
+    p95 = sorted(latencias)[max(0, int(len(latencias) * 0.95) - 1)]
+    devolvidos = f"  devolvidos à fila: {motor.estatisticas['retentativas']}" if motor else ""
+    print(f"{rotulo:<24} chat p50 {statistics.median(latencias):5.2f}s  p95 {p95:5.2f}s  "
+          f"total {total:5.1f}s  429 simulados: {llm.rejeitadas}{devolvidos}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extracoes", type=int, default=2, help="extrações em massa simultâneas")
+    parser.add_argument("--lote", type=int, default=80, help="chamadas de cada extração")
+    parser.add_argument("--perguntas", type=int, default=20)
+    parser.add_argument("--intervalo", type=float, default=0.5, help="segundos entre perguntas do chat")
+    parser.add_argument("--latencia", type=float, default=0.4)
+    parser.add_argument("--limite-rps", type=float, default=8)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--folga", type=float, default=0.8, help="fração da cota configurada como requisições por minuto")
+    parser.add_argument("--escala-retry", type=float, default=0.25, help="fator das esperas do retry interno do cliente")
+    args = parser.parse_args()
+    rpm = args.limite_rps * 60 * args.folga
+    print(f"extrações: {args.extracoes} x {args.lote}  perguntas: {args.perguntas}  latência: {args.latencia}s  cota simulada: {args.limite_rps} req/s")
+
+    # Antes: cada extração tem limitador próprio e o chat disputa a mesma cota sem saber dela
+    llm = LLMFalsoComCota(args.latencia, args.limite_rps)
+
+    def _extracao_antiga():
+        limitador = LimitadorAdaptativo.por_minuto(rpm, capacidade=args.workers)
+        mapear_em_paralelo(
+            lambda i: executar_com_retentativas(lambda: llm.invoke(i), limitador, repetir=eh_erro_transitorio),
+            range(args.lote), max_workers=args.workers,
+        )
+
+    latencias, total = perguntar_durante(
+        [_extracao_antiga] * args.extracoes,
+        lambda: executar_com_retentativas(lambda: llm.invoke("chat"), repetir=eh_erro_transitorio),
+        args.perguntas, args.intervalo,
+    )
+    resumo("threads + retentativas", latencias, total, llm)
+
+    # Motor: a mesma cota para todos, com vaga reservada e prioridade para o chat
+    llm = LLMFalsoComCota(args.latencia, args.limite_rps)
+    motor = MotorLLM(max_concorrencia=args.workers, max_por_modelo=args.workers, requisicoes_por_minuto=rpm)
+    latencias, total = perguntar_durante(
+        [lambda: motor.invocar_em_lote(llm, list(range(args.lote)), PRIORIDADE_LOTE)] * args.extracoes,
+        lambda: motor.invocar(llm, "chat", PRIORIDADE_INTERATIVA),
+        args.perguntas, args.intervalo,
+    )
+    resumo("motor do LLM", latencias, total, llm, motor)
+
+    # Motor com o retry interno do cliente: o 429 prende a vaga e não reduz o limitador adaptativo
+    llm = LLMFalsoComRetryInterno(args.latencia, args.limite_rps, args.escala_retry)
+    motor = MotorLLM(max_concorrencia=args.workers, max_por_modelo=args.workers, requisicoes_por_minuto=rpm)
+    latencias, total = perguntar_durante(
+        [lambda: motor.invocar_em_lote(llm, list(range(args.lote)), PRIORIDADE_LOTE)] * args.extracoes,
+        lambda: motor.invocar(llm, "chat", PRIORIDADE_INTERATIVA),
+        args.perguntas, args.intervalo,
+    )
+    resumo("motor, retry no cliente", latencias, total, llm, motor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark offline do OCR por página (services/ocr.py).
+
+Usa um modelo de visão falso com latência injetada para comparar o fluxo
+sequencial antigo (uma página por vez + sleep fixo) com o OCR concorrente.
+
+Uso: CONTRATIA_LLM_RPM=600 CONTRATIA_LLM_MAX_CONCORRENCIA=8 python -m benchmarks.bench_ocr --paginas 40 --latencia 0.5 --max-em-voo 8
+"""
+import argparse
+import asyncio
+import time
+import fitz
+from langchain_core.messages import AIMessage
+from core.concurrency import LimitadorTaxa
+from services.ocr import ocr_pdf_com_gemini
+
+
+class VisaoFalsa:
+    """Imita `ChatGoogleGenerativeAI.invoke`/`ainvoke` com latência fixa por chamada."""
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+        self.chamadas = 0
+
+    def invoke(self, mensagens):
+        self.chamadas += 1
+        time.sleep(self.latencia)
+        return AIMessage(content=f"texto da página {self.chamadas}")
+
+    async def ainvoke(self, mensagens):
+        self.chamadas += 1
+        await asyncio.sleep(self.latencia)
+        return AIMessage(content=f"texto da página {self.chamadas}")
+
+
+def gerar_pdf(paginas: int) -> bytes:
+    doc = fitz.open()
+    for i in range(paginas):
+        doc.new_page().insert_text((72, 72), f"Página {i} - cláusula de teste")
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paginas", type=int, default=40)
+    parser.add_argument("--latencia", type=float, default=0.5)
+    parser.add_argument("--max-em-voo", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--sleep-antigo", type=float, default=2.0)
+    args = parser.parse_args()
+
+    pdf_bytes = gerar_pdf(args.paginas)
+
+    # Custo estimado do fluxo antigo: latência + sleep fixo por página, em série
+    estimado_sequencial = args.paginas * (args.latencia + args.sleep_antigo)
+
+    modelo = VisaoFalsa(args.latencia)
+    inicio = time.perf_counter()
+    textos = ocr_pdf_com_gemini(
+        pdf_bytes, lambda nome: modelo,
+        max_em_voo=args.max_em_voo,
+        limitador=LimitadorTaxa.por_minuto(args.rpm, capacidade=args.max_em_voo),
+        dpi=72,
+    )
+    concorrente = time.perf_counter() - inicio
+
+    assert len(textos) == args.paginas and all(textos)
+    print(f"páginas: {args.paginas}  latência: {args.latencia}s  max_em_voo: {args.max_em_voo}  rpm: {args.rpm}")
+    print(f"sequencial (estimado): {estimado_sequencial:.1f}s")
+    print(f"concorrente:           {concorrente:.1f}s  ({estimado_sequencial / concorrente:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
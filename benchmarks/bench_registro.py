@@ -0,0 +1,64 @@
+"""
+Microbenchmark do custo de montagem por pergunta do chat (core/llm_registry.py).
+
+Compara a montagem antiga a cada turno (cliente do Gemini, PromptTemplate e
+RetrievalQA) com a busca no registro. Nenhuma chamada de rede é feita.
+
+Uso: python -m benchmarks.bench_registro --turnos 200
+"""
+import argparse
+import os
+import time
+import numpy as np
+from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
+from core.llm_registry import obter_llm, obter_prompt, obter_retriever
+from core.locale import TRANSLATIONS
+
+
+class EmbeddingsFalsos(Embeddings):
+    def embed_documents(self, textos):
+        return [np.random.default_rng(len(t)).random(8).tolist() for t in textos]
+
+    def embed_query(self, texto):
+        return self.embed_documents([texto])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turnos", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "chave-falsa")
+    vector_store = FAISS.from_texts([f"cláusula {i}" for i in range(20)], EmbeddingsFalsos())
+    template = TRANSLATIONS["pt"]["chat_prompt"]
+
+    inicio = time.perf_counter()
+    for _ in range(args.turnos):
+        llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.1)
+        prompt = PromptTemplate.from_template(template)
+        RetrievalQA.from_chain_type(
+            llm=llm, chain_type="stuff",
+            retriever=vector_store.as_retriever(search_kwargs={"k": 5}),
+            return_source_documents=True,
+            chain_type_kwargs={"prompt": prompt.partial(language="pt")}
+        )
+    antigo = (time.perf_counter() - inicio) / args.turnos
+
+    inicio = time.perf_counter()
+    for _ in range(args.turnos):
+        obter_llm("gemini-2.5-pro", 0.1)
+        obter_prompt(template, language="pt")
+        obter_retriever(vector_store, k=5)
+    registro = (time.perf_counter() - inicio) / args.turnos
+
+    print(f"Montagem por turno (antes):   {antigo * 1000:.3f} ms")
+    print(f"Montagem por turno (registro): {registro * 1000:.3f} ms")
+    print(f"Redução: {antigo / registro:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark offline do roteamento por tarefa (core/model_router.py): extração campo a campo
+só no modelo avançado contra o modelo rápido com escalada para o avançado.
+
+Dois LLMs falsos com latência injetada: o rápido responde "not found" numa fração das
+perguntas (`--falhas`), que a validação da extração manda para o avançado. Os custos usam
+os preços de PRECOS_MODELOS e os tokens estimados pelo roteador.
+
+Uso: python -m benchmarks.bench_roteamento --campos 200 --latencia-rapido 0.15 --latencia-avancado 0.6 --falhas 0.1
+"""
+import argparse
+import asyncio
+import random
+import time
+from langchain_core.messages import AIMessage
+from core.llm_engine import MotorLLM
+from core.model_router import iterar_roteado, metricas_por_tarefa, modelo_da_tarefa
+
+
+class LLMFalso:
+    """Responde após `latencia` segundos; uma fração `falhas` das respostas é "not found"."""
+
+    def __init__(self, model: str, latencia: float, falhas: float, semente: int = 0):
+        self.model = model
+        self.latencia = latencia
+        self.falhas = falhas
+        self._aleatorio = random.Random(semente)
+
+    async def ainvoke(self, prompt, **kwargs):
+        await asyncio.sleep(self.latencia)
+        if self._aleatorio.random() < self.falhas:
+            return AIMessage(content="not found")
+        return AIMessage(content="R$ 12.500,00 mensais, reajustados pelo IPCA")
+
+
+def rodar(tarefa, modelos, prompts, motor):
+    inicio = time.perf_counter()
+    respostas = dict(iterar_roteado(
+        tarefa, lambda modelo: modelos[modelo], prompts, motor=motor,
+        validar=lambda resposta: resposta.content != "not found",
+    ))
+    decorrido = time.perf_counter() - inicio
+    sem_resposta = sum(1 for r in respostas.values() if r.content == "not found")
+    linhas = [m for m in metricas_por_tarefa() if m["tarefa"] == tarefa]
+    custo = sum(m["custo_usd"] for m in linhas)
+    escaladas = sum(m["escaladas"] for m in linhas)
+    print(f"{tarefa:<16} total {decorrido:5.1f}s  custo US$ {custo:.4f}  escaladas: {escaladas:3d}  sem resposta: {sem_resposta}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campos", type=int, default=200)
+    parser.add_argument("--contexto", type=int, default=6000, help="caracteres de contexto por pergunta")
+    parser.add_argument("--latencia-rapido", type=float, default=0.15)
+    parser.add_argument("--latencia-avancado", type=float, default=0.6)
+    parser.add_argument("--falhas", type=float, default=0.1, help="fração de respostas vazias do modelo rápido")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    rapido, avancado = modelo_da_tarefa("extracao_campo"), modelo_da_tarefa("extracao_campo", escalar=True)
+    modelos = {
+        rapido: LLMFalso(rapido, args.latencia_rapido, args.falhas),
+        avancado: LLMFalso(avancado, args.latencia_avancado, 0.0),
+    }
+    prompts = [f"Context:\n{'x' * args.contexto}\n\nQual o valor do campo {i}?\nAnswer:" for i in range(args.campos)]
+    print(f"campos: {args.campos}  rápido: {rapido} ({args.latencia_rapido}s, {args.falhas:.0%} sem resposta)  "
+          f"avançado: {avancado} ({args.latencia_avancado}s)")
+
+    def _motor():
+        return MotorLLM(max_concorrencia=args.workers, max_por_modelo=args.workers, requisicoes_por_minuto=60_000, vagas_interativas=0)
+
+    # Tarefa sem rota configurada: vai direto ao modelo avançado, como antes do roteamento
+    rodar("so_avancado", modelos, prompts, _motor())
+    rodar("extracao_campo", modelos, prompts, _motor())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark de recall e latência dos tipos de índice FAISS das coleções (core/vector_index.py).
+
+Vetores sintéticos agrupados (como fragmentos de contratos parecidos) são indexados
+em cada tipo; o índice plano serve de referência exata para o recall@k.
+
+Uso: python -m benchmarks.bench_tipos_indice --vetores 100000 --dim 128 --consultas 500
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from core.vector_index import TIPOS_INDICE, construir_indice, aplicar_parametros_busca
+
+
+def gerar_vetores(n, dim, rng, grupos=200):
+    centros = rng.standard_normal((grupos, dim)).astype(np.float32)
+    return centros[rng.integers(grupos, size=n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vetores", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--consultas", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vetores = gerar_vetores(args.vetores, args.dim, rng)
+    consultas = gerar_vetores(args.consultas, args.dim, rng)
+
+    print(f"{'índice':<22} {'parâmetro':>12} {'recall@k':>9} {'ms/consulta':>12} {'MB':>8} {'treino (s)':>11}")
+    referencia = None
+    for tipo in TIPOS_INDICE:
+        inicio = time.perf_counter()
+        indice, fabrica = construir_indice(vetores, tipo)
+        treino = time.perf_counter() - inicio
+        tamanho = faiss.serialize_index(indice).nbytes / 1e6
+
+        if tipo in ("ivf", "ivfpq"):
+            variacoes = [(f"nprobe={n}", {"nprobe": n}) for n in args.nprobe]
+        elif tipo == "hnsw":
+            variacoes = [(f"efSearch={e}", {"ef_search": e}) for e in args.ef_search]
+        else:
+            variacoes = [("-", {})]
+
+        for rotulo, parametros in variacoes:
+            aplicar_parametros_busca(indice, **parametros)
+            inicio = time.perf_counter()
+            _, encontrados = indice.search(consultas, args.k)
+            latencia = (time.perf_counter() - inicio) / args.consultas * 1000
+            if referencia is None:
+                referencia = encontrados
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(encontrados, referencia)])
+            print(f"{fabrica:<22} {rotulo:>12} {recall:>9.3f} {latencia:>12.3f} {tamanho:>8.1f} {treino:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import json
+import math
+import re
+import threading
+import unicodedata
+import weakref
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from core.dedup import fontes_do_fragmento
+from core.vector_index import buscar_na_fonte
+
+# Números com separadores (CNPJ, valores, datas, "5.2") ficam inteiros; o resto é quebrado em palavras
+PADRAO_TOKEN = re.compile(r"\d+(?:[.,/\-]\d+)+|\w+")
+RRF_K = 60  # constante da fusão por posição recíproca (Reciprocal Rank Fusion)
+
+def tokenizar(texto: str) -> List[str]:
+    """Termos sem acento e em minúsculas. Números formatados também geram a versão só com dígitos."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    termos = []
+    for termo in PADRAO_TOKEN.findall(texto):
+        termos.append(termo)
+        if not termo.isalnum() and termo[0].isdigit():
+            termos.append(re.sub(r"\D", "", termo))
+    return termos
+
+
+class IndiceBM25:
+    """Índice invertido em memória com pontuação BM25, usando os IDs do docstore do FAISS."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.comprimentos: Dict[str, int] = {}
+        # Arquivos de cada fragmento (mais de um quando o fragmento foi deduplicado)
+        self.fontes: Dict[str, List[Optional[str]]] = {}
+        self._termos_do_doc: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.comprimentos)
+
+    def adicionar(self, ids: List[str], textos: List[str], fontes: List[Union[Optional[str], List[Optional[str]]]]):
+        with self._lock:
+            for doc_id, texto, fonte in zip(ids, textos, fontes):
+                if doc_id in self.comprimentos:
+                    self._remover_um(doc_id)
+                frequencias = Counter(tokenizar(texto))
+                for termo, tf in frequencias.items():
+                    self.postings.setdefault(termo, {})[doc_id] = tf
+                self.comprimentos[doc_id] = sum(frequencias.values())
+                self.fontes[doc_id] = fonte if isinstance(fonte, list) else [fonte]
+                self._termos_do_doc[doc_id] = list(frequencias)
+
+    def remover(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self.comprimentos:
+                    self._remover_um(doc_id)
+
+    def _remover_um(self, doc_id: str):
+        for termo in self._termos_do_doc.pop(doc_id):
+            docs = self.postings[termo]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[termo]
+        del self.comprimentos[doc_id]
+        del self.fontes[doc_id]
+
+    def buscar(self, consulta: str, k: int, fonte: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Os `k` documentos de maior pontuação BM25 (opcionalmente só os de um arquivo)."""
+        with self._lock:
+            total = len(self.comprimentos)
+            if not total:
+                return []
+            media = sum(self.comprimentos.values()) / total
+            pontuacoes: Dict[str, float] = {}
+            for termo in set(tokenizar(consulta)):
+                docs = self.postings.get(termo)
+                if not docs:
+                    continue
+                idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    if fonte is not None and fonte not in self.fontes[doc_id]:
+                        continue
+                    normalizacao = self.k1 * (1 - self.b + self.b * self.comprimentos[doc_id] / media)
+                    pontuacoes[doc_id] = pontuacoes.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + normalizacao)
+        return sorted(pontuacoes.items(), key=lambda item: -item[1])[:k]
+
+    def salvar(self, caminho: Path):
+        with self._lock:
+            dados = {"k1": self.k1, "b": self.b, "postings": self.postings,
+                     "comprimentos": self.comprimentos, "fontes": self.fontes}
+            caminho_temp = Path(caminho).with_suffix(".tmp")
+            with open(caminho_temp, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False)
+            caminho_temp.replace(caminho)
+
+    @classmethod
+    def carregar(cls, caminho: Path) -> "IndiceBM25":
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        indice = cls(dados["k1"], dados["b"])
+        indice.postings = dados["postings"]
+        indice.comprimentos = dados["comprimentos"]
+        # Índices gravados antes da deduplicação têm uma fonte por fragmento
+        indice.fontes = {d: f if isinstance(f, list) else [f] for d, f in dados["fontes"].items()}
+        for termo, docs in indice.postings.items():
+            for doc_id in docs:
+                indice._termos_do_doc.setdefault(doc_id, []).append(termo)
+        return indice
+
+    @classmethod
+    def do_vector_store(cls, vector_store) -> "IndiceBM25":
+        """Constrói o índice com todos os fragmentos do docstore do FAISS."""
+        indice = cls()
+        ids = list(vector_store.index_to_docstore_id.values())
+        docs = [vector_store.docstore.search(doc_id) for doc_id in ids]
+        indice.adicionar(ids, [d.page_content for d in docs], [fontes_do_fragmento(d.metadata) for d in docs])
+        return indice
+
+
+# Índice BM25 de cada vector store em uso; some junto com o vector store
+_indices = weakref.WeakKeyDictionary()
+_lock_indices = threading.Lock()
+
+def registrar_indice_bm25(vector_store, indice: IndiceBM25):
+    with _lock_indices:
+        _indices[vector_store] = indice
+
+def obter_indice_bm25(vector_store) -> IndiceBM25:
+    """Índice do vector store; se ainda não houver (ex: coleção antiga), é construído a partir do docstore."""
+    with _lock_indices:
+        indice = _indices.get(vector_store)
+        if indice is None:
+            indice = IndiceBM25.do_vector_store(vector_store)
+            _indices[vector_store] = indice
+        return indice
+
+def carregar_ou_construir_indice_bm25(caminho: Path, vector_store) -> IndiceBM25:
+    """Usa o índice salvo se ele cobrir exatamente os fragmentos do vector store; senão, reconstrói."""
+    if Path(caminho).exists():
+        try:
+            indice = IndiceBM25.carregar(caminho)
+            if set(indice.comprimentos) == set(vector_store.index_to_docstore_id.values()):
+                return indice
+        except (OSError, ValueError, KeyError):
+            pass
+    return IndiceBM25.do_vector_store(vector_store)
+
+
+class RetrieverHibrido(BaseRetriever):
+    """
+    Combina a busca densa do FAISS com a busca lexical BM25 por Reciprocal Rank Fusion.
+    Cláusulas, CNPJs, valores e datas citados literalmente na pergunta sobem no ranking
+    mesmo quando a similaridade dos embeddings é fraca.
+    """
+
+    # O vector store ou uma referência fraca (weakref.ref) a ele, quando o retriever fica em cache
+    vector_store: Any
+    indice: Any
+    k: int = 5
+    fonte: Optional[str] = None
+    candidatos: int = 20
+
+    def _vector_store(self):
+        if isinstance(self.vector_store, weakref.ReferenceType):
+            return self.vector_store()
+        return self.vector_store
+
+    def _busca_densa(self, vs, consulta: str) -> List[str]:
+        if vs.index.ntotal == 0:
+            return []
+        vetor = np.asarray([vs._embed_query(consulta)], dtype=np.float32)
+        if self.fonte is not None:
+            # Busca só entre os vetores do arquivo, em vez de filtrar vizinhos globais
+            return [doc_id for doc_id, _ in buscar_na_fonte(vs, vetor, self.fonte, self.candidatos)]
+        _, posicoes = vs.index.search(vetor, min(self.candidatos, vs.index.ntotal))
+        return [vs.index_to_docstore_id[p] for p in posicoes[0] if p != -1]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vs = self._vector_store()
+        if vs is None:
+            return []
+        densos = self._busca_densa(vs, query)
+        lexicos = [doc_id for doc_id, _ in self.indice.buscar(query, self.candidatos, self.fonte)]
+        pontuacoes: Dict[str, float] = {}
+        for ranking in (densos, lexicos):
+            for posicao, doc_id in enumerate(ranking):
+                pontuacoes[doc_id] = pontuacoes.get(doc_id, 0.0) + 1.0 / (RRF_K + posicao + 1)
+        melhores = sorted(pontuacoes, key=lambda doc_id: -pontuacoes[doc_id])[:self.k]
+        return [vs.docstore.search(doc_id) for doc_id in melhores]
@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class LimitadorTaxa:
+    """
+    Limitador de taxa do tipo token bucket, seguro para uso entre threads.
+    Permite rajadas de até `capacidade` chamadas e repõe `taxa_por_segundo` fichas por segundo.
+    """
+
+    def __init__(self, taxa_por_segundo: float, capacidade: Optional[float] = None):
+        if taxa_por_segundo <= 0:
+            raise ValueError("taxa_por_segundo deve ser positiva.")
+        self.taxa_por_segundo = float(taxa_por_segundo)
+        self.capacidade = float(capacidade) if capacidade else max(1.0, self.taxa_por_segundo)
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def por_minuto(cls, requisicoes_por_minuto: float, capacidade: Optional[float] = None):
+        return cls(requisicoes_por_minuto / 60.0, capacidade)
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa_por_segundo)
+        self._ultimo = agora
+
+    def tentar_adquirir(self, fichas: float = 1.0, reserva: float = 0.0) -> float:
+        """
+        Consome as fichas se houver, deixando ao menos `reserva` no balde; senão, retorna quantos
+        segundos faltam para haver (sem bloquear).
+        """
+        with self._lock:
+            self._repor()
+            necessarias = min(fichas + reserva, self.capacidade)
+            if self._fichas >= necessarias:
+                self._fichas -= fichas
+                return 0.0
+            return (necessarias - self._fichas) / self.taxa_por_segundo
+
+    def adquirir(self, fichas: float = 1.0):
+        """Bloqueia até haver fichas disponíveis e as consome."""
+        while True:
+            espera = self.tentar_adquirir(fichas)
+            if not espera:
+                return
+            time.sleep(espera)
+
+
+class LimitadorAdaptativo(LimitadorTaxa):
+    """
+    Token bucket que se ajusta às respostas da API: reduz a taxa pela metade a cada
+    erro de limite (429) e a recupera aos poucos a cada chamada bem-sucedida.
+    """
+
+    def __init__(self, taxa_por_segundo: float, capacidade: Optional[float] = None,
+                 taxa_minima: Optional[float] = None, incremento: Optional[float] = None):
+        super().__init__(taxa_por_segundo, capacidade)
+        self.taxa_maxima = self.taxa_por_segundo
+        self.taxa_minima = taxa_minima or self.taxa_maxima / 16
+        self.incremento = incremento or self.taxa_maxima / 20
+
+    def reduzir(self):
+        with self._lock:
+            self._repor()
+            self.taxa_por_segundo = max(self.taxa_minima, self.taxa_por_segundo / 2)
+            self._fichas = min(self._fichas, 0.0)
+
+    def aumentar(self):
+        with self._lock:
+            self._repor()
+            self.taxa_por_segundo = min(self.taxa_maxima, self.taxa_por_segundo + self.incremento)
+
+
+def eh_erro_limite_taxa(erro: Exception) -> bool:
+    """Identifica erros de cota/limite de requisições (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    try:
+        from google.api_core.exceptions import TooManyRequests
+        if isinstance(erro, TooManyRequests):
+            return True
+    except ImportError:
+        pass
+    mensagem = str(erro).lower()
+    return "429" in mensagem or "resource exhausted" in mensagem or "resource_exhausted" in mensagem or "quota" in mensagem
+
+
+def eh_erro_transitorio(erro: Exception) -> bool:
+    """Erros que costumam passar numa nova tentativa: limite de taxa, indisponibilidade (5xx), timeout e conexão."""
+    if eh_erro_limite_taxa(erro) or isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.api_core.exceptions import DeadlineExceeded, ServerError
+        if isinstance(erro, (DeadlineExceeded, ServerError)):
+            return True
+    except ImportError:
+        pass
+    mensagem = str(erro).lower()
+    return any(t in mensagem for t in ("500", "502", "503", "504", "unavailable", "deadline", "timed out", "timeout"))
+
+
+def executar_com_retentativas(
+    funcao: Callable[[], R],
+    limitador: Optional[LimitadorTaxa] = None,
+    tentativas: int = 5,
+    espera_base: float = 1.0,
+    espera_maxima: float = 30.0,
+    repetir: Callable[[Exception], bool] = eh_erro_limite_taxa,
+) -> R:
+    """
+    Executa `funcao` respeitando o limitador. Nos erros aceitos por `repetir` (por padrão, só os
+    de limite de taxa) tenta de novo com backoff exponencial e jitter; limites de taxa também
+    reduzem a taxa de um limitador adaptativo. Outros erros são propagados imediatamente.
+    """
+    for tentativa in range(tentativas):
+        if limitador:
+            limitador.adquirir()
+        try:
+            resultado = funcao()
+        except Exception as e:
+            if not repetir(e) or tentativa == tentativas - 1:
+                raise
+            if isinstance(limitador, LimitadorAdaptativo) and eh_erro_limite_taxa(e):
+                limitador.reduzir()
+            time.sleep(random.uniform(0, min(espera_maxima, espera_base * 2 ** tentativa)))
+            continue
+        if isinstance(limitador, LimitadorAdaptativo):
+            limitador.aumentar()
+        return resultado
+
+
+def mapear_em_paralelo(
+    funcao: Callable[[T], R],
+    itens: Iterable[T],
+    max_workers: int = 4,
+    limitador: Optional[LimitadorTaxa] = None,
+) -> List[R]:
+    """
+    Aplica `funcao` a cada item com no máximo `max_workers` chamadas simultâneas.
+    Os resultados são devolvidos na mesma ordem dos itens de entrada.
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+
+    def _executar(item):
+        if limitador:
+            limitador.adquirir()
+        return funcao(item)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(itens)))) as executor:
+        return list(executor.map(_executar, itens))
+
+
+def iterar_em_paralelo(
+    funcao: Callable[[T], R],
+    itens: Iterable[T],
+    max_workers: int = 4,
+) -> Iterator[Tuple[int, R]]:
+    """
+    Como `mapear_em_paralelo`, mas entrega (índice, resultado) à medida que cada item termina.
+    Só há `max_workers` itens em execução por vez, o que limita a memória com entradas longas.
+    Os callbacks de progresso podem ser chamados por quem consome, na thread principal.
+    """
+    pendentes = iter(enumerate(itens))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        em_voo = {}
+        for indice, item in pendentes:
+            em_voo[executor.submit(funcao, item)] = indice
+            if len(em_voo) >= max_workers:
+                break
+        while em_voo:
+            concluidos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                indice = em_voo.pop(futuro)
+                yield indice, futuro.result()
+                proximo = next(pendentes, None)
+                if proximo is not None:
+                    em_voo[executor.submit(funcao, proximo[1])] = proximo[0]
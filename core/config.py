@@ -6,6 +6,110 @@ import streamlit as st
 COLECOES_DIR = Path("colecoes_ia")
 COLECOES_DIR.mkdir(exist_ok=True)
 
+# Diretório para caches persistentes (embeddings, etc.)
+CACHE_DIR = Path("cache_ia")
+CACHE_DIR.mkdir(exist_ok=True)
+
+# Cache em disco das respostas do LLM, compartilhado entre processos (SQLite com despejo LRU)
+LLM_CACHE_ARQUIVO = CACHE_DIR / "llm_cache.sqlite"
+LLM_CACHE_MAX_BYTES = int(float(os.environ.get("CONTRATIA_LLM_CACHE_MAX_MB", 512)) * 1024 * 1024)
+
+# Fragmentos recuperados por pergunta (busca híbrida FAISS + BM25)
+RETRIEVER_K = int(os.environ.get("CONTRATIA_RETRIEVER_K", 4))
+
+# Tipo do índice FAISS gravado nas coleções: "flat" (exato), "ivf", "hnsw", "ivfpq" ou "auto"
+# ("auto" usa o plano até FAISS_MIN_VETORES_APROXIMADO vetores e IVF acima disso)
+FAISS_TIPO_INDICE = os.environ.get("CONTRATIA_FAISS_TIPO", "auto")
+FAISS_MIN_VETORES_APROXIMADO = int(os.environ.get("CONTRATIA_FAISS_MIN_VETORES_APROXIMADO", 50000))
+FAISS_HNSW_M = int(os.environ.get("CONTRATIA_FAISS_HNSW_M", 32))
+# Coleções salvas abrem o índice FAISS mapeado em memória: processos diferentes compartilham as páginas pelo SO
+COLECAO_MMAP = os.environ.get("CONTRATIA_COLECAO_MMAP", "1") != "0"
+# Fragmentos de coleções salvas mantidos em memória (LRU) depois de lidos do SQLite
+DOCSTORE_CACHE_ITENS = int(os.environ.get("CONTRATIA_DOCSTORE_CACHE_ITENS", 256))
+# Parâmetros de busca: listas IVF visitadas e tamanho da fila do HNSW (maior = mais recall, mais latência)
+FAISS_NPROBE = int(os.environ.get("CONTRATIA_FAISS_NPROBE", 16))
+FAISS_EF_SEARCH = int(os.environ.get("CONTRATIA_FAISS_EF_SEARCH", 64))
+
+# Cache semântico do chat: similaridade mínima entre perguntas, validade (segundos) e máximo de respostas por coleção
+CACHE_SEMANTICO_LIMIAR = float(os.environ.get("CONTRATIA_CACHE_SEMANTICO_LIMIAR", 0.95))
+CACHE_SEMANTICO_TTL = float(os.environ.get("CONTRATIA_CACHE_SEMANTICO_TTL", 24 * 3600))
+CACHE_SEMANTICO_MAX_ITENS = int(os.environ.get("CONTRATIA_CACHE_SEMANTICO_MAX_ITENS", 500))
+
+# Tamanho máximo (caracteres) de um fragmento indexado; os fragmentos seguem as cláusulas, sem sobreposição
+FRAGMENTO_TAMANHO_MAXIMO = int(os.environ.get("CONTRATIA_FRAGMENTO_TAMANHO", 1500))
+
+# Leitura da camada de texto dos PDFs: processos em paralelo (padrão: um por núcleo)
+PDF_MAX_PROCESSOS = int(os.environ.get("CONTRATIA_PDF_MAX_PROCESSOS", os.cpu_count() or 1))
+
+# OCR via Gemini Vision: máximo de páginas em processamento simultâneo e limite de requisições por minuto
+OCR_MAX_CONCORRENCIA = int(os.environ.get("CONTRATIA_OCR_MAX_CONCORRENCIA", 4))
+OCR_REQUISICOES_POR_MINUTO = float(os.environ.get("CONTRATIA_OCR_RPM", 30))
+
+# Chamadas ao LLM, por modelo: em voo ao mesmo tempo e requisições por minuto (use um valor abaixo da cota)
+LLM_MAX_CONCORRENCIA = int(os.environ.get("CONTRATIA_LLM_MAX_CONCORRENCIA", 4))
+LLM_REQUISICOES_POR_MINUTO = float(os.environ.get("CONTRATIA_LLM_RPM", 60))
+
+# Motor assíncrono do LLM (core/llm_engine.py), único por processo: chamadas em voo somando todos os
+# modelos, vagas (e fichas do limite de taxa) que só o chat pode ocupar e tentativas em erros transitórios
+LLM_MAX_CONCORRENCIA_GLOBAL = int(os.environ.get("CONTRATIA_LLM_MAX_CONCORRENCIA_GLOBAL", 8))
+LLM_VAGAS_INTERATIVAS = int(os.environ.get("CONTRATIA_LLM_VAGAS_INTERATIVAS", 1))
+LLM_TENTATIVAS = int(os.environ.get("CONTRATIA_LLM_TENTATIVAS", 5))
+
+# Roteamento de modelos (core/model_router.py): modelo de cada nível e nível de cada tarefa. Tarefas no nível
+# "rapido" são repetidas no "avancado" quando a resposta não passa na validação da tarefa. As rotas podem ser
+# ajustadas sem mudar o código, ex: CONTRATIA_ROTAS="eventos=avancado,resumo=rapido"
+MODELOS_POR_NIVEL = {
+    "rapido": os.environ.get("CONTRATIA_MODELO_RAPIDO", "gemini-2.5-flash"),
+    "avancado": os.environ.get("CONTRATIA_MODELO_AVANCADO", "gemini-2.5-pro"),
+}
+NIVEL_POR_TAREFA = {
+    "ocr": "rapido",             # transcrição de páginas digitalizadas
+    "extracao": "rapido",        # campos do dashboard, todos de uma vez por arquivo (RAG)
+    "extracao_campo": "rapido",  # campo que faltou na resposta em lote
+    "eventos": "rapido",         # prazos e datas
+    "pontos_chave": "avancado",  # escolha dos campos do dashboard
+    "resumo": "avancado",
+    "riscos": "avancado",
+    "conformidade": "avancado",
+    "chat": "avancado",
+}
+NIVEL_POR_TAREFA.update(
+    (tarefa.strip(), nivel.strip())
+    for tarefa, _, nivel in (par.partition("=") for par in os.environ.get("CONTRATIA_ROTAS", "").split(","))
+    if nivel.strip() in MODELOS_POR_NIVEL
+)
+# Preço por milhão de tokens (entrada, saída), em US$, para o custo estimado de cada tarefa; imagens contam
+# como TOKENS_POR_IMAGEM tokens de entrada
+PRECOS_MODELOS = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+TOKENS_POR_IMAGEM = 258
+# Registro de cada chamada (tarefa, modelo, latência, tokens, custo) para ajustar as rotas; ao passar do
+# tamanho máximo, o arquivo atual vira ".1" e um novo é iniciado
+METRICAS_LLM_ARQUIVO = CACHE_DIR / "metricas_llm.jsonl"
+METRICAS_LLM_MAX_BYTES = int(float(os.environ.get("CONTRATIA_METRICAS_LLM_MAX_MB", 20)) * 1024 * 1024)
+
+# Ingestão em segundo plano: jobs processados ao mesmo tempo, tempo sem sinal de vida (segundos) para um job
+# "executando" ser considerado interrompido e retomado, e por quanto tempo (horas) os checkpoints são mantidos
+INGESTAO_MAX_JOBS = int(os.environ.get("CONTRATIA_INGESTAO_MAX_JOBS", 2))
+INGESTAO_HEARTBEAT_EXPIRA = float(os.environ.get("CONTRATIA_INGESTAO_HEARTBEAT_EXPIRA", 30))
+INGESTAO_RETENCAO_HORAS = float(os.environ.get("CONTRATIA_INGESTAO_RETENCAO_HORAS", 72))
+
+# Embeddings na ingestão: fragmentos por requisição (a API aceita até 100), lotes simultâneos e requisições por minuto
+EMBEDDINGS_TAMANHO_LOTE = int(os.environ.get("CONTRATIA_EMBEDDINGS_LOTE", 100))
+EMBEDDINGS_MAX_CONCORRENCIA = int(os.environ.get("CONTRATIA_EMBEDDINGS_MAX_CONCORRENCIA", 4))
+EMBEDDINGS_REQUISICOES_POR_MINUTO = float(os.environ.get("CONTRATIA_EMBEDDINGS_RPM", 100))
+
+# Deduplicação de fragmentos na ingestão: distância máxima de Hamming (em 64 bits de SimHash) para
+# considerar dois fragmentos quase iguais, e tamanho mínimo (em palavras) para a comparação aproximada
+DEDUP_SIMHASH_DISTANCIA = int(os.environ.get("CONTRATIA_DEDUP_SIMHASH_DISTANCIA", 3))
+DEDUP_MIN_PALAVRAS = int(os.environ.get("CONTRATIA_DEDUP_MIN_PALAVRAS", 20))
+
+# Resumo/riscos em map-reduce: tamanho de cada trecho enviado ao LLM e quantas notas são combinadas por vez
+MAP_REDUCE_JANELA_CHARS = int(os.environ.get("CONTRATIA_MAP_REDUCE_JANELA", 12000))
+MAP_REDUCE_FATOR_REDUCAO = int(os.environ.get("CONTRATIA_MAP_REDUCE_FATOR", 6))
+
 # Função para obter a chave da API do Google
 def get_google_api_key():
     """
@@ -23,10 +127,8 @@ def get_google_api_key():
             type="password",
             key="api_key_input_main"
         )
-        if google_api_key:
-            os.environ["GOOGLE_API_KEY"] = google_api_key
-            return google_api_key
-        return None
+        # A chave colada vale só para esta sessão: é passada aos clientes, não vai para o ambiente do processo
+        return google_api_key or None
 
 # Função para aplicar estilos CSS e ocultar elementos padrão do Streamlit
 def hide_streamlit_style():
@@ -0,0 +1,115 @@
+import hashlib
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from core.config import DEDUP_SIMHASH_DISTANCIA, DEDUP_MIN_PALAVRAS
+
+BITS_SIMHASH = 64
+# Números e negações mudam o sentido de uma cláusula quase igual ("poderá" / "não poderá")
+PADRAO_INVARIANTE = re.compile(r"\d+|\b(?:nao|no|not|nem|ni|never|nunca|jamais|sem|sin|without|vedado|prohibido|prohibited)\b")
+# Nomes próprios (partes, empresas, cidades) e e-mails distinguem cláusulas de contratos diferentes;
+# procurados no texto original, antes das minúsculas. CNPJ e CPF já entram pelos números.
+PADRAO_PALAVRA = re.compile(r"[^\W\d_]+")
+PADRAO_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados: diferenças de diagramação não contam."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split())
+
+def invariantes_do_texto(texto: str, normalizado: str) -> str:
+    """O que precisa ser igual para dois textos quase iguais serem o mesmo fragmento."""
+    nomes = [normalizar_texto(p) for p in PADRAO_PALAVRA.findall(texto) if p[0].isupper()]
+    emails = [e.lower() for e in PADRAO_EMAIL.findall(texto)]
+    return "|".join((" ".join(PADRAO_INVARIANTE.findall(normalizado)), " ".join(nomes), " ".join(emails)))
+
+def simhash(palavras: List[str]) -> int:
+    """SimHash de 64 bits sobre trigramas de palavras: textos quase iguais diferem em poucos bits."""
+    shingles = [" ".join(palavras[i:i + 3]) for i in range(max(1, len(palavras) - 2))]
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles), dtype=np.uint64
+    )
+    bits = (hashes[:, None] >> np.arange(BITS_SIMHASH, dtype=np.uint64)) & np.uint64(1)
+    votos = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int(sum(1 << i for i in np.flatnonzero(votos > 0)))
+
+def fontes_do_fragmento(metadata: dict) -> List[Optional[str]]:
+    """Arquivos em que o fragmento aparece: os das referências, se ele foi deduplicado, ou só o `source`."""
+    referencias = metadata.get("referencias")
+    if not referencias:
+        return [metadata.get("source")]
+    return list(dict.fromkeys(r.get("source") for r in referencias))
+
+
+class DeduplicadorFragmentos:
+    """
+    Reconhece fragmentos repetidos: iguais depois de normalizados (hash exato) ou quase iguais
+    (SimHash a até `distancia_maxima` bits). A busca por vizinhos usa bandas do SimHash: com
+    distância ≤ d, ao menos uma de d + 1 bandas é idêntica. Quase-duplicatas precisam ter os
+    mesmos números (valores, prazos, datas, numeração de cláusulas, CNPJ), as mesmas negações e
+    os mesmos nomes próprios e e-mails, para não juntar a mesma cláusula de contratos com partes diferentes.
+    """
+
+    def __init__(self, distancia_maxima: int = DEDUP_SIMHASH_DISTANCIA, min_palavras: int = DEDUP_MIN_PALAVRAS):
+        self.distancia_maxima = distancia_maxima
+        self.min_palavras = min_palavras
+        self.bandas = distancia_maxima + 1
+        self.largura_banda = BITS_SIMHASH // self.bandas
+        self._exatos: Dict[str, int] = {}
+        self._bandas: Dict[Tuple[int, str, int], List[int]] = {}
+        self._simhashes: List[Optional[int]] = []
+
+    def _chaves_bandas(self, assinatura: int, invariantes: str):
+        mascara = (1 << self.largura_banda) - 1
+        for banda in range(self.bandas):
+            yield banda, invariantes, (assinatura >> (banda * self.largura_banda)) & mascara
+
+    def encontrar_ou_adicionar(self, texto: str) -> Optional[int]:
+        """Posição do fragmento equivalente já visto; se não houver, registra este e retorna None."""
+        normalizado = normalizar_texto(texto)
+        exato = hashlib.sha1(normalizado.encode("utf-8")).hexdigest()
+        if exato in self._exatos:
+            return self._exatos[exato]
+
+        posicao = len(self._simhashes)
+        palavras = normalizado.split()
+        assinatura = None
+        if len(palavras) >= self.min_palavras:
+            assinatura = simhash(palavras)
+            invariantes = invariantes_do_texto(texto, normalizado)
+            for chave in self._chaves_bandas(assinatura, invariantes):
+                for candidato in self._bandas.get(chave, ()):
+                    if bin(assinatura ^ self._simhashes[candidato]).count("1") <= self.distancia_maxima:
+                        self._exatos[exato] = candidato
+                        return candidato
+            for chave in self._chaves_bandas(assinatura, invariantes):
+                self._bandas.setdefault(chave, []).append(posicao)
+
+        self._exatos[exato] = posicao
+        self._simhashes.append(assinatura)
+        return None
+
+
+def deduplicar_documentos(documentos: List[Document], deduplicador: Optional[DeduplicadorFragmentos] = None) -> List[Document]:
+    """
+    Mantém uma cópia de cada fragmento repetido. A cópia guarda em `referencias` todos os
+    (arquivo, página) onde o texto aparece, para que buscas por arquivo e citações cubram cada documento.
+    """
+    deduplicador = deduplicador or DeduplicadorFragmentos()
+    unicos: List[Document] = []
+    for doc in documentos:
+        referencia = {"source": doc.metadata.get("source"), "page": doc.metadata.get("page")}
+        posicao = deduplicador.encontrar_ou_adicionar(doc.page_content)
+        if posicao is None:
+            unicos.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "referencias": [referencia]}))
+        elif referencia not in unicos[posicao].metadata["referencias"]:
+            unicos[posicao].metadata["referencias"].append(referencia)
+    for doc in unicos:
+        # Fragmentos sem repetição ficam com os metadados de sempre
+        if len(doc.metadata["referencias"]) == 1:
+            del doc.metadata["referencias"]
+    return unicos
@@ -0,0 +1,161 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+from core.config import DOCSTORE_CACHE_ITENS
+from core.dedup import fontes_do_fragmento
+
+
+def gravar_docstore_sqlite(caminho: Path, fragmentos: Iterable[Tuple[int, str, Document]]):
+    """Grava (posição no índice, id do docstore, documento) num arquivo SQLite novo, sem pickle."""
+    caminho = Path(caminho)
+    caminho.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(caminho))
+    try:
+        conn.execute(
+            "CREATE TABLE fragmentos ("
+            " posicao INTEGER PRIMARY KEY, doc_id TEXT NOT NULL UNIQUE,"
+            " texto TEXT NOT NULL, metadados TEXT NOT NULL)"
+        )
+        conn.executemany(
+            "INSERT INTO fragmentos VALUES (?, ?, ?, ?)",
+            (
+                (posicao, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+                for posicao, doc_id, doc in fragmentos
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class DocstoreSQLite(Docstore, AddableMixin):
+    """
+    Docstore de uma coleção salva: os fragmentos são lidos do SQLite sob demanda, pelo id,
+    com um LRU pequeno em memória. O arquivo não é alterado depois de gravado; adições e remoções
+    feitas com a coleção aberta ficam em memória (e no manifesto, como operações) até a próxima
+    gravação completa.
+    """
+
+    def __init__(self, caminho: Path, max_cache: int = DOCSTORE_CACHE_ITENS):
+        self.caminho = Path(caminho)
+        self.max_cache = max_cache
+        self._local = threading.local()
+        self._cache: "OrderedDict[str, Optional[Document]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._adicionados: Dict[str, Document] = {}
+        self._removidos = set()
+
+    def conexao(self) -> sqlite3.Connection:
+        # Uma conexão somente leitura por thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.caminho.as_posix()}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def mapa_posicoes(self) -> "MapaPosicoesSQLite":
+        """Posição no índice FAISS -> id do docstore, lido do SQLite sob demanda."""
+        return MapaPosicoesSQLite(self)
+
+    def fontes(self) -> Dict[str, List[Optional[str]]]:
+        """Arquivos de origem de cada fragmento (vários, se deduplicado), numa única consulta (sem ler os textos)."""
+        fontes = {
+            doc_id: fontes_do_fragmento({"source": fonte, "referencias": json.loads(referencias) if referencias else None})
+            for doc_id, fonte, referencias in self.conexao().execute(
+                "SELECT doc_id, json_extract(metadados, '$.source'), json_extract(metadados, '$.referencias') FROM fragmentos"
+            )
+            if doc_id not in self._removidos
+        }
+        fontes.update({doc_id: fontes_do_fragmento(doc.metadata) for doc_id, doc in self._adicionados.items()})
+        return fontes
+
+    def _ler(self, doc_id: str) -> Optional[Document]:
+        with self._lock:
+            if doc_id in self._cache:
+                self._cache.move_to_end(doc_id)
+                return self._cache[doc_id]
+        linha = self.conexao().execute(
+            "SELECT texto, metadados FROM fragmentos WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        doc = Document(page_content=linha[0], metadata=json.loads(linha[1])) if linha else None
+        with self._lock:
+            self._cache[doc_id] = doc
+            if len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        return doc
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._removidos:
+            return f"ID {search} not found."
+        if search in self._adicionados:
+            return self._adicionados[search]
+        doc = self._ler(search)
+        return doc if doc is not None else f"ID {search} not found."
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        for doc_id, doc in texts.items():
+            self._removidos.discard(doc_id)
+            self._adicionados[doc_id] = doc
+
+    def delete(self, ids: List) -> None:
+        for doc_id in ids:
+            self._adicionados.pop(doc_id, None)
+            self._removidos.add(doc_id)
+
+
+class MapaPosicoesSQLite(Mapping):
+    """
+    `index_to_docstore_id` do FAISS sem carregar todos os ids: posições gravadas vêm do SQLite,
+    as acrescentadas depois ficam em memória. Só aceita acréscimos (`__setitem__`/`update`, usados
+    pelo LangChain ao adicionar textos); remoções substituem o mapa por um dicionário comum.
+    """
+
+    def __init__(self, docstore: DocstoreSQLite):
+        self._docstore = docstore
+        self._gravadas = docstore.conexao().execute("SELECT COUNT(*) FROM fragmentos").fetchone()[0]
+        self._novas: Dict[int, str] = {}
+
+    def __getitem__(self, posicao):
+        posicao = int(posicao)
+        if posicao in self._novas:
+            return self._novas[posicao]
+        if 0 <= posicao < self._gravadas:
+            linha = self._docstore.conexao().execute(
+                "SELECT doc_id FROM fragmentos WHERE posicao = ?", (posicao,)
+            ).fetchone()
+            if linha:
+                return linha[0]
+        raise KeyError(posicao)
+
+    def __setitem__(self, posicao, doc_id):
+        self._novas[int(posicao)] = doc_id
+
+    def update(self, posicoes: Dict[int, str]):
+        for posicao, doc_id in posicoes.items():
+            self[posicao] = doc_id
+
+    def __delitem__(self, posicao):
+        # Com `__setitem__` definido, sem este método `del` daria AttributeError em vez do TypeError de um Mapping
+        raise TypeError(f"'{type(self).__name__}' object doesn't support item deletion")
+
+    def __len__(self):
+        return self._gravadas + len(self._novas)
+
+    def __iter__(self):
+        for posicao, _ in self.items():
+            yield posicao
+
+    def items(self):
+        # Uma consulta só, em vez de uma por posição
+        yield from self._docstore.conexao().execute("SELECT posicao, doc_id FROM fragmentos ORDER BY posicao")
+        yield from sorted(self._novas.items())
+
+    def values(self):
+        for _, doc_id in self.items():
+            yield doc_id
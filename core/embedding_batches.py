@@ -0,0 +1,80 @@
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from core.concurrency import LimitadorAdaptativo, LimitadorTaxa, eh_erro_transitorio, executar_com_retentativas, iterar_em_paralelo
+from core.config import EMBEDDINGS_TAMANHO_LOTE, EMBEDDINGS_MAX_CONCORRENCIA, EMBEDDINGS_REQUISICOES_POR_MINUTO
+
+_limitador: Optional[LimitadorAdaptativo] = None
+_lock = threading.Lock()
+
+
+def obter_limitador_embeddings() -> LimitadorAdaptativo:
+    """Limitador compartilhado por todas as sessões do processo, que dividem a mesma cota da API."""
+    global _limitador
+    with _lock:
+        if _limitador is None:
+            _limitador = LimitadorAdaptativo.por_minuto(EMBEDDINGS_REQUISICOES_POR_MINUTO, capacidade=EMBEDDINGS_MAX_CONCORRENCIA)
+        return _limitador
+
+def dividir_em_lotes(total: int, tamanho_lote: int = EMBEDDINGS_TAMANHO_LOTE) -> List[Tuple[int, int]]:
+    """Intervalos [início, fim) de até `tamanho_lote` itens."""
+    return [(inicio, min(inicio + tamanho_lote, total)) for inicio in range(0, total, max(1, tamanho_lote))]
+
+def iterar_lotes_de_embeddings(
+    embeddings,
+    lotes: Sequence[List[str]],
+    max_workers: int = EMBEDDINGS_MAX_CONCORRENCIA,
+    limitador: Optional[LimitadorTaxa] = None,
+) -> Iterator[Tuple[int, Union[np.ndarray, Exception]]]:
+    """
+    Entrega (índice do lote, vetores) à medida que cada lote termina, com no máximo `max_workers`
+    requisições em voo. Cada lote é repetido sozinho em erros transitórios; um lote que falha em
+    todas as tentativas volta como a exceção, sem interromper os demais.
+    """
+    limitador = limitador or obter_limitador_embeddings()
+
+    def _embed(textos: List[str]):
+        try:
+            return np.asarray(executar_com_retentativas(
+                lambda: embeddings.embed_documents(textos), limitador, repetir=eh_erro_transitorio
+            ), dtype=np.float32)
+        except Exception as e:
+            return e
+
+    yield from iterar_em_paralelo(_embed, lotes, max_workers=max_workers)
+
+def gerar_embeddings_em_lotes(embeddings, textos: List[str], tamanho_lote: int = EMBEDDINGS_TAMANHO_LOTE, **kwargs) -> np.ndarray:
+    """Vetores de todos os textos, na ordem, calculados em lotes simultâneos. Propaga o erro do primeiro lote que falhar."""
+    intervalos = dividir_em_lotes(len(textos), tamanho_lote)
+    matriz = None
+    for indice, vetores in iterar_lotes_de_embeddings(embeddings, [textos[i:f] for i, f in intervalos], **kwargs):
+        if isinstance(vetores, Exception):
+            raise vetores
+        if matriz is None:
+            matriz = np.empty((len(textos), vetores.shape[1]), dtype=np.float32)
+        inicio, fim = intervalos[indice]
+        matriz[inicio:fim] = vetores
+    return matriz if matriz is not None else np.zeros((0, 0), dtype=np.float32)
+
+def indexar_documentos_em_lotes(documentos: List[Document], embeddings, tamanho_lote: int = EMBEDDINGS_TAMANHO_LOTE, **kwargs) -> Optional[FAISS]:
+    """
+    Equivalente a `FAISS.from_documents`, com os embeddings em lotes simultâneos: cada lote entra
+    no índice assim que termina, sem acumular todos os vetores antes. As posições no índice seguem
+    a ordem de conclusão dos lotes; o docstore mantém a ligação com cada fragmento.
+    """
+    intervalos = dividir_em_lotes(len(documentos), tamanho_lote)
+    lotes = [[d.page_content for d in documentos[i:f]] for i, f in intervalos]
+    vector_store = None
+    for indice, vetores in iterar_lotes_de_embeddings(embeddings, lotes, **kwargs):
+        if isinstance(vetores, Exception):
+            raise vetores
+        inicio, fim = intervalos[indice]
+        pares = zip(lotes[indice], vetores)
+        metadados = [d.metadata for d in documentos[inicio:fim]]
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(pares, embeddings, metadatas=metadados)
+        else:
+            vector_store.add_embeddings(pares, metadatas=metadados)
+    return vector_store
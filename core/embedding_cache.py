@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from core.file_lock import trava_de_arquivo
+
+TAMANHO_CHAVE = 32  # bytes de um digest sha256
+
+def chave_embedding(modelo: str, tipo: str, texto: str) -> bytes:
+    """Digest que identifica um embedding: modelo + tipo de tarefa + texto do fragmento."""
+    return hashlib.sha256(f"{modelo}\0{tipo}\0{texto}".encode("utf-8")).digest()
+
+
+class ArmazemVetores:
+    """
+    Armazenamento em disco de vetores float32, somente de acréscimo.
+    `vetores.f32` guarda as linhas contíguas e `chaves.bin` o digest de cada linha, na mesma ordem.
+    """
+
+    def __init__(self, diretorio: Path):
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self._caminho_vetores = self.diretorio / "vetores.f32"
+        self._caminho_chaves = self.diretorio / "chaves.bin"
+        self._caminho_meta = self.diretorio / "meta.json"
+        self._caminho_trava = self.diretorio / "armazem.lock"
+        self._lock = threading.Lock()
+        self._indice: Dict[bytes, int] = {}
+        self._linhas_lidas = 0
+        self.dimensao: Optional[int] = None
+        self._carregar()
+
+    def _carregar(self):
+        with trava_de_arquivo(self._caminho_trava):
+            self._sincronizar()
+
+    def _sincronizar(self):
+        """
+        Alinha o índice com o disco; chamar com a trava de arquivo. Outros processos podem ter
+        acrescentado linhas desde a última leitura, então as posições vêm dos arquivos, não do índice.
+        """
+        if self.dimensao is None and self._caminho_meta.exists():
+            with open(self._caminho_meta, "r") as f:
+                self.dimensao = json.load(f)["dimensao"]
+        if not self.dimensao or not self._caminho_chaves.exists() or not self._caminho_vetores.exists():
+            return 0
+
+        tamanho_linha = self.dimensao * 4
+        tamanho_chaves = os.path.getsize(self._caminho_chaves)
+        tamanho_vetores = os.path.getsize(self._caminho_vetores)
+        # Descarta uma escrita interrompida no meio, mantendo apenas linhas completas nos dois arquivos
+        linhas = min(tamanho_chaves // TAMANHO_CHAVE, tamanho_vetores // tamanho_linha)
+        if tamanho_chaves != linhas * TAMANHO_CHAVE:
+            with open(self._caminho_chaves, "r+b") as f:
+                f.truncate(linhas * TAMANHO_CHAVE)
+        if tamanho_vetores != linhas * tamanho_linha:
+            with open(self._caminho_vetores, "r+b") as f:
+                f.truncate(linhas * tamanho_linha)
+
+        if linhas > self._linhas_lidas:
+            with open(self._caminho_chaves, "rb") as f:
+                f.seek(self._linhas_lidas * TAMANHO_CHAVE)
+                chaves = f.read((linhas - self._linhas_lidas) * TAMANHO_CHAVE)
+            for deslocamento in range(linhas - self._linhas_lidas):
+                chave = chaves[deslocamento * TAMANHO_CHAVE:(deslocamento + 1) * TAMANHO_CHAVE]
+                self._indice.setdefault(chave, self._linhas_lidas + deslocamento)
+        self._linhas_lidas = linhas
+        return linhas
+
+    def __len__(self):
+        return len(self._indice)
+
+    def __contains__(self, chave: bytes):
+        return chave in self._indice
+
+    def obter(self, chaves: List[bytes]) -> Dict[bytes, List[float]]:
+        """Lê do disco os vetores das chaves presentes no armazém."""
+        with self._lock:
+            linhas = {c: self._indice[c] for c in chaves if c in self._indice}
+        if not linhas:
+            return {}
+        tamanho_linha = self.dimensao * 4
+        encontrados = {}
+        with open(self._caminho_vetores, "rb") as f:
+            for chave, linha in linhas.items():
+                f.seek(linha * tamanho_linha)
+                encontrados[chave] = np.frombuffer(f.read(tamanho_linha), dtype=np.float32).tolist()
+        return encontrados
+
+    def gravar(self, itens: Dict[bytes, List[float]]):
+        """Acrescenta novos vetores ao final dos arquivos, com trava entre processos."""
+        if not itens:
+            return
+        with self._lock, trava_de_arquivo(self._caminho_trava):
+            primeira_linha = self._sincronizar()
+            novos = {c: v for c, v in itens.items() if c not in self._indice}
+            if not novos:
+                return
+            matriz = np.asarray(list(novos.values()), dtype=np.float32)
+            if self.dimensao is None:
+                self.dimensao = int(matriz.shape[1])
+                with open(self._caminho_meta, "w") as f:
+                    json.dump({"dimensao": self.dimensao}, f)
+            elif matriz.shape[1] != self.dimensao:
+                return  # Modelo mudou de dimensão: não mistura vetores incompatíveis
+
+            with open(self._caminho_vetores, "ab") as f:
+                f.write(matriz.tobytes())
+            with open(self._caminho_chaves, "ab") as f:
+                f.write(b"".join(novos.keys()))
+            for deslocamento, chave in enumerate(novos.keys()):
+                self._indice[chave] = primeira_linha + deslocamento
+            self._linhas_lidas = primeira_linha + len(novos)
+
+
+_armazens: Dict[Path, ArmazemVetores] = {}
+_lock_armazens = threading.Lock()
+
+def obter_armazem(diretorio: Path) -> ArmazemVetores:
+    """Retorna o armazém do diretório, compartilhado por todas as sessões do processo."""
+    diretorio = Path(diretorio).resolve()
+    with _lock_armazens:
+        if diretorio not in _armazens:
+            _armazens[diretorio] = ArmazemVetores(diretorio)
+        return _armazens[diretorio]
+
+
+class EmbeddingsComCache(Embeddings):
+    """
+    Envolve um objeto de embeddings e só envia à API os textos que ainda não estão no cache em disco.
+    """
+
+    def __init__(self, embeddings: Embeddings, diretorio_cache: Path, nome_modelo: Optional[str] = None):
+        self.embeddings = embeddings
+        self.nome_modelo = nome_modelo or getattr(embeddings, "model", type(embeddings).__name__)
+        pasta_modelo = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.nome_modelo)
+        self.armazem = obter_armazem(Path(diretorio_cache) / pasta_modelo)
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, nome):
+        # Mantém acessíveis os atributos do objeto original (ex: `model`)
+        if nome == "embeddings":
+            raise AttributeError(nome)
+        return getattr(self.embeddings, nome)
+
+    def _embed_com_cache(self, textos: List[str], tipo: str, calcular) -> List[List[float]]:
+        chaves = [chave_embedding(self.nome_modelo, tipo, t) for t in textos]
+        encontrados = self.armazem.obter(chaves)
+
+        pendentes = {}
+        for chave, texto in zip(chaves, textos):
+            if chave not in encontrados and chave not in pendentes:
+                pendentes[chave] = texto
+
+        acertos = sum(1 for c in chaves if c in encontrados)
+        with self._lock:  # a ingestão chama o cache de várias threads
+            self.acertos += acertos
+            self.falhas += len(chaves) - acertos
+
+        if pendentes:
+            # Arredonda para float32 já na primeira vez, para que acertos e falhas devolvam os mesmos valores
+            vetores = np.asarray(calcular(list(pendentes.values())), dtype=np.float32).tolist()
+            novos = dict(zip(pendentes.keys(), vetores))
+            self.armazem.gravar(novos)
+            encontrados.update(novos)
+
+        return [list(encontrados[c]) for c in chaves]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_com_cache(texts, "documento", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_com_cache([text], "consulta", lambda t: [self.embeddings.embed_query(t[0])])[0]
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Contadores de acertos/falhas desde a criação do objeto e total de vetores em disco."""
+        return {"acertos": self.acertos, "falhas": self.falhas, "armazenados": len(self.armazem)}
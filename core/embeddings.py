@@ -1,16 +1,19 @@
 import streamlit as st
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from core.config import CACHE_DIR
+from core.embedding_cache import EmbeddingsComCache
 
 def init_embeddings(api_key: str):
     """
-    Inicializa e retorna o objeto de embeddings do Google Generative AI.
+    Inicializa e retorna o objeto de embeddings do Google Generative AI,
+    envolvido por um cache em disco para não recalcular fragmentos já vistos.
     """
     if not api_key:
         return None
     try:
         # Utiliza o modelo de embedding-001 para criar os vetores
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        return embeddings
+        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
+        return EmbeddingsComCache(embeddings, CACHE_DIR / "embeddings")
     except Exception as e:
         st.sidebar.error(f"Erro ao inicializar embeddings: {e}")
         return None
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.load import dumps, loads
+
+def chave_resposta_llm(prompt: str, llm_string: str) -> str:
+    """
+    Digest de uma chamada ao LLM. `llm_string` já serializa modelo, temperatura e demais
+    parâmetros; `prompt` é o prompt final, com todas as entradas interpoladas.
+    """
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class CacheLLMPersistente(BaseCache):
+    """
+    Cache de respostas do LLM em SQLite, compartilhado entre sessões e processos do Streamlit.
+    Quando o tamanho total das respostas passa de `tamanho_maximo_bytes`, as entradas
+    acessadas há mais tempo são removidas (LRU).
+    """
+
+    def __init__(self, caminho: Path, tamanho_maximo_bytes: int):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self._local = threading.local()
+        with self._conexao() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                " chave TEXT PRIMARY KEY, valor TEXT NOT NULL,"
+                " tamanho INTEGER NOT NULL, ultimo_acesso REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (ultimo_acesso)")
+
+    def _conexao(self) -> sqlite3.Connection:
+        # Uma conexão por thread; WAL permite leitores e um escritor simultâneos entre processos
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.caminho), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        chave = chave_resposta_llm(prompt, llm_string)
+        try:
+            with self._conexao() as conn:
+                linha = conn.execute("SELECT valor FROM respostas WHERE chave = ?", (chave,)).fetchone()
+                if linha is None:
+                    return None
+                conn.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave))
+            return [loads(g) for g in json.loads(linha[0])]
+        except Exception:
+            return None  # Um cache ilegível nunca deve impedir a chamada ao modelo
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        chave = chave_resposta_llm(prompt, llm_string)
+        try:
+            valor = json.dumps([dumps(g) for g in return_val])
+            with self._conexao() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO respostas (chave, valor, tamanho, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                    (chave, valor, len(valor), time.time()),
+                )
+                self._despejar(conn)
+        except Exception:
+            pass
+
+    def _despejar(self, conn: sqlite3.Connection):
+        """Remove as entradas menos usadas recentemente até o cache voltar ao tamanho máximo."""
+        total = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        excesso = total - self.tamanho_maximo_bytes
+        if excesso <= 0:
+            return
+        removidas = []
+        for chave, tamanho in conn.execute("SELECT chave, tamanho FROM respostas ORDER BY ultimo_acesso"):
+            removidas.append((chave,))
+            excesso -= tamanho
+            if excesso <= 0:
+                break
+        conn.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+
+    def clear(self, **kwargs) -> None:
+        with self._conexao() as conn:
+            conn.execute("DELETE FROM respostas")
+
+
+def ativar_cache_llm(caminho: Path, tamanho_maximo_bytes: int) -> BaseCache:
+    """Registra o cache persistente como cache global do LangChain (uma vez por processo)."""
+    cache_atual = get_llm_cache()
+    if isinstance(cache_atual, CacheLLMPersistente) and cache_atual.caminho == Path(caminho):
+        return cache_atual
+    cache = CacheLLMPersistente(caminho, tamanho_maximo_bytes)
+    set_llm_cache(cache)
+    return cache
@@ -0,0 +1,294 @@
+import asyncio
+import heapq
+import itertools
+import queue
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Sequence, Tuple
+from core.concurrency import LimitadorAdaptativo, eh_erro_limite_taxa, eh_erro_transitorio
+from core.config import (
+    LLM_MAX_CONCORRENCIA, LLM_MAX_CONCORRENCIA_GLOBAL, LLM_REQUISICOES_POR_MINUTO,
+    LLM_TENTATIVAS, LLM_VAGAS_INTERATIVAS
+)
+
+# Prioridades dos pedidos: o menor número sai da fila primeiro
+PRIORIDADE_INTERATIVA = 0  # chat: o usuário está esperando a resposta
+PRIORIDADE_NORMAL = 1      # análises pedidas na hora (resumo, riscos, conformidade de um documento)
+PRIORIDADE_LOTE = 2        # extração em massa (dashboard, eventos, OCR, conformidade em lote)
+
+_motor = None
+_lock = threading.Lock()
+
+
+def modelo_do_runnable(runnable) -> str:
+    """Nome do modelo por trás de um cliente, de uma LLMChain ou de uma sequência `prompt | llm`."""
+    for candidato in (runnable, getattr(runnable, "llm", None), getattr(runnable, "last", None)):
+        modelo = getattr(candidato, "model", None)
+        if isinstance(modelo, str):
+            return modelo
+    return "padrao"
+
+
+class _Pedido:
+    __slots__ = ("prioridade", "sequencia", "modelo", "fabrica", "futuro", "repetir", "tentativa", "tarefa")
+
+    def __init__(self, prioridade, sequencia, modelo, fabrica, futuro, repetir):
+        self.prioridade = prioridade
+        self.sequencia = sequencia
+        self.modelo = modelo
+        self.fabrica = fabrica
+        self.futuro = futuro
+        self.repetir = repetir
+        self.tentativa = 0
+        self.tarefa = None
+
+    def __lt__(self, outro):
+        return (self.prioridade, self.sequencia) < (outro.prioridade, outro.sequencia)
+
+
+class MotorLLM:
+    """
+    Executa as chamadas ao LLM de todas as sessões num único event loop em segundo plano, com
+    `ainvoke`/`astream`. Os pedidos esperam em filas de prioridade por modelo e só saem quando há
+    vaga no total (`max_concorrencia`), no modelo (`max_por_modelo`) e no limite de requisições por
+    minuto do modelo. As últimas `vagas_interativas` vagas (e fichas do limite de taxa) ficam
+    reservadas ao chat, que assim não espera a extração em massa terminar. Erros transitórios voltam à fila após um backoff, sem ocupar vaga.
+
+    Os métodos públicos podem ser chamados de qualquer thread (inclusive das sessões do Streamlit).
+    """
+
+    def __init__(
+        self,
+        max_concorrencia: int = LLM_MAX_CONCORRENCIA_GLOBAL,
+        max_por_modelo: int = LLM_MAX_CONCORRENCIA,
+        requisicoes_por_minuto: float = LLM_REQUISICOES_POR_MINUTO,
+        vagas_interativas: int = LLM_VAGAS_INTERATIVAS,
+        tentativas: int = LLM_TENTATIVAS,
+    ):
+        self.max_concorrencia = max(1, max_concorrencia)
+        self.max_por_modelo = max(1, max_por_modelo)
+        self.requisicoes_por_minuto = requisicoes_por_minuto
+        # Sempre sobra ao menos uma vaga, por modelo e no total, para os pedidos que não são interativos
+        self.vagas_interativas = max(0, min(vagas_interativas, self.max_por_modelo - 1, self.max_concorrencia - 1))
+        self.tentativas = max(1, tentativas)
+        self.estatisticas = {"concluidos": 0, "falhas": 0, "retentativas": 0}
+
+        # Estado abaixo só é alterado dentro do event loop, sem precisar de locks
+        self._filas: Dict[str, List[_Pedido]] = {}
+        self._em_voo: Dict[str, int] = {}
+        self._em_voo_total = 0
+        self._limitadores: Dict[str, LimitadorAdaptativo] = {}
+        self._sequencia = itertools.count()
+        self._despertar = None
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="motor-llm", daemon=True).start()
+
+    # --- Dentro do event loop ---
+
+    def _limitador(self, modelo: str) -> LimitadorAdaptativo:
+        if modelo not in self._limitadores:
+            # Rajada curta: a cota é por janela de tempo, e as vagas já limitam o paralelismo
+            self._limitadores[modelo] = LimitadorAdaptativo.por_minuto(self.requisicoes_por_minuto, capacidade=1 + self.vagas_interativas)
+        return self._limitadores[modelo]
+
+    def _reserva(self, pedido: _Pedido) -> int:
+        return 0 if pedido.prioridade <= PRIORIDADE_INTERATIVA else self.vagas_interativas
+
+    def _tem_vaga(self, pedido: _Pedido) -> bool:
+        reserva = self._reserva(pedido)
+        return (self._em_voo_total < self.max_concorrencia - reserva
+                and self._em_voo.get(pedido.modelo, 0) < self.max_por_modelo - reserva)
+
+    def _enfileirar(self, pedido: _Pedido):
+        if pedido.futuro.done():
+            return
+        heapq.heappush(self._filas.setdefault(pedido.modelo, []), pedido)
+        self._despachar()
+
+    def _despachar(self):
+        """Inicia, em ordem de prioridade, os pedidos que cabem nas vagas e no limite de cada modelo."""
+        while True:
+            candidatos = []
+            for fila in self._filas.values():
+                # Pedidos cancelados por quem esperava (ex: sessão encerrada) são descartados
+                while fila and fila[0].futuro.done():
+                    heapq.heappop(fila)
+                if fila and self._tem_vaga(fila[0]):
+                    candidatos.append(fila[0])
+            iniciado = False
+            for pedido in sorted(candidatos):
+                # O chat também tem fichas reservadas no limite de taxa, para não esperar a próxima reposição
+                espera = self._limitador(pedido.modelo).tentar_adquirir(reserva=self._reserva(pedido))
+                if espera:
+                    self._agendar_despertar(espera)
+                    continue
+                heapq.heappop(self._filas[pedido.modelo])
+                self._em_voo_total += 1
+                self._em_voo[pedido.modelo] = self._em_voo.get(pedido.modelo, 0) + 1
+                pedido.tarefa = self._loop.create_task(self._executar(pedido))
+                iniciado = True
+                break
+            if not iniciado:
+                return
+
+    def _agendar_despertar(self, espera: float):
+        # Um único temporizador, o mais próximo, para voltar a despachar quando o limite de taxa liberar
+        quando = self._loop.time() + espera
+        if self._despertar is not None and self._despertar.when() <= quando:
+            return
+        if self._despertar is not None:
+            self._despertar.cancel()
+        self._despertar = self._loop.call_at(quando, self._ao_despertar)
+
+    def _ao_despertar(self):
+        self._despertar = None
+        self._despachar()
+
+    async def _executar(self, pedido: _Pedido):
+        try:
+            resultado = await pedido.fabrica()
+            erro = None
+        except Exception as e:
+            resultado, erro = None, e
+        finally:
+            # Vaga liberada, inclusive se a chamada foi cancelada
+            self._em_voo_total -= 1
+            self._em_voo[pedido.modelo] -= 1
+            self._loop.call_soon(self._despachar)
+
+        limitador = self._limitador(pedido.modelo)
+        if erro is None:
+            limitador.aumentar()
+            self.estatisticas["concluidos"] += 1
+            if not pedido.futuro.done():
+                pedido.futuro.set_result(resultado)
+        elif pedido.tentativa + 1 < self.tentativas and pedido.repetir(erro) and not pedido.futuro.done():
+            if eh_erro_limite_taxa(erro):
+                limitador.reduzir()
+            self.estatisticas["retentativas"] += 1
+            espera = random.uniform(0, min(30.0, 2 ** pedido.tentativa))
+            pedido.tentativa += 1
+            self._loop.call_later(espera, self._enfileirar, pedido)
+        else:
+            self.estatisticas["falhas"] += 1
+            if not pedido.futuro.done():
+                pedido.futuro.set_exception(erro)
+
+    async def _aguardar(self, fabrica, modelo, prioridade, repetir):
+        pedido = _Pedido(prioridade, next(self._sequencia), modelo, fabrica, self._loop.create_future(), repetir)
+        self._enfileirar(pedido)
+        try:
+            return await pedido.futuro
+        finally:
+            # Quem esperava desistiu: a chamada em andamento também é cancelada
+            if pedido.tarefa is not None and not pedido.tarefa.done():
+                pedido.tarefa.cancel()
+
+    # --- API para as threads das sessões ---
+
+    def submeter(
+        self,
+        fabrica: Callable[[], Awaitable[Any]],
+        modelo: str,
+        prioridade: int = PRIORIDADE_NORMAL,
+        repetir: Callable[[Exception], bool] = eh_erro_transitorio,
+    ) -> Future:
+        """
+        Coloca na fila a corrotina criada por `fabrica` (chamada de novo a cada tentativa).
+        O Future devolvido pode ser cancelado, o que tira o pedido da fila ou interrompe a chamada.
+        """
+        return asyncio.run_coroutine_threadsafe(self._aguardar(fabrica, modelo, prioridade, repetir), self._loop)
+
+    def executar(self, fabrica: Callable[[], Awaitable[Any]], modelo: str, prioridade: int = PRIORIDADE_NORMAL, **kwargs):
+        """Como `submeter`, esperando o resultado."""
+        futuro = self.submeter(fabrica, modelo, prioridade, **kwargs)
+        try:
+            return futuro.result()
+        finally:
+            futuro.cancel()
+
+    def invocar(self, runnable, entrada, prioridade: int = PRIORIDADE_NORMAL, **kwargs):
+        """Equivalente a `runnable.invoke(entrada)`, pela fila do motor."""
+        return self.executar(lambda: runnable.ainvoke(entrada, **kwargs), modelo_do_runnable(runnable), prioridade)
+
+    def iterar_em_lote(self, runnable, entradas: Sequence, prioridade: int = PRIORIDADE_LOTE, **kwargs) -> Iterator[Tuple[int, Any]]:
+        """
+        Envia todas as entradas de uma vez e entrega (índice, resultado ou exceção) à medida que
+        cada uma termina. O motor decide quantas ficam em voo; se quem consome parar de iterar,
+        as que ainda estão na fila são canceladas.
+        """
+        modelo = modelo_do_runnable(runnable)
+        futuros = {
+            self.submeter(lambda entrada=entrada: runnable.ainvoke(entrada, **kwargs), modelo, prioridade): indice
+            for indice, entrada in enumerate(entradas)
+        }
+        try:
+            pendentes = set(futuros)
+            while pendentes:
+                concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    erro = futuro.exception()
+                    yield futuros[futuro], erro if erro is not None else futuro.result()
+        finally:
+            for futuro in futuros:
+                futuro.cancel()
+
+    def invocar_em_lote(self, runnable, entradas: Sequence, prioridade: int = PRIORIDADE_LOTE,
+                        return_exceptions: bool = False, **kwargs) -> List[Any]:
+        """Equivalente a `runnable.batch(entradas)`: resultados na ordem das entradas."""
+        resultados: List[Any] = [None] * len(entradas)
+        for indice, resultado in self.iterar_em_lote(runnable, entradas, prioridade, **kwargs):
+            if isinstance(resultado, Exception) and not return_exceptions:
+                raise resultado
+            resultados[indice] = resultado
+        return resultados
+
+    def fluxo(self, runnable, entrada, prioridade: int = PRIORIDADE_INTERATIVA, **kwargs) -> Iterator[Any]:
+        """
+        Equivalente a `runnable.stream(entrada)`, ocupando uma vaga do motor enquanto a resposta
+        é gerada. Só repete a chamada em erro transitório se nenhum pedaço tiver sido entregue.
+        """
+        pedacos: "queue.Queue" = queue.Queue()
+        fim = object()
+        emitiu = False
+
+        async def _transmitir():
+            nonlocal emitiu
+            async for pedaco in runnable.astream(entrada, **kwargs):
+                emitiu = True
+                pedacos.put(pedaco)
+
+        futuro = self.submeter(
+            _transmitir, modelo_do_runnable(runnable), prioridade,
+            repetir=lambda erro: not emitiu and eh_erro_transitorio(erro),
+        )
+        futuro.add_done_callback(lambda _: pedacos.put(fim))
+        try:
+            while True:
+                pedaco = pedacos.get()
+                if pedaco is fim:
+                    break
+                yield pedaco
+            futuro.result()
+        finally:
+            futuro.cancel()
+
+    def estado(self) -> dict:
+        """Pedidos na fila e em voo e taxa atual do limitador, por modelo, e contadores desde o início do processo."""
+        return {
+            "na_fila": {modelo: len(fila) for modelo, fila in list(self._filas.items())},
+            "em_voo": dict(self._em_voo),
+            "requisicoes_por_minuto": {modelo: l.taxa_por_segundo * 60 for modelo, l in list(self._limitadores.items())},
+            **self.estatisticas,
+        }
+
+
+def obter_motor_llm() -> MotorLLM:
+    """Motor compartilhado por todas as sessões do processo, que dividem a mesma cota da API."""
+    global _motor
+    with _lock:
+        if _motor is None:
+            _motor = MotorLLM()
+        return _motor
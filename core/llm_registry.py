@@ -0,0 +1,126 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Optional
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_google_genai.chat_models import ChatGoogleGenerativeAIError, _response_to_result
+from core.bm25 import RetrieverHibrido, obter_indice_bm25
+
+# Objetos reaproveitados entre reruns e sessões do Streamlit, no nível do processo.
+# Clientes do LLM mantêm a conexão HTTP aberta; prompts e cadeias não precisam ser recompilados.
+# Clientes e cadeias são separados por chave de API: uma sessão nunca usa a chave de outra.
+_llms = {}
+# Prompts e cadeias variam com as instruções de formato de cada extração: só os mais recentes ficam
+MAX_PROMPTS_E_CADEIAS = 128
+_prompts: "OrderedDict[tuple, PromptTemplate]" = OrderedDict()
+_cadeias: "OrderedDict[tuple, LLMChain]" = OrderedDict()
+# Retrievers por vector store, descartados junto com ele
+_retrievers = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+async def _chamar_gemini(corrotina):
+    try:
+        return await corrotina
+    except Exception as e:
+        # Mesma tradução de erro do cliente original
+        from google.api_core.exceptions import InvalidArgument
+        if isinstance(e, InvalidArgument):
+            raise ChatGoogleGenerativeAIError(f"Invalid argument provided to Gemini: {e}") from e
+        raise
+
+
+class ChatGeminiSemRetentativas(ChatGoogleGenerativeAI):
+    """
+    Cliente cujas chamadas assíncronas (`ainvoke`/`astream`, feitas só pelo motor do LLM) não passam
+    pelo retry interno do langchain-google-genai 1.0.1: até 10 tentativas com esperas de até 60 s,
+    que prendiam a vaga do motor por minutos num 429 e escondiam o erro do limitador adaptativo.
+    Erros transitórios chegam ao motor, que os devolve à fila. As chamadas síncronas mantêm o retry.
+    Reproduz `_agenerate`/`_astream` da versão travada em requirements.txt.
+    """
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        params, chat, message = self._prepare_chat(messages, stop=stop, **kwargs)
+        resposta = await _chamar_gemini(chat.send_message_async(content=message, **params))
+        return _response_to_result(resposta)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        params, chat, message = self._prepare_chat(messages, stop=stop, **kwargs)
+        resposta = await _chamar_gemini(chat.send_message_async(content=message, **params, stream=True))
+        async for pedaco in resposta:
+            geracao = _response_to_result(pedaco, stream=True).generations[0]
+            if run_manager:
+                await run_manager.on_llm_new_token(geracao.text)
+            yield geracao
+
+
+def _congelar(valores: Optional[dict]) -> tuple:
+    return tuple(sorted((valores or {}).items()))
+
+def _buscar_lru(cache: OrderedDict, chave, criar):
+    """Valor de `chave` no cache (criado com `criar` se faltar), descartando o menos usado acima do limite."""
+    with _lock:
+        if chave in cache:
+            cache.move_to_end(chave)
+        else:
+            cache[chave] = criar()
+            if len(cache) > MAX_PROMPTS_E_CADEIAS:
+                cache.popitem(last=False)
+        return cache[chave]
+
+def obter_llm(modelo: str = "gemini-2.5-pro", temperatura: float = 0.1, google_api_key: Optional[str] = None, **kwargs) -> ChatGoogleGenerativeAI:
+    """
+    Cliente do modelo para (chave de API, modelo, temperatura, demais parâmetros), criado uma vez por processo.
+    As retentativas das chamadas pelo motor ficam com o motor (ver `ChatGeminiSemRetentativas`).
+    Sem `google_api_key`, usa a GOOGLE_API_KEY do ambiente (ex: a dos Secrets).
+    """
+    google_api_key = google_api_key or os.environ.get("GOOGLE_API_KEY")
+    chave = (google_api_key, modelo, temperatura, _congelar(kwargs))
+    with _lock:
+        if chave not in _llms:
+            _llms[chave] = ChatGeminiSemRetentativas(
+                model=modelo, temperature=temperatura, google_api_key=google_api_key, **kwargs
+            )
+        return _llms[chave]
+
+def obter_prompt(template: str, **parciais) -> PromptTemplate:
+    """PromptTemplate compilado para o texto do template e as variáveis parciais (ex: idioma)."""
+    def _criar():
+        prompt = PromptTemplate.from_template(template)
+        return prompt.partial(**parciais) if parciais else prompt
+
+    return _buscar_lru(_prompts, (template, _congelar(parciais)), _criar)
+
+def obter_cadeia(template: str, modelo: str = "gemini-2.5-pro", temperatura: float = 0.1,
+                 google_api_key: Optional[str] = None, **parciais) -> LLMChain:
+    """LLMChain para (chave de API, modelo, temperatura, template, variáveis parciais)."""
+    google_api_key = google_api_key or os.environ.get("GOOGLE_API_KEY")
+    prompt = obter_prompt(template, **parciais)
+    llm = obter_llm(modelo, temperatura, google_api_key)
+    chave = (google_api_key, modelo, temperatura, template, _congelar(parciais))
+    return _buscar_lru(_cadeias, chave, lambda: LLMChain(llm=llm, prompt=prompt))
+
+def obter_retriever(vector_store, k: int = 5, fonte: Optional[str] = None):
+    """
+    Retriever híbrido (FAISS + BM25) do vector store, opcionalmente filtrado por arquivo de origem.
+    Fica associado ao objeto do vector store até `invalidar_vector_store` ou até o vector store
+    ser descartado: o retriever guarda só uma referência fraca a ele, para não mantê-lo vivo.
+    """
+    with _lock:
+        do_vector_store = _retrievers.setdefault(vector_store, {})
+        retriever = do_vector_store.get((k, fonte))
+        if retriever is None:
+            retriever = RetrieverHibrido(
+                vector_store=weakref.ref(vector_store), indice=obter_indice_bm25(vector_store), k=k, fonte=fonte
+            )
+            do_vector_store[(k, fonte)] = retriever
+        return retriever
+
+def invalidar_vector_store(vector_store) -> None:
+    """Descarta os retrievers de um vector store que deixou de ser usado (ex: outra coleção carregada)."""
+    if vector_store is None:
+        return
+    with _lock:
+        _retrievers.pop(vector_store, None)
@@ -31,7 +31,24 @@ TRANSLATIONS = {
         "sidebar_load_collection_placeholder": "Selecione uma coleção",
         "sidebar_load_collection_button": "Carregar coleção",
         "sidebar_load_collection_error": "Selecione uma coleção e certifique-se que a API Key está configurada.",
+        "sidebar_load_collection_legacy": "A coleção \"{colecao}\" está no formato antigo e não pode ser aberta diretamente. Migre-a com: python -m services.collections",
+        "sidebar_add_to_collection_button": "Adicionar à coleção '{colecao}'",
+        "sidebar_remove_document_label": "Remover documento da coleção:",
+        "sidebar_remove_document_button": "Remover documento",
+        "sidebar_collection_updated": "Coleção '{colecao}' atualizada.",
         "sidebar_process_button": "Processar Documentos Carregados",
+        "sidebar_embedding_cache_stats": "Cache de embeddings: {acertos} fragmentos reaproveitados, {falhas} enviados à API.",
+        "sidebar_llm_metrics_expander": "Uso dos modelos de IA por tarefa",
+        "sidebar_llm_metrics_caption": "Latência e custo estimados desde o início do processo. \"reprovadas_%\" é a fração de respostas do modelo rápido refeitas no modelo avançado.",
+        "sidebar_ingestion_progress": "Processando documentos ({etapa}): {concluidas}/{total} etapas",
+        "sidebar_ingestion_file_error": "Não foi possível processar {arquivo}: {erro}",
+        "sidebar_ingestion_failed": "Nenhum documento pôde ser processado.",
+        "ingestion_stage_extrair": "extração de texto",
+        "ingestion_stage_ocr": "OCR",
+        "ingestion_stage_fragmentar": "fragmentação",
+        "ingestion_stage_deduplicar": "remoção de trechos repetidos",
+        "ingestion_stage_embeddings": "embeddings",
+        "ingestion_stage_indexar": "indexação",
         # Chat
         "chat_header": "Chat com Contratos",
         "chat_info_load_docs": "Carregue documentos na barra lateral para iniciar o chat.",
@@ -39,10 +56,13 @@ TRANSLATIONS = {
         "chat_expander_sources": "Ver Fontes",
         "chat_source_label": "Fonte:",
         "chat_page_label": "Página:",
+        "chat_also_in_label": "Mesmo trecho também em: {referencias}",
         "chat_input_placeholder": "Digite sua pergunta sobre os contratos...",
         "chat_spinner_thinking": "Analisando documentos...",
         "chat_error": "Ocorreu um erro ao processar sua pergunta:",
         "chat_prompt": "Use os trechos de contexto para responder à pergunta em {language}. Responda de forma completa e explicativa com base no contexto. Se o contexto não contiver a resposta, informe que não encontrou a informação nos documentos.\n\nCONTEXTO:\n{context}\n\nPERGUNTA:\n{question}\n\nRESPOSTA:",
+        "chat_latency_caption": "Primeiro token em {primeiro_token:.1f}s · resposta completa em {total:.1f}s",
+        "chat_semantic_cache_caption": "Resposta reaproveitada de uma pergunta semelhante (similaridade {similaridade:.2f})",
         # Dashboard
         "dashboard_header": "Dashboard Dinâmico",
         "dashboard_markdown": "Clique no botão para que a IA analise os contratos, identifique os dados mais relevantes e gere um dashboard comparativo.",
@@ -62,6 +82,7 @@ TRANSLATIONS = {
         "summary_selectbox_placeholder": "Selecione um arquivo",
         "summary_selectbox_label": "Escolha um contrato para resumir:",
         "summary_button": "Gerar Resumo para {filename}",
+        "summary_warning_no_text": "Não foi possível extrair conteúdo de texto do documento.",
         "summary_prompt": "Crie um resumo executivo em {language} em 5 a 7 tópicos (bullet points) para o contrato abaixo. Destaque: partes, objeto, prazo, valores e condições de rescisão.",
         # Riscos
         "risks_header": "Análise de Riscos",
@@ -87,6 +108,19 @@ TRANSLATIONS = {
         "compliance_button": "Verificar Conformidade",
         "compliance_error_read": "Erro ao ler o arquivo {filename}: {e}",
         "compliance_warning_same_doc": "Por favor, selecione dois documentos diferentes para a comparação.",
+        "compliance_no_divergences": "Nenhuma divergência encontrada: as {identicas} cláusulas do documento são idênticas às da referência.",
+        "compliance_mode_label": "Modo de verificação:",
+        "compliance_mode_single": "Um documento",
+        "compliance_mode_batch": "Todos os documentos contra a referência",
+        "compliance_batch_button": "Verificar Todos os Documentos",
+        "compliance_batch_col_doc": "Documento",
+        "compliance_batch_col_status": "Status",
+        "compliance_batch_col_identical": "Cláusulas idênticas",
+        "compliance_batch_col_divergent": "Itens divergentes",
+        "compliance_batch_status_pending": "Na fila",
+        "compliance_batch_status_done": "Concluído",
+        "compliance_batch_status_cached": "Concluído (cache)",
+        "compliance_batch_status_error": "Erro",
         # Anomalias
         "anomalias_header": "Detecção de Anomalias",
         "anomalias_markdown": "Esta aba analisa os dados extraídos do dashboard para encontrar valores que fogem do padrão (outliers).",
@@ -97,6 +131,12 @@ TRANSLATIONS = {
         # Dynamic Analyzer
         "dynamic_analyzer_prompt": "Você é um analista de dados sênior. Sua tarefa é analisar textos de contratos e identificar de 5 a 7 pontos de dados que seriam interessantes para comparar em um dashboard. Sua resposta e descrições devem ser em {language}. IMPORTANTE: A sua resposta final deve ser APENAS o objeto JSON, sem nenhum texto adicional, explicação ou formatação markdown.",
         "dynamic_analyzer_field_description": "A descrição humanamente legível do campo, formulada como uma pergunta em {language}, ex: 'Qual o valor total do contrato?'.",
+        "map_reduce_map_prompt": "Você está analisando o trecho {parte} de {total} de um contrato. Tarefa final: {objetivo}\nExtraia deste trecho, em {language}, apenas as informações relevantes para essa tarefa, de forma concisa. Se não houver nada relevante, responda apenas \"-\".\n\nTRECHO:\n{texto}\n\nNOTAS:",
+        "map_reduce_combine_prompt": "Tarefa final: {objetivo}\nCombine as notas parciais abaixo, extraídas de partes consecutivas do mesmo contrato, em uma única nota em {language}, sem repetições e sem perder fatos relevantes.\n\nNOTAS PARCIAIS:\n{texto}\n\nNOTA COMBINADA:",
+        "map_reduce_partial_label": "Parte {parte} de {total} analisada",
+        "spinner_extracting_file": "Extraindo dados de {filename}...",
+        "warning_ai_no_key_points": "A IA não conseguiu identificar pontos chave para extração. O dashboard não será gerado.",
+        "warning_extraction_error": "Erro no campo {field} de {filename}: {e}",
     },
     "en": {
         # Geral
@@ -129,7 +169,24 @@ TRANSLATIONS = {
         "sidebar_load_collection_placeholder": "Select a collection",
         "sidebar_load_collection_button": "Load collection",
         "sidebar_load_collection_error": "Select a collection and ensure the API Key is configured.",
+        "sidebar_load_collection_legacy": "The collection \"{colecao}\" uses the old format and cannot be opened directly. Migrate it with: python -m services.collections",
+        "sidebar_add_to_collection_button": "Add to collection '{colecao}'",
+        "sidebar_remove_document_label": "Remove document from the collection:",
+        "sidebar_remove_document_button": "Remove document",
+        "sidebar_collection_updated": "Collection '{colecao}' updated.",
         "sidebar_process_button": "Process Uploaded Documents",
+        "sidebar_embedding_cache_stats": "Embedding cache: {acertos} chunks reused, {falhas} sent to the API.",
+        "sidebar_llm_metrics_expander": "AI model usage by task",
+        "sidebar_llm_metrics_caption": "Estimated latency and cost since the process started. \"reprovadas_%\" is the share of fast-model answers redone on the advanced model.",
+        "sidebar_ingestion_progress": "Processing documents ({etapa}): {concluidas}/{total} steps",
+        "sidebar_ingestion_file_error": "Could not process {arquivo}: {erro}",
+        "sidebar_ingestion_failed": "No document could be processed.",
+        "ingestion_stage_extrair": "text extraction",
+        "ingestion_stage_ocr": "OCR",
+        "ingestion_stage_fragmentar": "splitting",
+        "ingestion_stage_deduplicar": "duplicate removal",
+        "ingestion_stage_embeddings": "embeddings",
+        "ingestion_stage_indexar": "indexing",
         # Chat
         "chat_header": "Chat with Contracts",
         "chat_info_load_docs": "Upload documents in the sidebar to start the chat.",
@@ -137,10 +194,13 @@ TRANSLATIONS = {
         "chat_expander_sources": "View Sources",
         "chat_source_label": "Source:",
         "chat_page_label": "Page:",
+        "chat_also_in_label": "Same passage also in: {referencias}",
         "chat_input_placeholder": "Type your question about the contracts...",
         "chat_spinner_thinking": "Analyzing documents...",
         "chat_error": "An error occurred while processing your question:",
         "chat_prompt": "Use the context snippets to answer the question in {language}. Provide a complete and explanatory answer based on the context. If the context does not contain the answer, state that you could not find the information in the documents.\n\nCONTEXT:\n{context}\n\nQUESTION:\n{question}\n\nANSWER:",
+        "chat_latency_caption": "First token in {primeiro_token:.1f}s · full answer in {total:.1f}s",
+        "chat_semantic_cache_caption": "Answer reused from a similar question (similarity {similaridade:.2f})",
         # Dashboard
         "dashboard_header": "Dynamic Dashboard",
         "dashboard_markdown": "Click the button for the AI to analyze the contracts, identify the most relevant data points, and generate a comparative dashboard.",
@@ -160,6 +220,7 @@ TRANSLATIONS = {
         "summary_selectbox_placeholder": "Select a file",
         "summary_selectbox_label": "Choose a contract to summarize:",
         "summary_button": "Generate Summary for {filename}",
+        "summary_warning_no_text": "Could not extract text content from the document.",
         "summary_prompt": "Create an executive summary in {language} in 5 to 7 bullet points for the contract below. Highlight: parties, object, term, values, and termination conditions.",
         # Risks
         "risks_header": "Risk Analysis",
@@ -185,6 +246,19 @@ TRANSLATIONS = {
         "compliance_button": "Check Compliance",
         "compliance_error_read": "Error reading file {filename}: {e}",
         "compliance_warning_same_doc": "Please select two different documents for comparison.",
+        "compliance_no_divergences": "No divergences found: all {identicas} clauses of the document match the reference.",
+        "compliance_mode_label": "Check mode:",
+        "compliance_mode_single": "One document",
+        "compliance_mode_batch": "All documents against the reference",
+        "compliance_batch_button": "Check All Documents",
+        "compliance_batch_col_doc": "Document",
+        "compliance_batch_col_status": "Status",
+        "compliance_batch_col_identical": "Identical clauses",
+        "compliance_batch_col_divergent": "Divergent items",
+        "compliance_batch_status_pending": "Queued",
+        "compliance_batch_status_done": "Done",
+        "compliance_batch_status_cached": "Done (cached)",
+        "compliance_batch_status_error": "Error",
         # Anomalias
         # CORRIGIDO: Chave alterada de 'anomalies_header' para 'anomalias_header' para consistência com o código Python.
         "anomalias_header": "Anomaly Detection", 
@@ -197,6 +271,12 @@ TRANSLATIONS = {
         # Dynamic Analyzer
         "dynamic_analyzer_prompt": "You are a senior data analyst. Your task is to analyze contract texts and identify 5 to 7 data points that would be interesting to compare on a dashboard. Your response and descriptions must be in {language}. IMPORTANT: Your final output must be ONLY the raw JSON object, with no additional text, explanation, or markdown formatting.",
         "dynamic_analyzer_field_description": "A human-readable description of the field, formulated as a question in {language}, e.g., 'What is the total contract value?'.",
+        "map_reduce_map_prompt": "You are analyzing excerpt {parte} of {total} of a contract. Final task: {objetivo}\nExtract from this excerpt, in {language}, only the information relevant to that task, concisely. If nothing is relevant, answer only \"-\".\n\nEXCERPT:\n{texto}\n\nNOTES:",
+        "map_reduce_combine_prompt": "Final task: {objetivo}\nCombine the partial notes below, taken from consecutive parts of the same contract, into a single note in {language}, without repetition and without losing relevant facts.\n\nPARTIAL NOTES:\n{texto}\n\nCOMBINED NOTE:",
+        "map_reduce_partial_label": "Part {parte} of {total} analyzed",
+        "spinner_extracting_file": "Extracting data from {filename}...",
+        "warning_ai_no_key_points": "The AI could not identify key points for extraction. The dashboard will not be generated.",
+        "warning_extraction_error": "Error in field {field} for {filename}: {e}",
     },
     "es": {
         # Geral
@@ -229,7 +309,24 @@ TRANSLATIONS = {
         "sidebar_load_collection_placeholder": "Seleccione una colección",
         "sidebar_load_collection_button": "Cargar colección",
         "sidebar_load_collection_error": "Seleccione una colección y asegúrese de que la clave de API esté configurada.",
+        "sidebar_load_collection_legacy": "La colección \"{colecao}\" está en el formato antiguo y no puede abrirse directamente. Mígrela con: python -m services.collections",
+        "sidebar_add_to_collection_button": "Añadir a la colección '{colecao}'",
+        "sidebar_remove_document_label": "Eliminar documento de la colección:",
+        "sidebar_remove_document_button": "Eliminar documento",
+        "sidebar_collection_updated": "Colección '{colecao}' actualizada.",
         "sidebar_process_button": "Procesar Documentos Cargados",
+        "sidebar_embedding_cache_stats": "Caché de embeddings: {acertos} fragmentos reutilizados, {falhas} enviados a la API.",
+        "sidebar_llm_metrics_expander": "Uso de los modelos de IA por tarea",
+        "sidebar_llm_metrics_caption": "Latencia y costo estimados desde el inicio del proceso. \"reprovadas_%\" es la fracción de respuestas del modelo rápido rehechas en el modelo avanzado.",
+        "sidebar_ingestion_progress": "Procesando documentos ({etapa}): {concluidas}/{total} etapas",
+        "sidebar_ingestion_file_error": "No se pudo procesar {arquivo}: {erro}",
+        "sidebar_ingestion_failed": "No se pudo procesar ningún documento.",
+        "ingestion_stage_extrair": "extracción de texto",
+        "ingestion_stage_ocr": "OCR",
+        "ingestion_stage_fragmentar": "fragmentación",
+        "ingestion_stage_deduplicar": "eliminación de fragmentos repetidos",
+        "ingestion_stage_embeddings": "embeddings",
+        "ingestion_stage_indexar": "indexación",
         # Chat
         "chat_header": "Chat con Contratos",
         "chat_info_load_docs": "Cargue documentos en la barra lateral para iniciar el chat.",
@@ -237,10 +334,13 @@ TRANSLATIONS = {
         "chat_expander_sources": "Ver Fuentes",
         "chat_source_label": "Fuente:",
         "chat_page_label": "Página:",
+        "chat_also_in_label": "Mismo fragmento también en: {referencias}",
         "chat_input_placeholder": "Escriba su pregunta sobre los contratos...",
         "chat_spinner_thinking": "Analizando documentos...",
         "chat_error": "Ocurrió un error al procesar su pregunta:",
         "chat_prompt": "Usa los fragmentos de contexto para responder a la pregunta en {language}. Da una respuesta completa y explicativa basada en el contexto. Si el contexto no contiene la respuesta, indica que no encontraste la información en los documentos.\n\nCONTEXTO:\n{context}\n\nPREGUNTA:\n{question}\n\nRESPUESTA:",
+        "chat_latency_caption": "Primer token en {primeiro_token:.1f}s · respuesta completa en {total:.1f}s",
+        "chat_semantic_cache_caption": "Respuesta reutilizada de una pregunta similar (similitud {similaridade:.2f})",
         # Dashboard
         "dashboard_header": "Dashboard Dinámico",
         "dashboard_markdown": "Haga clic en el botón para que la IA analize los contratos, identifique los datos más relevantes y genere un dashboard comparativo.",
@@ -260,6 +360,7 @@ TRANSLATIONS = {
         "summary_selectbox_placeholder": "Seleccione un archivo",
         "summary_selectbox_label": "Elija un contrato para resumir:",
         "summary_button": "Generar Resumen para {filename}",
+        "summary_warning_no_text": "No fue posible extraer contenido de texto del documento.",
         "summary_prompt": "Crea un resumen ejecutivo en {language} en 5 a 7 puntos para el contrato a continuación. Destaca: partes, objeto, plazo, valores y condiciones de rescisión.",
         # Riesgos
         "risks_header": "Análisis de Riesgos",
@@ -285,6 +386,19 @@ TRANSLATIONS = {
         "compliance_button": "Verificar Conformidad",
         "compliance_error_read": "Error al leer el archivo {filename}: {e}",
         "compliance_warning_same_doc": "Por favor, seleccione dos documentos diferentes para la comparación.",
+        "compliance_no_divergences": "No se encontraron divergencias: las {identicas} cláusulas del documento son idénticas a las de la referencia.",
+        "compliance_mode_label": "Modo de verificación:",
+        "compliance_mode_single": "Un documento",
+        "compliance_mode_batch": "Todos los documentos contra la referencia",
+        "compliance_batch_button": "Verificar Todos los Documentos",
+        "compliance_batch_col_doc": "Documento",
+        "compliance_batch_col_status": "Estado",
+        "compliance_batch_col_identical": "Cláusulas idénticas",
+        "compliance_batch_col_divergent": "Elementos divergentes",
+        "compliance_batch_status_pending": "En cola",
+        "compliance_batch_status_done": "Completado",
+        "compliance_batch_status_cached": "Completado (caché)",
+        "compliance_batch_status_error": "Error",
         # Anomalias
         # CORRIGIDO: Chave alterada de 'anomalies_header' para 'anomalias_header' para consistência com o código Python.
         "anomalias_header": "Detección de Anomalías", 
@@ -297,5 +411,11 @@ TRANSLATIONS = {
         # Dynamic Analyzer
         "dynamic_analyzer_prompt": "Eres un analista de datos senior. Tu tarea es analizar textos de contratos e identificar de 5 a 7 puntos de datos que serían interesantes para comparar en un dashboard. Tu respuesta y descripciones deben estar en {language}. IMPORTANTE: Tu respuesta final debe ser ÚNICAMENTE el objeto JSON, sin texto adicional, explicaciones o formato markdown.",
         "dynamic_analyzer_field_description": "Una descripción legible por humanos del campo, formulada como una pregunta en {language}, ej: '¿Cuál es el valor total del contrato?'.",
+        "map_reduce_map_prompt": "Está analizando el fragmento {parte} de {total} de un contrato. Tarea final: {objetivo}\nExtraiga de este fragmento, en {language}, solo la información relevante para esa tarea, de forma concisa. Si no hay nada relevante, responda solo \"-\".\n\nFRAGMENTO:\n{texto}\n\nNOTAS:",
+        "map_reduce_combine_prompt": "Tarea final: {objetivo}\nCombine las notas parciales siguientes, extraídas de partes consecutivas del mismo contrato, en una única nota en {language}, sin repeticiones y sin perder hechos relevantes.\n\nNOTAS PARCIALES:\n{texto}\n\nNOTA COMBINADA:",
+        "map_reduce_partial_label": "Parte {parte} de {total} analizada",
+        "spinner_extracting_file": "Extrayendo datos de {filename}...",
+        "warning_ai_no_key_points": "La IA no pudo identificar puntos clave para la extracción. No se generará el dashboard.",
+        "warning_extraction_error": "Error en el campo {field} de {filename}: {e}",
     }
 }
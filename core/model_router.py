@@ -0,0 +1,293 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from langchain_core.messages import BaseMessage
+from core.config import (
+    MODELOS_POR_NIVEL, NIVEL_POR_TAREFA, PRECOS_MODELOS, TOKENS_POR_IMAGEM,
+    METRICAS_LLM_ARQUIVO, METRICAS_LLM_MAX_BYTES
+)
+from core.llm_engine import PRIORIDADE_INTERATIVA, PRIORIDADE_LOTE, PRIORIDADE_NORMAL, MotorLLM, modelo_do_runnable, obter_motor_llm
+from core.llm_registry import obter_cadeia, obter_llm
+
+# Função que devolve o cliente (ou a cadeia) de um modelo, para a mesma tarefa poder subir de nível
+ObterRunnable = Callable[[str], Any]
+NIVEL_AVANCADO = "avancado"
+
+# Totais por (tarefa, modelo) desde o início do processo; o histórico completo fica em METRICAS_LLM_ARQUIVO
+_metricas: Dict[Tuple[str, str], dict] = {}
+_lock = threading.Lock()
+# Histórico em disco gravado por uma thread própria, fora do event loop do motor
+_fila_registros: "queue.Queue[Optional[dict]]" = queue.Queue()
+_gravador: Optional[threading.Thread] = None
+
+
+def modelo_da_tarefa(tarefa: str, escalar: bool = False) -> str:
+    """Modelo do nível configurado para a tarefa (ou do nível avançado, ao escalar). Tarefas sem rota usam o avançado."""
+    nivel = NIVEL_AVANCADO if escalar else NIVEL_POR_TAREFA.get(tarefa, NIVEL_AVANCADO)
+    return MODELOS_POR_NIVEL[nivel]
+
+def fabrica_de_llm(temperatura: float = 0.1, google_api_key: Optional[str] = None, **kwargs) -> ObterRunnable:
+    return lambda modelo: obter_llm(modelo, temperatura, google_api_key, **kwargs)
+
+def fabrica_de_cadeia(template: str, temperatura: float = 0.1, google_api_key: Optional[str] = None, **parciais) -> ObterRunnable:
+    return lambda modelo: obter_cadeia(template, modelo, temperatura, google_api_key, **parciais)
+
+def estimar_tokens(valor) -> int:
+    """Tokens aproximados (4 caracteres por token; imagens com custo fixo) de um prompt, mensagens ou resposta."""
+    if valor is None:
+        return 0
+    if isinstance(valor, str):
+        return (len(valor) + 3) // 4
+    if isinstance(valor, BaseMessage):
+        return estimar_tokens(valor.content)
+    if isinstance(valor, dict):
+        if valor.get("type") == "image_url":
+            return TOKENS_POR_IMAGEM
+        return sum(estimar_tokens(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(estimar_tokens(v) for v in valor)
+    return estimar_tokens(str(valor))
+
+def _tokens_da_chamada(runnable, entrada, resposta) -> Tuple[int, int]:
+    """(entrada, saída): o uso informado pela API, quando houver, ou a estimativa pelo texto."""
+    uso = getattr(resposta, "usage_metadata", None)
+    if uso and uso.get("input_tokens") is not None:
+        return uso["input_tokens"], uso.get("output_tokens", 0)
+    # Cadeias: o template entra no prompt, e a resposta vem em "text" junto com as entradas
+    prompt = getattr(runnable, "prompt", None) or getattr(runnable, "first", None)
+    template = [getattr(prompt, "template", ""), getattr(prompt, "partial_variables", None)]
+    saida = resposta.get("text") if isinstance(resposta, dict) else resposta
+    return estimar_tokens(entrada) + estimar_tokens(template), estimar_tokens(saida)
+
+def custo_estimado(modelo: str, tokens_entrada: int, tokens_saida: int) -> float:
+    """Custo em US$ pelos PRECOS_MODELOS; modelos sem preço configurado contam como zero."""
+    preco_entrada, preco_saida = PRECOS_MODELOS.get(modelo, (0.0, 0.0))
+    return (tokens_entrada * preco_entrada + tokens_saida * preco_saida) / 1_000_000
+
+def _escrever_registros(registros: List[dict]):
+    try:
+        if METRICAS_LLM_ARQUIVO.exists() and METRICAS_LLM_ARQUIVO.stat().st_size > METRICAS_LLM_MAX_BYTES:
+            os.replace(METRICAS_LLM_ARQUIVO, METRICAS_LLM_ARQUIVO.with_suffix(".jsonl.1"))
+        with open(METRICAS_LLM_ARQUIVO, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(registro, ensure_ascii=False) + "\n" for registro in registros)
+    except OSError:
+        pass  # As métricas nunca devem impedir a chamada
+
+def _drenar_registros():
+    while True:
+        registros = [_fila_registros.get()]
+        while True:
+            try:
+                registros.append(_fila_registros.get_nowait())
+            except queue.Empty:
+                break
+        encerrar = None in registros
+        _escrever_registros([r for r in registros if r is not None])
+        if encerrar:
+            return
+
+def _encerrar_gravador():
+    # Ao sair do processo, grava o que ainda está na fila antes da thread (daemon) ser interrompida
+    if _gravador is not None:
+        _fila_registros.put(None)
+        _gravador.join(timeout=5)
+
+def _gravar_registro(registro: dict):
+    """Enfileira o registro para a thread de gravação; chamar com `_lock`. Não faz E/S no event loop do motor."""
+    global _gravador
+    if _gravador is None:
+        _gravador = threading.Thread(target=_drenar_registros, name="metricas-llm", daemon=True)
+        _gravador.start()
+        atexit.register(_encerrar_gravador)
+    _fila_registros.put(registro)
+
+def _totais(tarefa: str, modelo: str) -> dict:
+    return _metricas.setdefault((tarefa, modelo), {
+        "chamadas": 0, "reprovadas": 0, "escaladas": 0, "erros": 0,
+        "segundos": 0.0, "tokens_entrada": 0, "tokens_saida": 0, "custo": 0.0,
+    })
+
+def registrar_chamada(tarefa: str, modelo: str, duracao: float, tokens_entrada: int, tokens_saida: int,
+                      escalada: bool = False, erro: bool = False):
+    """Soma uma chamada aos totais da tarefa e do modelo e a acrescenta ao histórico em disco."""
+    custo = custo_estimado(modelo, tokens_entrada, tokens_saida)
+    with _lock:
+        total = _totais(tarefa, modelo)
+        total["chamadas"] += 1
+        total["escaladas"] += int(escalada)
+        total["erros"] += int(erro)
+        total["segundos"] += duracao
+        total["tokens_entrada"] += tokens_entrada
+        total["tokens_saida"] += tokens_saida
+        total["custo"] += custo
+        _gravar_registro({
+            "momento": time.time(), "tarefa": tarefa, "modelo": modelo, "duracao": round(duracao, 3),
+            "tokens_entrada": tokens_entrada, "tokens_saida": tokens_saida, "custo": custo,
+            "escalada": escalada, "erro": erro,
+        })
+
+def registrar_reprovacao(tarefa: str, modelo: str):
+    """Marca uma resposta do modelo que falhou na validação e vai ser refeita no modelo avançado."""
+    with _lock:
+        _totais(tarefa, modelo)["reprovadas"] += 1
+        _gravar_registro({"momento": time.time(), "tarefa": tarefa, "modelo": modelo, "reprovada": True})
+
+def metricas_por_tarefa() -> List[dict]:
+    """Totais por tarefa e modelo desde o início do processo, com a latência média e a taxa de reprovação."""
+    with _lock:
+        itens = [(chave, dict(total)) for chave, total in sorted(_metricas.items())]
+    return [
+        {
+            "tarefa": tarefa, "modelo": modelo, "chamadas": total["chamadas"],
+            "reprovadas_%": round(100 * total["reprovadas"] / max(total["chamadas"], 1), 1),
+            "escaladas": total["escaladas"], "erros": total["erros"],
+            "latencia_media_s": round(total["segundos"] / max(total["chamadas"], 1), 2),
+            "tokens_entrada": total["tokens_entrada"], "tokens_saida": total["tokens_saida"],
+            "custo_usd": round(total["custo"], 4),
+        }
+        for (tarefa, modelo), total in itens
+    ]
+
+def _aprovada(validar: Optional[Callable[[Any], bool]], resposta) -> bool:
+    if validar is None:
+        return True
+    try:
+        return bool(validar(resposta))
+    except Exception:
+        return False
+
+def _chamada_medida(tarefa: str, modelo: str, runnable, entrada, escalada: bool, kwargs: dict):
+    """Fábrica da corrotina para o motor: mede só a chamada, sem o tempo de espera na fila."""
+    nome = modelo_do_runnable(runnable)
+    nome = modelo if nome == "padrao" else nome
+
+    async def _chamar():
+        inicio = time.perf_counter()
+        try:
+            resposta = await runnable.ainvoke(entrada, **kwargs)
+        except Exception:
+            registrar_chamada(tarefa, nome, time.perf_counter() - inicio, estimar_tokens(entrada), 0, escalada, erro=True)
+            raise
+        registrar_chamada(tarefa, nome, time.perf_counter() - inicio, *_tokens_da_chamada(runnable, entrada, resposta), escalada)
+        return resposta
+
+    return _chamar
+
+def invocar_roteado(
+    tarefa: str,
+    obter_runnable: ObterRunnable,
+    entrada,
+    prioridade: int = PRIORIDADE_NORMAL,
+    validar: Optional[Callable[[Any], bool]] = None,
+    motor: Optional[MotorLLM] = None,
+    **kwargs,
+):
+    """
+    `invoke` no modelo da tarefa, pelo motor do LLM. Se a tarefa está num nível abaixo do avançado
+    e a resposta falha (erro ou `validar` devolvendo False), a mesma entrada vai ao modelo avançado.
+    """
+    motor = motor or obter_motor_llm()
+    modelo, avancado = modelo_da_tarefa(tarefa), modelo_da_tarefa(tarefa, escalar=True)
+    runnable = obter_runnable(modelo)
+    pode_escalar = validar is not None and modelo != avancado
+    try:
+        resposta = motor.executar(_chamada_medida(tarefa, modelo, runnable, entrada, False, kwargs), modelo, prioridade)
+    except Exception:
+        if not pode_escalar:
+            raise
+        resposta, aprovada = None, False
+    else:
+        aprovada = not pode_escalar or _aprovada(validar, resposta)
+    if aprovada:
+        return resposta
+
+    runnable_avancado = obter_runnable(avancado)
+    if runnable_avancado is runnable:
+        return resposta
+    registrar_reprovacao(tarefa, modelo)
+    return motor.executar(_chamada_medida(tarefa, avancado, runnable_avancado, entrada, True, kwargs), avancado, prioridade)
+
+def iterar_roteado(
+    tarefa: str,
+    obter_runnable: ObterRunnable,
+    entradas: Sequence,
+    prioridade: int = PRIORIDADE_LOTE,
+    validar: Optional[Callable[[Any], bool]] = None,
+    motor: Optional[MotorLLM] = None,
+    **kwargs,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Como `invocar_roteado` para várias entradas, todas enviadas de uma vez: entrega (índice,
+    resposta ou exceção) à medida que cada uma termina, já com a escalada quando houver.
+    """
+    motor = motor or obter_motor_llm()
+    modelo, avancado = modelo_da_tarefa(tarefa), modelo_da_tarefa(tarefa, escalar=True)
+    runnable = obter_runnable(modelo)
+    runnable_avancado = None
+    pode_escalar = validar is not None and modelo != avancado
+
+    futuros = {
+        motor.submeter(_chamada_medida(tarefa, modelo, runnable, entrada, False, kwargs), modelo, prioridade): (indice, False)
+        for indice, entrada in enumerate(entradas)
+    }
+    try:
+        pendentes = set(futuros)
+        while pendentes:
+            concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                indice, escalada = futuros[futuro]
+                erro = futuro.exception()
+                resposta = erro if erro is not None else futuro.result()
+                if pode_escalar and not escalada and (erro is not None or not _aprovada(validar, resposta)):
+                    runnable_avancado = runnable_avancado or obter_runnable(avancado)
+                    if runnable_avancado is not runnable:
+                        registrar_reprovacao(tarefa, modelo)
+                        novo = motor.submeter(
+                            _chamada_medida(tarefa, avancado, runnable_avancado, entradas[indice], True, kwargs), avancado, prioridade
+                        )
+                        futuros[novo] = (indice, True)
+                        pendentes.add(novo)
+                        continue
+                yield indice, resposta
+    finally:
+        for futuro in futuros:
+            futuro.cancel()
+
+def invocar_em_lote_roteado(
+    tarefa: str,
+    obter_runnable: ObterRunnable,
+    entradas: Sequence,
+    prioridade: int = PRIORIDADE_LOTE,
+    validar: Optional[Callable[[Any], bool]] = None,
+) -> List[Any]:
+    """Como `iterar_roteado`, mas com os resultados na ordem das entradas; propaga a primeira falha."""
+    resultados: List[Any] = [None] * len(entradas)
+    for indice, resultado in iterar_roteado(tarefa, obter_runnable, entradas, prioridade, validar):
+        if isinstance(resultado, Exception):
+            raise resultado
+        resultados[indice] = resultado
+    return resultados
+
+def fluxo_roteado(tarefa: str, obter_runnable: ObterRunnable, entrada, prioridade: int = PRIORIDADE_INTERATIVA, **kwargs) -> Iterator[Any]:
+    """`stream` no modelo da tarefa, pelo motor do LLM, registrando a duração e os tokens ao terminar. Não escala."""
+    modelo = modelo_da_tarefa(tarefa)
+    runnable = obter_runnable(modelo)
+    nome = modelo_do_runnable(runnable)
+    nome = modelo if nome == "padrao" else nome
+    inicio = time.perf_counter()
+    pedacos = []
+    erro = False
+    try:
+        for pedaco in obter_motor_llm().fluxo(runnable, entrada, prioridade, **kwargs):
+            pedacos.append(pedaco)
+            yield pedaco
+    except Exception:
+        erro = True
+        raise
+    finally:
+        registrar_chamada(tarefa, nome, time.perf_counter() - inicio, estimar_tokens(entrada), estimar_tokens(pedacos), erro=erro)
@@ -0,0 +1,91 @@
+import threading
+import time
+from typing import Dict, List, Optional
+import faiss
+import numpy as np
+
+
+class CacheSemantico:
+    """
+    Respostas do chat indexadas pelo embedding da pergunta (FAISS, produto interno em vetores normalizados).
+    Uma pergunta com similaridade acima de `limiar` a uma já respondida reaproveita a resposta e as fontes.
+    Entradas expiram após `ttl_segundos`; acima de `max_itens`, sai a menos usada recentemente (LRU).
+    """
+
+    def __init__(self, limiar: float, ttl_segundos: float, max_itens: int):
+        self.limiar = limiar
+        self.ttl_segundos = ttl_segundos
+        self.max_itens = max_itens
+        self._indice = None
+        self._entradas: Dict[int, dict] = {}
+        self._proximo_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @staticmethod
+    def _normalizar(vetor) -> np.ndarray:
+        vetor = np.asarray(vetor, dtype=np.float32).reshape(1, -1)
+        return vetor / (np.linalg.norm(vetor) + 1e-12)
+
+    def _remover(self, ids: List[int]):
+        if ids:
+            self._indice.remove_ids(np.asarray(ids, dtype=np.int64))
+            for i in ids:
+                del self._entradas[i]
+
+    def buscar(self, vetor) -> Optional[dict]:
+        """Entrada mais parecida com a pergunta ({pergunta, resposta, fontes, similaridade}), se passar do limiar."""
+        with self._lock:
+            if not self._entradas:
+                return None
+            agora = time.time()
+            self._remover([i for i, e in self._entradas.items() if agora - e["criado"] > self.ttl_segundos])
+            if not self._entradas:
+                return None
+            similaridades, ids = self._indice.search(self._normalizar(vetor), 1)
+            similaridade, id_entrada = float(similaridades[0][0]), int(ids[0][0])
+            if id_entrada < 0 or similaridade < self.limiar:
+                return None
+            entrada = self._entradas[id_entrada]
+            entrada["ultimo_acesso"] = agora
+            return {**{k: entrada[k] for k in ("pergunta", "resposta", "fontes")}, "similaridade": similaridade}
+
+    def gravar(self, vetor, pergunta: str, resposta: str, fontes: list):
+        vetor = self._normalizar(vetor)
+        with self._lock:
+            if self._indice is None:
+                self._indice = faiss.IndexIDMap(faiss.IndexFlatIP(vetor.shape[1]))
+            id_entrada = self._proximo_id
+            self._proximo_id += 1
+            self._indice.add_with_ids(vetor, np.asarray([id_entrada], dtype=np.int64))
+            agora = time.time()
+            self._entradas[id_entrada] = {
+                "pergunta": pergunta, "resposta": resposta, "fontes": fontes,
+                "criado": agora, "ultimo_acesso": agora,
+            }
+            excesso = len(self._entradas) - self.max_itens
+            if excesso > 0:
+                antigas = sorted(self._entradas, key=lambda i: self._entradas[i]["ultimo_acesso"])
+                self._remover(antigas[:excesso])
+
+
+# Um cache por (coleção, idioma), compartilhado pelas sessões do processo
+_caches: Dict[tuple, CacheSemantico] = {}
+_lock_caches = threading.Lock()
+
+def obter_cache_semantico(id_colecao: str, lang_code: str, limiar: float, ttl_segundos: float, max_itens: int) -> CacheSemantico:
+    with _lock_caches:
+        chave = (id_colecao, lang_code)
+        if chave not in _caches:
+            _caches[chave] = CacheSemantico(limiar, ttl_segundos, max_itens)
+        return _caches[chave]
+
+def invalidar_cache_semantico(id_colecao: Optional[str]) -> None:
+    """Descarta as respostas de uma coleção cujo conteúdo mudou (em todos os idiomas)."""
+    if id_colecao is None:
+        return
+    with _lock_caches:
+        for chave in [c for c in _caches if c[0] == id_colecao]:
+            del _caches[chave]
@@ -0,0 +1,182 @@
+import threading
+import weakref
+from typing import Dict, List, Tuple
+import math
+import faiss
+import numpy as np
+from core.config import COLECAO_MMAP, FAISS_TIPO_INDICE, FAISS_MIN_VETORES_APROXIMADO, FAISS_HNSW_M, FAISS_NPROBE, FAISS_EF_SEARCH
+from core.dedup import fontes_do_fragmento
+
+TIPOS_INDICE = ("flat", "ivf", "hnsw", "ivfpq")
+
+
+class MapaFontes:
+    """Posições no índice FAISS dos vetores de cada arquivo de origem."""
+
+    def __init__(self, vector_store):
+        self.ntotal = vector_store.index.ntotal
+        # Docstores em SQLite informam as fontes sem ler o texto de cada fragmento
+        fontes = vector_store.docstore.fontes() if hasattr(vector_store.docstore, "fontes") else None
+        posicoes: Dict[str, List[int]] = {}
+        for posicao, doc_id in vector_store.index_to_docstore_id.items():
+            # Fragmentos deduplicados entram na lista de cada arquivo em que aparecem
+            fontes_doc = fontes.get(doc_id, [None]) if fontes is not None else fontes_do_fragmento(vector_store.docstore.search(doc_id).metadata)
+            for fonte in fontes_doc:
+                posicoes.setdefault(fonte, []).append(posicao)
+        self.posicoes = {fonte: np.asarray(sorted(p), dtype=np.int64) for fonte, p in posicoes.items()}
+
+
+_mapas = weakref.WeakKeyDictionary()
+_lock_mapas = threading.Lock()
+
+def obter_mapa_fontes(vector_store) -> MapaFontes:
+    """Mapa do vector store, refeito quando o índice muda de tamanho ou após `invalidar_mapa_fontes`."""
+    with _lock_mapas:
+        mapa = _mapas.get(vector_store)
+        if mapa is None or mapa.ntotal != vector_store.index.ntotal:
+            mapa = MapaFontes(vector_store)
+            _mapas[vector_store] = mapa
+        return mapa
+
+def invalidar_mapa_fontes(vector_store) -> None:
+    """Chamado depois de adicionar ou remover fragmentos, que renumeram as posições do índice."""
+    with _lock_mapas:
+        _mapas.pop(vector_store, None)
+
+def _garantir_mapa_direto(indice):
+    """IVF só reconstrói vetores por posição com o mapa direto (posição → lista), montado uma vez por índice."""
+    ivf = faiss.try_extract_index_ivf(indice)
+    if ivf is None:
+        return
+    with _lock_mapas:
+        if ivf.direct_map.no():
+            ivf.make_direct_map()
+
+def buscar_na_fonte(vector_store, vetor, fonte: str, k: int) -> List[Tuple[str, float]]:
+    """
+    Busca exata restrita aos vetores de um arquivo, sem vizinhos globais filtrados depois.
+    A distância é calculada só sobre as linhas do arquivo, reconstruídas do índice (custo
+    proporcional ao tamanho do documento, também em IVF e HNSW; em PQ os vetores são os aproximados).
+    Retorna (id do docstore, distância ou similaridade) em ordem de relevância.
+    """
+    posicoes = obter_mapa_fontes(vector_store).posicoes.get(fonte)
+    if posicoes is None or not len(posicoes):
+        return []
+    indice = vector_store.index
+    consulta = np.asarray(vetor, dtype=np.float32).reshape(1, -1)
+    k = min(k, len(posicoes))
+
+    _garantir_mapa_direto(indice)
+    linhas = indice.reconstruct_batch(posicoes)
+    if indice.metric_type == faiss.METRIC_INNER_PRODUCT:
+        pontuacoes = linhas @ consulta[0]
+        ordem = np.argsort(-pontuacoes)[:k]
+    else:
+        pontuacoes = ((linhas - consulta) ** 2).sum(axis=1)
+        ordem = np.argsort(pontuacoes)[:k]
+    return [(vector_store.index_to_docstore_id[int(posicoes[i])], float(pontuacoes[i])) for i in ordem]
+
+# Índices abertos por `ler_indice` com mmap (o FAISS não aceita atributos novos nos objetos)
+_indices_mapeados = weakref.WeakSet()
+
+def ler_indice(caminho, mmap: bool = COLECAO_MMAP):
+    """
+    Lê um índice gravado; com `mmap`, os vetores ficam no arquivo e só as páginas usadas vão para a RAM
+    (compartilhadas entre os processos que abrem a mesma coleção). IO_FLAG_MMAP_IFC mapeia também os
+    códigos de índices planos e HNSW; IO_FLAG_MMAP só mapeia as listas do IVF.
+    """
+    if not mmap:
+        return faiss.read_index(str(caminho))
+    indice = faiss.read_index(str(caminho), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    _indices_mapeados.add(indice)
+    return indice
+
+def tornar_indice_gravavel(vector_store):
+    """
+    Índices mapeados em memória (ver `ler_indice`) apontam para o arquivo, somente leitura: adicionar
+    ou remover vetores deles derruba o processo. Antes de alterar, o índice é copiado para a RAM.
+    """
+    indice = vector_store.index
+    if indice not in _indices_mapeados:
+        return
+    vector_store.index = faiss.deserialize_index(faiss.serialize_index(indice))
+
+def escolher_tipo_indice(n_vetores: int, tipo: str = FAISS_TIPO_INDICE) -> str:
+    if tipo == "auto":
+        return "ivf" if n_vetores >= FAISS_MIN_VETORES_APROXIMADO else "flat"
+    if tipo not in TIPOS_INDICE:
+        raise ValueError(f"Tipo de índice FAISS desconhecido: {tipo}")
+    return tipo
+
+def fabrica_do_indice(tipo: str, n_vetores: int, dimensao: int) -> str:
+    """
+    String do `faiss.index_factory` para o tipo e o tamanho da coleção.
+    IVF e PQ precisam de vetores suficientes para o treino; coleções pequenas caem para tipos mais simples.
+    """
+    # ~4·√N listas, com pelo menos 39 vetores de treino por lista (mínimo recomendado pelo FAISS)
+    nlist = max(1, min(int(4 * math.sqrt(n_vetores)), n_vetores // 39))
+    if tipo == "ivfpq":
+        # Subquantizadores de 8 bits, cada um cobrindo 8 dimensões (ou o divisor mais próximo)
+        m = max(d for d in range(1, max(1, dimensao // 8) + 1) if dimensao % d == 0)
+        if n_vetores >= 256 * 39 and nlist > 1:
+            return f"IVF{nlist},PQ{m}"
+        tipo = "ivf"
+    if tipo == "ivf":
+        return f"IVF{nlist},Flat" if nlist > 1 else "Flat"
+    if tipo == "hnsw":
+        return f"HNSW{FAISS_HNSW_M}"
+    return "Flat"
+
+def reconstruir_vetores(indice) -> np.ndarray:
+    """Todos os vetores do índice, na ordem das posições (aproximados no caso de PQ)."""
+    if indice.ntotal == 0:
+        return np.zeros((0, indice.d), dtype=np.float32)
+    ivf = faiss.try_extract_index_ivf(indice)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return indice.reconstruct_n(0, indice.ntotal)
+
+def aplicar_parametros_busca(indice, nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_EF_SEARCH):
+    """Ajusta os parâmetros de busca dos índices aproximados; índices planos não são alterados."""
+    espaco = faiss.ParameterSpace()
+    if faiss.try_extract_index_ivf(indice) is not None:
+        espaco.set_index_parameter(indice, "nprobe", nprobe)
+    if isinstance(indice, faiss.IndexHNSW):
+        espaco.set_index_parameter(indice, "efSearch", ef_search)
+
+def indice_do_tipo(indice, tipo: str) -> bool:
+    """Se o índice já é do tipo pedido (e pode ser gravado sem novo treino)."""
+    classes = {"flat": faiss.IndexFlat, "ivf": faiss.IndexIVFFlat, "hnsw": faiss.IndexHNSWFlat, "ivfpq": faiss.IndexIVFPQ}
+    return isinstance(indice, classes[tipo])
+
+def construir_indice(vetores: np.ndarray, tipo: str, metrica: int = faiss.METRIC_L2):
+    """Cria, treina e preenche um índice do tipo pedido. Retorna (índice, string da fábrica)."""
+    vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+    fabrica = fabrica_do_indice(tipo, len(vetores), vetores.shape[1])
+    indice = faiss.index_factory(vetores.shape[1], fabrica, metrica)
+    if not indice.is_trained:
+        indice.train(vetores)
+    indice.add(vetores)
+    aplicar_parametros_busca(indice)
+    return indice, fabrica
+
+def remover_do_vector_store(vector_store, ids: List[str]):
+    """
+    Remove fragmentos pelo ID do docstore. Índices planos usam o `delete` do LangChain; IVF e HNSW
+    não renumeram as posições ao remover (ou nem suportam remoção), então o índice é refeito com os
+    vetores restantes, reaproveitando o treino.
+    """
+    if isinstance(vector_store.index, faiss.IndexFlat):
+        vector_store.delete(ids)
+        return
+    remover = set(ids)
+    mapa = dict(vector_store.index_to_docstore_id.items())
+    manter = [p for p in range(vector_store.index.ntotal) if mapa[p] not in remover]
+    vetores = reconstruir_vetores(vector_store.index)[manter]
+    novo = faiss.clone_index(vector_store.index)
+    novo.reset()
+    if len(vetores):
+        novo.add(vetores)
+    vector_store.docstore.delete(ids)
+    vector_store.index_to_docstore_id = {nova: mapa[antiga] for nova, antiga in enumerate(manter)}
+    vector_store.index = novo
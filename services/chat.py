@@ -0,0 +1,42 @@
+import time
+from typing import Iterator, List
+from langchain_core.documents import Document
+from core.llm_engine import PRIORIDADE_INTERATIVA
+from core.model_router import fluxo_roteado
+from core.llm_registry import obter_retriever
+
+def recuperar_contexto(vector_store, pergunta: str, k: int = 5) -> List[Document]:
+    """Trechos mais relevantes para a pergunta, mostrados como fontes antes da resposta."""
+    return obter_retriever(vector_store, k=k).invoke(pergunta)
+
+def responder_em_fluxo(obter_llm_chat, prompt, documentos: List[Document], pergunta: str) -> Iterator[str]:
+    """
+    Gera a resposta em pedaços à medida que o modelo os produz. O contexto é montado
+    como na cadeia "stuff" do RetrievalQA: os trechos concatenados no prompt. A chamada
+    passa pelo motor do LLM na frente de análises e extrações em andamento, no modelo da tarefa "chat".
+    """
+    texto_prompt = prompt.format(
+        context="\n\n".join(doc.page_content for doc in documentos),
+        question=pergunta,
+    )
+    for pedaco in fluxo_roteado("chat", obter_llm_chat, texto_prompt, PRIORIDADE_INTERATIVA):
+        if pedaco.content:
+            yield pedaco.content
+
+class MedidorLatencia:
+    """Envolve um fluxo de texto registrando o tempo até o primeiro pedaço e o tempo total."""
+
+    def __init__(self, fluxo: Iterator[str], inicio: float = None):
+        self.fluxo = fluxo
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self.primeiro_token = None
+        self.total = None
+
+    def __iter__(self):
+        for pedaco in self.fluxo:
+            if self.primeiro_token is None:
+                self.primeiro_token = time.perf_counter() - self.inicio
+            yield pedaco
+        self.total = time.perf_counter() - self.inicio
+        if self.primeiro_token is None:
+            self.primeiro_token = self.total
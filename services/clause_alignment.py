@@ -0,0 +1,99 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import List
+import numpy as np
+from services.clause_splitter import SEPARADORES_CORTE_LINHA, DivisorClausulas
+
+TAMANHO_MAXIMO_CLAUSULA = 4000
+LIMIAR_ALINHAMENTO = 0.75
+# Entra na chave dos relatórios salvos: mudar sempre que a segmentação mudar
+VERSAO_SEGMENTACAO = 1
+_divisor = DivisorClausulas(
+    chunk_size=TAMANHO_MAXIMO_CLAUSULA, juntar_pequenas=False, min_cabecalhos=2, repetir_cabecalho=False,
+    separadores=SEPARADORES_CORTE_LINHA,
+)
+
+def segmentar_em_clausulas(texto: str) -> List[str]:
+    """
+    Divide o contrato em cláusulas pelos cabeçalhos (o mesmo divisor da indexação, sem juntar
+    cláusulas curtas). Sem cabeçalhos suficientes, usa os parágrafos. Cláusulas muito longas são quebradas em partes.
+    """
+    return _divisor.split_text(texto)
+
+def normalizar_clausula(texto: str) -> str:
+    """Forma canônica para comparação: sem acentos, caixa, numeração do cabeçalho e espaços extras."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(
+        r"^\W*(?:(?:clausula|clause|section|seccion|artigo|articulo|article|art\.)\s*(?:\d+(?:\.\d+)*|[ivxlc]+)\b|\d+(?:\.\d+)*)\W*",
+        "", texto
+    )
+    return re.sub(r"\s+", " ", texto).strip()
+
+def _quase_identicas(a: str, b: str) -> bool:
+    """Diferenças só de formatação; números (prazos, valores, percentuais) precisam ser idênticos."""
+    if re.findall(r"\d+", a) != re.findall(r"\d+", b):
+        return False
+    comparador = SequenceMatcher(None, a, b, autojunk=False)
+    return comparador.real_quick_ratio() >= 0.98 and comparador.quick_ratio() >= 0.98 and comparador.ratio() >= 0.98
+
+def preparar_clausulas(texto: str, embeddings_obj) -> dict:
+    """Segmenta o documento e calcula os embeddings (normalizados) de cada cláusula."""
+    clausulas = segmentar_em_clausulas(texto)
+    vetores = np.asarray(embeddings_obj.embed_documents(clausulas), dtype=np.float32) if clausulas else np.zeros((0, 1), np.float32)
+    if len(vetores):
+        vetores /= np.linalg.norm(vetores, axis=1, keepdims=True) + 1e-12
+    return {
+        "clausulas": clausulas,
+        "normalizadas": [normalizar_clausula(c) for c in clausulas],
+        "vetores": vetores,
+    }
+
+def alinhar_clausulas(referencia: dict, documento: dict) -> dict:
+    """
+    Alinha as cláusulas do documento às da referência pela similaridade dos embeddings
+    (pareamento guloso, um para um) e descarta localmente os pares idênticos.
+
+    Retorna os pares divergentes, as cláusulas da referência sem correspondente,
+    as cláusulas extras do documento e a quantidade de cláusulas idênticas omitidas.
+    """
+    n_ref, n_doc = len(referencia["clausulas"]), len(documento["clausulas"])
+    pares, usados_ref, usados_doc = [], set(), set()
+
+    # Cópias exatas (após normalização) não precisam de embedding para casar
+    posicoes_ref = {}
+    for i, chave in enumerate(referencia["normalizadas"]):
+        posicoes_ref.setdefault(chave, []).append(i)
+    for j, chave in enumerate(documento["normalizadas"]):
+        if posicoes_ref.get(chave):
+            i = posicoes_ref[chave].pop(0)
+            pares.append((i, j, 1.0))
+            usados_ref.add(i)
+            usados_doc.add(j)
+
+    if n_ref and n_doc:
+        similaridades = referencia["vetores"] @ documento["vetores"].T
+        for indice in np.argsort(-similaridades, axis=None):
+            i, j = divmod(int(indice), n_doc)
+            sim = float(similaridades[i, j])
+            if sim < LIMIAR_ALINHAMENTO:
+                break
+            if i not in usados_ref and j not in usados_doc:
+                pares.append((i, j, sim))
+                usados_ref.add(i)
+                usados_doc.add(j)
+
+    identicas, divergentes = 0, []
+    for i, j, sim in sorted(pares, key=lambda p: p[0]):
+        if _quase_identicas(referencia["normalizadas"][i], documento["normalizadas"][j]):
+            identicas += 1
+        else:
+            divergentes.append((referencia["clausulas"][i], documento["clausulas"][j], sim))
+
+    return {
+        "divergentes": divergentes,
+        "ausentes": [referencia["clausulas"][i] for i in range(n_ref) if i not in usados_ref],
+        "extras": [documento["clausulas"][j] for j in range(n_doc) if j not in usados_doc],
+        "identicas": identicas,
+    }
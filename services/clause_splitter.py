@@ -0,0 +1,159 @@
+import bisect
+import copy
+import re
+from typing import List, Optional, Sequence, Tuple
+from langchain.text_splitter import TextSplitter
+from langchain_core.documents import Document
+
+# Início de cláusula: "CLÁUSULA 5", "Cláusula 5.2", "Clause 3", "Section 2", "Artigo 4", "§ 1º" ou "5.2 Título"
+PADRAO_CABECALHO = re.compile(
+    r"^[ \t]*(?:cl[aá]usula|clause|section|secci[oó]n|artigo|art[ií]culo|article|art\.|§|\d{1,3}(?:\.\d+)*[.)]?[ \t]+(?-i:[A-ZÁÉÍÓÚÂÊÔÃÕÇ]))",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Cabeçalhos de cláusula propriamente dita; os demais ("5.2 ...", "§ 1º") são subitens da cláusula em vigor
+PADRAO_PRINCIPAL = re.compile(r"(?:cl[aá]usula|clause|section|secci[oó]n|artigo|art[ií]culo|article|art\.)", re.IGNORECASE)
+TAMANHO_MAXIMO_CABECALHO = 120
+# Pontos de corte de uma cláusula maior que o limite, do preferido ao último recurso
+SEPARADORES_CORTE = ("\n\n", "\n", ". ", "; ", " ")
+# Regra da segmentação de conformidade: fim de linha ou corte no limite
+SEPARADORES_CORTE_LINHA = ("\n",)
+
+
+def quebrar_no_limite(texto: str, limite: int, separadores: Sequence[str] = SEPARADORES_CORTE) -> List[Tuple[int, str]]:
+    """
+    Divide um trecho longo em partes de até `limite` caracteres, cortando de preferência entre
+    parágrafos, linhas ou frases (`separadores`, em ordem) na segunda metade da janela; sem nenhum
+    deles, corta no limite. Retorna (posição no texto, parte).
+    Cada corte olha só a janela atual, então o custo é linear no tamanho do texto.
+    """
+    partes = []
+    inicio = 0
+    fim = len(texto.rstrip())
+    while True:
+        # Pula os espaços no começo da parte, mantendo a posição em relação ao texto original
+        while inicio < len(texto) and texto[inicio].isspace():
+            inicio += 1
+        if fim - inicio <= limite:
+            break
+        corte = -1
+        for separador in separadores:
+            corte = texto.rfind(separador, inicio + limite // 2 + 1, inicio + limite)
+            if corte != -1:
+                corte += len(separador)
+                break
+        if corte == -1:
+            corte = inicio + limite
+        partes.append((inicio, texto[inicio:corte].rstrip()))
+        inicio = corte
+    if texto[inicio:].strip():
+        partes.append((inicio, texto[inicio:].rstrip()))
+    return partes
+
+
+def prefixo_da_clausula(titulo: str) -> str:
+    """Título repetido no início de um fragmento que começa no meio da cláusula."""
+    return f"[{titulo}]\n"
+
+
+class DivisorClausulas(TextSplitter):
+    """
+    Fragmenta contratos por cláusula ("CLÁUSULA", "Cláusula 5.2", "Section", "§", títulos numerados,
+    em PT/EN/ES) em vez de por tamanho, sem sobreposição entre fragmentos. Cláusulas acima de
+    `chunk_size` são quebradas em parágrafos ou frases; com `juntar_pequenas`, subitens curtos
+    da mesma cláusula são agrupados até o limite. Cada fragmento leva o título da cláusula em `metadata["clausula"]`.
+    Páginas seguidas do mesmo arquivo são fragmentadas juntas, para que uma cláusula que continua
+    na página seguinte não seja cortada na quebra; o fragmento fica com a página onde começa.
+    """
+
+    def __init__(self, chunk_size: int = 1500, juntar_pequenas: bool = True, min_cabecalhos: int = 1,
+                 repetir_cabecalho: bool = True, separadores: Sequence[str] = SEPARADORES_CORTE, **kwargs):
+        kwargs.setdefault("chunk_overlap", 0)
+        super().__init__(chunk_size=chunk_size, **kwargs)
+        self.juntar_pequenas = juntar_pequenas
+        # Fragmentos que começam no meio de uma cláusula (num subitem ou na quebra de uma cláusula longa)
+        # recebem o título dela no início, no lugar da sobreposição do divisor antigo
+        self.repetir_cabecalho = repetir_cabecalho
+        # Menos cabeçalhos que isso no texto: provavelmente falsos positivos, e o texto é dividido por parágrafos
+        self.min_cabecalhos = min_cabecalhos
+        self.separadores = tuple(separadores)
+
+    def dividir_com_cabecalhos(self, texto: str) -> List[Tuple[List[Optional[str]], int, str]]:
+        """
+        Fragmentos do texto como (títulos das cláusulas que contêm, posição no texto, trecho).
+        O título é None no trecho que continua uma cláusula anterior. Com `repetir_cabecalho`, o espaço
+        do título que `create_documents` acrescenta já é descontado de `chunk_size`.
+        """
+        inicios = [m.start() for m in PADRAO_CABECALHO.finditer(texto)]
+        if inicios and len(inicios) >= self.min_cabecalhos:
+            # O trecho antes do primeiro cabeçalho continua a cláusula anterior (ex: da página anterior)
+            limites = [(0, inicios[0], False)] + [(a, b, True) for a, b in zip(inicios, inicios[1:] + [len(texto)])]
+        else:
+            limites = []
+            inicio = 0
+            for separador in re.finditer(r"\n\s*\n", texto):
+                limites.append((inicio, separador.start(), False))
+                inicio = separador.end()
+            limites.append((inicio, len(texto), False))
+
+        fragmentos: List[Tuple[List[Optional[str]], int, str]] = []
+        # Espaço do título repetido no início de cada fragmento, e a cláusula em vigor que o define
+        reservas: List[int] = []
+        principal = None
+        for a, b, tem_cabecalho in limites:
+            parte = texto[a:b]
+            if not parte.strip():
+                continue
+            cabecalho = parte.strip().split("\n", 1)[0].strip()[:TAMANHO_MAXIMO_CABECALHO] if tem_cabecalho else None
+            abre_clausula = bool(cabecalho and PADRAO_PRINCIPAL.match(cabecalho))
+            if abre_clausula:
+                principal = cabecalho
+            # As partes seguintes de uma cláusula longa (e os subitens) recebem o título de `principal`
+            reserva = self._length_function(prefixo_da_clausula(principal)) if self.repetir_cabecalho and principal else 0
+            for n, (deslocamento, pedaco) in enumerate(quebrar_no_limite(parte, self._chunk_size - reserva, self.separadores)):
+                # Só a primeira parte de uma cláusula longa começa no título
+                cabecalho = cabecalho if n == 0 else None
+                # Subitens curtos se juntam ao fragmento anterior; uma nova cláusula sempre abre fragmento
+                if (self.juntar_pequenas and fragmentos and not (cabecalho and abre_clausula)
+                        and reservas[-1] + self._length_function(fragmentos[-1][2]) + 1 + self._length_function(pedaco) <= self._chunk_size):
+                    cabecalhos, posicao, anterior = fragmentos[-1]
+                    fragmentos[-1] = (cabecalhos + [cabecalho], posicao, f"{anterior}\n{pedaco}")
+                else:
+                    fragmentos.append(([cabecalho], a + deslocamento, pedaco))
+                    reservas.append(0 if cabecalho and abre_clausula else reserva)
+        return fragmentos
+
+    def split_text(self, text: str) -> List[str]:
+        return [trecho for _, _, trecho in self.dividir_com_cabecalhos(text)]
+
+    def create_documents(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[Document]:
+        _metadatas = metadatas or [{}] * len(texts)
+        documentos = []
+        # Páginas consecutivas do mesmo arquivo formam um texto só
+        grupos: List[Tuple[List[int], List[str], List[dict]]] = []
+        for texto, metadata_pagina in zip(texts, _metadatas):
+            if grupos and grupos[-1][2][-1].get("source") == metadata_pagina.get("source"):
+                inicios, textos, metadados = grupos[-1]
+                inicios.append(inicios[-1] + len(textos[-1]) + 1)
+                textos.append(texto)
+                metadados.append(metadata_pagina)
+            else:
+                grupos.append(([0], [texto], [metadata_pagina]))
+
+        for inicios, textos, metadados in grupos:
+            # Cláusula (e subitem numerado) em vigor ao longo do arquivo
+            principal, item = None, None
+            for cabecalhos, posicao, trecho in self.dividir_com_cabecalhos("\n".join(textos)):
+                metadata = copy.deepcopy(metadados[bisect.bisect_right(inicios, posicao) - 1])
+                inicio = (principal, item) if cabecalhos[0] is None else None
+                for cabecalho in cabecalhos:
+                    if cabecalho is not None:
+                        principal, item = (cabecalho, None) if PADRAO_PRINCIPAL.match(cabecalho) else (principal, cabecalho)
+                        if inicio is None or inicio == (None, None):
+                            inicio = (principal, item)
+                titulo = " › ".join(t for t in (inicio or (None, None)) if t)
+                if titulo:
+                    metadata["clausula"] = titulo
+                if self.repetir_cabecalho and inicio and inicio[0] and not trecho.startswith(inicio[0]):
+                    trecho = prefixo_da_clausula(inicio[0]) + trecho
+                documentos.append(Document(page_content=trecho, metadata=metadata))
+        return documentos
@@ -1,7 +1,20 @@
 import streamlit as st
 import json
+import shutil
+import uuid
+import faiss
 from langchain.vectorstores import FAISS
+from langchain_core.documents import Document
 from core.config import COLECOES_DIR
+from core.docstore import DocstoreSQLite, gravar_docstore_sqlite
+from core.vector_index import (
+    obter_mapa_fontes, invalidar_mapa_fontes, remover_do_vector_store, escolher_tipo_indice,
+    indice_do_tipo, construir_indice, reconstruir_vetores, aplicar_parametros_busca,
+    ler_indice, tornar_indice_gravavel
+)
+from core.bm25 import obter_indice_bm25, registrar_indice_bm25, carregar_ou_construir_indice_bm25
+from core.dedup import deduplicar_documentos, fontes_do_fragmento
+from core.embedding_batches import indexar_documentos_em_lotes
 
 def listar_colecoes_salvas():
     """
@@ -11,52 +24,295 @@ def listar_colecoes_salvas():
         return []
     return [d.name for d in COLECOES_DIR.iterdir() if d.is_dir()]
 
+def _ler_manifesto(caminho_colecao):
+    """
+    Lê o manifesto da coleção. Manifestos antigos (apenas a lista de arquivos) são convertidos.
+    """
+    with open(caminho_colecao / "manifest.json", "r") as f:
+        manifesto = json.load(f)
+    if isinstance(manifesto, list):
+        manifesto = {"arquivos": manifesto}
+    manifesto.setdefault("operacoes", [])
+    return manifesto
+
+def _gravar_manifesto(caminho_colecao, manifesto):
+    """Grava o manifesto de forma atômica para não corromper a coleção numa falha."""
+    caminho_temp = caminho_colecao / "manifest.json.tmp"
+    with open(caminho_temp, "w") as f:
+        json.dump(manifesto, f)
+    caminho_temp.replace(caminho_colecao / "manifest.json")
+
+def _ids_da_fonte(vector_store, nome_arquivo):
+    """IDs do docstore de todos os fragmentos de um arquivo."""
+    posicoes = obter_mapa_fontes(vector_store).posicoes.get(nome_arquivo, [])
+    return [vector_store.index_to_docstore_id[int(p)] for p in posicoes]
+
+def _incorporar_segmento(vector_store, segmento, indice_bm25=None):
+    """
+    Acrescenta os vetores e fragmentos de um segmento ao vector store, preservando os IDs.
+    """
+    if segmento.index.ntotal == 0:
+        return
+    tornar_indice_gravavel(vector_store)
+    vetores = segmento.index.reconstruct_n(0, segmento.index.ntotal)
+    ids = [segmento.index_to_docstore_id[i] for i in range(segmento.index.ntotal)]
+    docs = [segmento.docstore.search(doc_id) for doc_id in ids]
+    vector_store.add_embeddings(
+        zip([d.page_content for d in docs], vetores.tolist()),
+        metadatas=[d.metadata for d in docs],
+        ids=ids,
+    )
+    invalidar_mapa_fontes(vector_store)
+    if indice_bm25 is not None:
+        indice_bm25.adicionar(ids, [d.page_content for d in docs], [fontes_do_fragmento(d.metadata) for d in docs])
+
+def _remover_fonte(vector_store, nome_arquivo, indice_bm25=None):
+    """
+    Remove todos os fragmentos de um arquivo do vector store e do índice BM25.
+    Fragmentos deduplicados que também aparecem em outros arquivos ficam, só sem a referência a este.
+    """
+    ids = []
+    for doc_id in _ids_da_fonte(vector_store, nome_arquivo):
+        doc = vector_store.docstore.search(doc_id)
+        restantes = [r for r in doc.metadata.get("referencias", []) if r.get("source") != nome_arquivo]
+        if not restantes:
+            ids.append(doc_id)
+            continue
+        metadados = {**doc.metadata, **restantes[0], "referencias": restantes}
+        if len(restantes) == 1:
+            del metadados["referencias"]
+        vector_store.docstore.delete([doc_id])
+        vector_store.docstore.add({doc_id: Document(page_content=doc.page_content, metadata=metadados)})
+        if indice_bm25 is not None:
+            indice_bm25.adicionar([doc_id], [doc.page_content], [fontes_do_fragmento(metadados)])
+    if ids:
+        tornar_indice_gravavel(vector_store)
+        remover_do_vector_store(vector_store, ids)
+        if indice_bm25 is not None:
+            indice_bm25.remover(ids)
+    invalidar_mapa_fontes(vector_store)
+
+def _vector_store_para_gravar(vector_store, caminho_colecao):
+    """
+    Versão do vector store com o índice do tipo configurado (ver FAISS_TIPO_INDICE), treinado agora.
+    Índices que já são do tipo pedido são gravados como estão. Retorna (vector store, descrição do índice).
+    """
+    tipo = escolher_tipo_indice(vector_store.index.ntotal)
+    if indice_do_tipo(vector_store.index, tipo):
+        anterior = {}
+        if (caminho_colecao / "manifest.json").exists():
+            anterior = _ler_manifesto(caminho_colecao).get("indice", {})
+        fabrica = anterior.get("fabrica") if anterior.get("tipo") == tipo else None
+        return vector_store, {"tipo": tipo, "fabrica": fabrica or ("Flat" if tipo == "flat" else None)}
+
+    indice, fabrica = construir_indice(reconstruir_vetores(vector_store.index), tipo, vector_store.index.metric_type)
+    copia = FAISS(
+        embedding_function=vector_store.embedding_function,
+        index=indice,
+        docstore=vector_store.docstore,
+        index_to_docstore_id=vector_store.index_to_docstore_id,
+        distance_strategy=vector_store.distance_strategy,
+    )
+    return copia, {"tipo": tipo, "fabrica": fabrica}
+
+def _gravar_vector_store(caminho, vector_store):
+    """Grava o índice FAISS e os fragmentos (SQLite) num diretório novo, sem pickle."""
+    caminho.mkdir(parents=True)
+    faiss.write_index(vector_store.index, str(caminho / "index.faiss"))
+    gravar_docstore_sqlite(
+        caminho / "docstore.sqlite",
+        ((posicao, doc_id, vector_store.docstore.search(doc_id))
+         for posicao, doc_id in sorted(vector_store.index_to_docstore_id.items()))
+    )
+
+def _abrir_vector_store(caminho, _embeddings_obj):
+    """Abre um diretório gravado por `_gravar_vector_store`: índice mapeado em memória e fragmentos lidos sob demanda."""
+    docstore = DocstoreSQLite(caminho / "docstore.sqlite")
+    return FAISS(
+        embedding_function=_embeddings_obj,
+        index=ler_indice(caminho / "index.faiss"),
+        docstore=docstore,
+        index_to_docstore_id=docstore.mapa_posicoes(),
+    )
+
+def _formato_antigo(caminho):
+    """Diretórios gravados com `FAISS.save_local` (docstore em pickle)."""
+    return not (caminho / "docstore.sqlite").exists() and (caminho / "index.pkl").exists()
+
+def _limpar_bases_antigas(caminho_colecao, manter):
+    """Remove bases e o índice no formato antigo, exceto as indicadas (ainda podem estar abertas)."""
+    for caminho in caminho_colecao.iterdir():
+        if caminho.is_dir() and (caminho.name.startswith("base-") or caminho.name == "faiss_index") and caminho.name not in manter:
+            shutil.rmtree(caminho, ignore_errors=True)
+
+def _gravar_colecao_completa(caminho_colecao, vector_store, nomes_arquivos):
+    """
+    Grava o estado completo da coleção numa base nova (base-<uuid>) e zera as operações incrementais.
+    Arquivos que outro processo possa ter mapeado em memória nunca são sobrescritos.
+    """
+    caminho_colecao.mkdir(parents=True, exist_ok=True)
+    # Treina o tipo de índice configurado para o tamanho da coleção
+    vector_store_gravar, descricao_indice = _vector_store_para_gravar(vector_store, caminho_colecao)
+    base_anterior = None
+    if (caminho_colecao / "manifest.json").exists():
+        base_anterior = _ler_manifesto(caminho_colecao).get("base")
+    nome_base = f"base-{uuid.uuid4().hex}"
+    _gravar_vector_store(caminho_colecao / nome_base, vector_store_gravar)
+    obter_indice_bm25(vector_store).salvar(caminho_colecao / "bm25.json")
+    # Salva a lista de nomes de arquivos; o índice completo já inclui todas as operações
+    _gravar_manifesto(caminho_colecao, {
+        "arquivos": list(nomes_arquivos), "operacoes": [], "indice": descricao_indice, "base": nome_base
+    })
+    # A base anterior fica até a próxima gravação, para processos que acabaram de abri-la
+    _limpar_bases_antigas(caminho_colecao, {nome_base, base_anterior})
+    shutil.rmtree(caminho_colecao / "segmentos", ignore_errors=True)
+
 def salvar_colecao_atual(nome_colecao, vector_store_atual, nomes_arquivos_atuais):
     """
     Salva o vector store e o manifesto de arquivos no disco.
+    Uma gravação completa também compacta os segmentos incrementais anteriores.
     """
     if not nome_colecao.strip():
         st.error("Por favor, forneça um nome para a coleção.")
         return False
 
-    caminho_colecao = COLECOES_DIR / nome_colecao
     try:
-        caminho_colecao.mkdir(parents=True, exist_ok=True)
-        # Salva o índice FAISS
-        vector_store_atual.save_local(str(caminho_colecao / "faiss_index"))
-        # Salva a lista de nomes de arquivos
-        with open(caminho_colecao / "manifest.json", "w") as f:
-            json.dump(nomes_arquivos_atuais, f)
+        _gravar_colecao_completa(COLECOES_DIR / nome_colecao, vector_store_atual, nomes_arquivos_atuais)
         st.success(f"Coleção '{nome_colecao}' salva com sucesso!")
         return True
     except Exception as e:
         st.error(f"Erro ao salvar coleção: {e}")
         return False
 
+def adicionar_documentos_a_colecao(nome_colecao, vector_store, docs_fragmentados, nomes_novos, _embeddings_obj):
+    """
+    Acrescenta novos documentos a uma coleção salva, gravando apenas o segmento novo.
+    Arquivos que já existiam na coleção são substituídos.
+    Retorna a lista atualizada de arquivos, ou None em caso de erro.
+    """
+    caminho_colecao = COLECOES_DIR / nome_colecao
+    try:
+        manifesto = _ler_manifesto(caminho_colecao)
+        indice_bm25 = obter_indice_bm25(vector_store)
+        for nome in nomes_novos:
+            if nome in manifesto["arquivos"]:
+                _remover_fonte(vector_store, nome, indice_bm25)
+                manifesto["arquivos"].remove(nome)
+                manifesto["operacoes"].append({"tipo": "remover", "arquivo": nome})
+
+        if docs_fragmentados:
+            # Só os fragmentos novos passam pelo modelo de embeddings (em lotes simultâneos, com retentativas),
+            # e cada texto repetido entre eles uma única vez
+            segmento = indexar_documentos_em_lotes(deduplicar_documentos(docs_fragmentados), _embeddings_obj)
+            nome_segmento = uuid.uuid4().hex
+            _gravar_vector_store(caminho_colecao / "segmentos" / nome_segmento, segmento)
+            _incorporar_segmento(vector_store, segmento, indice_bm25)
+            manifesto["operacoes"].append({"tipo": "adicionar", "segmento": nome_segmento, "arquivos": list(nomes_novos)})
+
+        manifesto["arquivos"].extend(nomes_novos)
+        _gravar_manifesto(caminho_colecao, manifesto)
+        indice_bm25.salvar(caminho_colecao / "bm25.json")
+        return manifesto["arquivos"]
+    except Exception as e:
+        st.error(f"Erro ao adicionar documentos à coleção '{nome_colecao}': {e}")
+        return None
+
+def remover_documento_da_colecao(nome_colecao, vector_store, nome_arquivo):
+    """
+    Remove os vetores de um arquivo da coleção, registrando a remoção no manifesto.
+    Retorna a lista atualizada de arquivos, ou None em caso de erro.
+    """
+    caminho_colecao = COLECOES_DIR / nome_colecao
+    try:
+        manifesto = _ler_manifesto(caminho_colecao)
+        indice_bm25 = obter_indice_bm25(vector_store)
+        _remover_fonte(vector_store, nome_arquivo, indice_bm25)
+        if nome_arquivo in manifesto["arquivos"]:
+            manifesto["arquivos"].remove(nome_arquivo)
+        manifesto["operacoes"].append({"tipo": "remover", "arquivo": nome_arquivo})
+        _gravar_manifesto(caminho_colecao, manifesto)
+        indice_bm25.salvar(caminho_colecao / "bm25.json")
+        return manifesto["arquivos"]
+    except Exception as e:
+        st.error(f"Erro ao remover '{nome_arquivo}' da coleção '{nome_colecao}': {e}")
+        return None
+
+def _reaplicar_operacoes(caminho_colecao, vector_store, manifesto, abrir_segmento):
+    """Reaplica as adições e remoções incrementais do manifesto, em ordem."""
+    for operacao in manifesto["operacoes"]:
+        if operacao["tipo"] == "adicionar":
+            _incorporar_segmento(vector_store, abrir_segmento(caminho_colecao / "segmentos" / operacao["segmento"]))
+        elif operacao["tipo"] == "remover":
+            _remover_fonte(vector_store, operacao["arquivo"])
+
+def precisa_migrar(nome_colecao):
+    """Se a coleção (ou algum segmento dela) ainda está no formato antigo, com pickle."""
+    caminho_colecao = COLECOES_DIR / nome_colecao
+    manifesto = _ler_manifesto(caminho_colecao)
+    if not manifesto.get("base"):
+        return True
+    return any(
+        _formato_antigo(caminho_colecao / "segmentos" / operacao["segmento"])
+        for operacao in manifesto["operacoes"] if operacao["tipo"] == "adicionar"
+    )
+
+def migrar_colecao(nome_colecao, _embeddings_obj=None):
+    """
+    Converte uma coleção do formato antigo (`FAISS.save_local`, docstore em pickle) para o atual.
+    É o único ponto que ainda desserializa pickle, e só roda pelo comando `python -m services.collections`.
+    """
+    caminho_colecao = COLECOES_DIR / nome_colecao
+    manifesto = _ler_manifesto(caminho_colecao)
+
+    def _abrir_qualquer_formato(caminho):
+        if _formato_antigo(caminho):
+            return FAISS.load_local(str(caminho), embeddings=_embeddings_obj, allow_dangerous_deserialization=True)
+        return _abrir_vector_store(caminho, _embeddings_obj)
+
+    if manifesto.get("base"):
+        vector_store = _abrir_vector_store(caminho_colecao / manifesto["base"], _embeddings_obj)
+    else:
+        vector_store = _abrir_qualquer_formato(caminho_colecao / "faiss_index")
+    _reaplicar_operacoes(caminho_colecao, vector_store, manifesto, _abrir_qualquer_formato)
+    registrar_indice_bm25(vector_store, carregar_ou_construir_indice_bm25(caminho_colecao / "bm25.json", vector_store))
+    _gravar_colecao_completa(caminho_colecao, vector_store, manifesto["arquivos"])
+
 @st.cache_resource(show_spinner="Carregando coleção do disco...")
 def carregar_colecao(nome_colecao, _embeddings_obj):
     """
-    Carrega um vector store e seu manifesto a partir do disco.
+    Carrega um vector store e seu manifesto a partir do disco,
+    reaplicando as adições e remoções incrementais registradas no manifesto.
+    Coleções no formato antigo não são abertas (exigiriam desserializar pickle): levantam
+    ValueError, que não fica no cache, e precisam ser migradas com `python -m services.collections`.
     """
     caminho_colecao = COLECOES_DIR / nome_colecao
-    caminho_indice = caminho_colecao / "faiss_index"
     caminho_manifesto = caminho_colecao / "manifest.json"
 
-    if not caminho_indice.exists() or not caminho_manifesto.exists():
+    if not caminho_manifesto.exists():
         st.error(f"Coleção '{nome_colecao}' está corrompida ou incompleta.")
         return None, None
+    if precisa_migrar(nome_colecao):
+        raise ValueError(f"Coleção '{nome_colecao}' no formato antigo; migre com: python -m services.collections")
     try:
-        # Carrega o índice FAISS, permitindo deserialização
-        vector_store = FAISS.load_local(
-            str(caminho_indice),
-            embeddings=_embeddings_obj,
-            allow_dangerous_deserialization=True
+        manifesto = _ler_manifesto(caminho_colecao)
+        vector_store = _abrir_vector_store(caminho_colecao / manifesto["base"], _embeddings_obj)
+        aplicar_parametros_busca(vector_store.index)
+        _reaplicar_operacoes(
+            caminho_colecao, vector_store, manifesto,
+            lambda caminho: _abrir_vector_store(caminho, _embeddings_obj)
         )
-        # Carrega a lista de nomes de arquivos
-        with open(caminho_manifesto, "r") as f:
-            nomes_arquivos = json.load(f)
+        # bm25.json acompanha o estado final; coleções antigas, sem ele, têm o índice reconstruído
+        registrar_indice_bm25(vector_store, carregar_ou_construir_indice_bm25(caminho_colecao / "bm25.json", vector_store))
         st.success(f"Coleção '{nome_colecao}' carregada com sucesso!")
-        return vector_store, nomes_arquivos
+        return vector_store, manifesto["arquivos"]
     except Exception as e:
         st.error(f"Erro ao carregar coleção '{nome_colecao}': {e}")
         return None, None
+
+
+if __name__ == "__main__":
+    # Migra de uma vez todas as coleções salvas no formato antigo: python -m services.collections
+    for nome in listar_colecoes_salvas():
+        if (COLECOES_DIR / nome / "manifest.json").exists() and precisa_migrar(nome):
+            migrar_colecao(nome)
+            print(f"Coleção '{nome}' migrada.")
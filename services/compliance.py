@@ -1,40 +1,155 @@
-import streamlit as st
-from langchain.chains import LLMChain
+import json
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from core.config import CACHE_DIR, LLM_MAX_CONCORRENCIA
+from core.concurrency import iterar_em_paralelo
+from core.llm_engine import PRIORIDADE_LOTE, PRIORIDADE_NORMAL
+from core.model_router import ObterRunnable, fabrica_de_llm, invocar_em_lote_roteado, invocar_roteado
 from core.locale import TRANSLATIONS
+from services.clause_alignment import VERSAO_SEGMENTACAO, preparar_clausulas, alinhar_clausulas
 
-@st.cache_data # Removido show_spinner
-def verificar_conformidade_documento(ref_texto, ref_nome, doc_texto, doc_nome, google_api_key, lang_code):
+# Tamanho máximo (em caracteres) de cada lote de cláusulas enviado ao LLM
+TAMANHO_LOTE_CLAUSULAS = 20000
+
+# Aumentando o peso da instrução de idioma no início do prompt
+PROMPT_LOTE = (
+    "Seu relatório final **DEVE SER ESCRITO INTEGRALMENTE EM {language}**. "
+    "Você é um especialista em conformidade. Abaixo estão cláusulas do DOCUMENTO A ANALISAR ({doc_nome}) "
+    "alinhadas às cláusulas correspondentes do DOCUMENTO DE REFERÊNCIA ({ref_nome}). "
+    "Cláusulas idênticas já foram removidas. Aponte as divergências relevantes de cada item, "
+    "incluindo cláusulas ausentes ou adicionadas.\n\n{itens}\n\nRelatório de conformidade:"
+)
+PROMPT_CONSOLIDACAO = (
+    "Seu relatório final **DEVE SER ESCRITO INTEGRALMENTE EM {language}**. "
+    "Você é um especialista em conformidade. Consolide os apontamentos parciais abaixo, da comparação do "
+    "DOCUMENTO A ANALISAR ({doc_nome}) com o DOCUMENTO DE REFERÊNCIA ({ref_nome}), em um único relatório. "
+    "{identicas} cláusulas idênticas à referência foram omitidas da análise.\n\n{parciais}\n\nRelatório de conformidade:"
+)
+
+def _itens_para_llm(alinhamento):
+    """Formata cada divergência, ausência ou adição como um item de texto independente."""
+    itens = []
+    for ref, doc, _ in alinhamento["divergentes"]:
+        itens.append(f"[REFERÊNCIA]\n{ref}\n[DOCUMENTO]\n{doc}")
+    for ref in alinhamento["ausentes"]:
+        itens.append(f"[REFERÊNCIA]\n{ref}\n[DOCUMENTO]\n(cláusula ausente)")
+    for doc in alinhamento["extras"]:
+        itens.append(f"[REFERÊNCIA]\n(sem correspondente)\n[DOCUMENTO]\n{doc}")
+    return itens
+
+def _agrupar_em_lotes(itens, limite=TAMANHO_LOTE_CLAUSULAS):
+    lotes, atual, tamanho = [], [], 0
+    for item in itens:
+        if atual and tamanho + len(item) > limite:
+            lotes.append(atual)
+            atual, tamanho = [], 0
+        atual.append(item)
+        tamanho += len(item)
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+def comparar_com_referencia(referencia, doc_texto, ref_nome, doc_nome, obter_llm_conformidade: ObterRunnable, embeddings_obj, lang_code, prioridade=PRIORIDADE_NORMAL):
+    """
+    Compara um documento a uma referência já preparada (ver `preparar_clausulas`).
+    Só as cláusulas divergentes vão ao LLM, em lotes paralelos pelo motor do LLM.
+    Retorna o relatório e a contagem de cláusulas idênticas e divergentes.
+    """
+    language_name = TRANSLATIONS[lang_code]["lang_selector_label"]
+
+    alinhamento = alinhar_clausulas(referencia, preparar_clausulas(doc_texto, embeddings_obj))
+    itens = _itens_para_llm(alinhamento)
+    resultado = {"identicas": alinhamento["identicas"], "divergentes": len(itens)}
+    lotes = _agrupar_em_lotes(itens)
+    if not lotes:
+        resultado["relatorio"] = TRANSLATIONS[lang_code]["compliance_no_divergences"].format(identicas=alinhamento["identicas"])
+        return resultado
+
+    prompt_lote = PromptTemplate.from_template(PROMPT_LOTE)
+    prompts = [
+        prompt_lote.format(language=language_name, doc_nome=doc_nome, ref_nome=ref_nome, itens="\n\n---\n\n".join(lote))
+        for lote in lotes
+    ]
+    parciais = [resposta.content for resposta in invocar_em_lote_roteado("conformidade", obter_llm_conformidade, prompts, prioridade)]
+    if len(parciais) == 1:
+        resultado["relatorio"] = parciais[0]
+        return resultado
+
+    prompt = PromptTemplate.from_template(PROMPT_CONSOLIDACAO).format(
+        language=language_name, doc_nome=doc_nome, ref_nome=ref_nome,
+        identicas=alinhamento["identicas"], parciais="\n\n---\n\n".join(parciais)
+    )
+    resultado["relatorio"] = invocar_roteado("conformidade", obter_llm_conformidade, prompt, prioridade).content
+    return resultado
+
+def _caminho_relatorio(ref_hash, doc_hash, lang_code):
+    return CACHE_DIR / "conformidade" / f"{ref_hash}_{doc_hash}_{lang_code}_s{VERSAO_SEGMENTACAO}.json"
+
+def obter_relatorio_salvo(ref_hash, doc_hash, lang_code):
+    """Relatório já gerado para o mesmo par (referência, documento) e idioma, se houver."""
+    caminho = _caminho_relatorio(ref_hash, doc_hash, lang_code)
+    if not caminho.exists():
+        return None
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _salvar_relatorio(ref_hash, doc_hash, lang_code, resultado):
+    caminho = _caminho_relatorio(ref_hash, doc_hash, lang_code)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho_temp = caminho.with_suffix(".tmp")
+    with open(caminho_temp, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False)
+    caminho_temp.replace(caminho)
+
+def verificar_conformidade_em_lote(ref_texto, ref_nome, ref_hash, documentos, google_api_key, lang_code, embeddings_obj):
+    """
+    Compara vários documentos ({"nome", "texto", "hash"}) a uma mesma referência.
+
+    A referência é segmentada e tem seus embeddings calculados uma única vez. Documentos
+    cujo relatório já está salvo para esta referência são pulados; os demais são comparados
+    em paralelo. Gera (nome, resultado, veio_do_cache) à medida que cada um termina;
+    em caso de falha, o resultado contém a chave "erro".
+    """
+    pendentes = []
+    for doc in documentos:
+        salvo = obter_relatorio_salvo(ref_hash, doc["hash"], lang_code)
+        if salvo:
+            yield doc["nome"], salvo, True
+        else:
+            pendentes.append(doc)
+    if not pendentes:
+        return
+
+    obter_llm_conformidade = fabrica_de_llm(0.1, google_api_key)
+    referencia = preparar_clausulas(ref_texto, embeddings_obj)
+
+    def _comparar(doc):
+        try:
+            # Em lote, as chamadas cedem a vez ao chat e às análises pedidas na hora
+            resultado = comparar_com_referencia(
+                referencia, doc["texto"], ref_nome, doc["nome"], obter_llm_conformidade, embeddings_obj, lang_code, PRIORIDADE_LOTE
+            )
+        except Exception as e:
+            return {"erro": str(e)}
+        _salvar_relatorio(ref_hash, doc["hash"], lang_code, resultado)
+        return resultado
+
+    for indice, resultado in iterar_em_paralelo(_comparar, pendentes, max_workers=LLM_MAX_CONCORRENCIA):
+        yield pendentes[indice]["nome"], resultado, False
+
+def verificar_conformidade_documento(ref_texto, ref_nome, doc_texto, doc_nome, google_api_key, lang_code, embeddings_obj=None):
     """
     Verifica a conformidade entre dois documentos, com prompt sensível ao idioma.
+    As cláusulas são alinhadas localmente e só as divergentes são analisadas pela IA.
     """
-    if not ref_texto or not doc_texto or not google_api_key:
+    if not ref_texto or not doc_texto or not google_api_key or not embeddings_obj:
         return "Erro: faltam dados ou chave API."
 
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.1)
-    
-    language_name = TRANSLATIONS[lang_code]["lang_selector_label"]
-    
-    # Aumentando o peso da instrução de idioma no início do prompt
-    prompt_template = (
-        "Seu relatório final **DEVE SER ESCRITO INTEGRALMENTE EM {language}**. "
-        "Você é um especialista em conformidade. Compare o DOCUMENTO A ANALISAR ({doc_nome}) "
-        "com o DOCUMENTO DE REFERÊNCIA ({ref_nome}).\n\n"
-        "Documento de referência:\n{ref}\n\nDocumento a analisar:\n{doc}\n\nRelatório de conformidade:"
-    )
-    
-    prompt = PromptTemplate.from_template(prompt_template)
-    
-    chain = LLMChain(llm=llm, prompt=prompt)
+    obter_llm_conformidade = fabrica_de_llm(0.1, google_api_key)
     try:
-        res = chain.invoke({
-            "doc_nome": doc_nome,
-            "ref_nome": ref_nome,
-            "language": language_name,
-            "ref": ref_texto[:25000],
-            "doc": doc_texto[:25000]
-        })
-        return res['text']
+        referencia = preparar_clausulas(ref_texto, embeddings_obj)
+        return comparar_com_referencia(referencia, doc_texto, ref_nome, doc_nome, obter_llm_conformidade, embeddings_obj, lang_code)["relatorio"]
     except Exception as e:
         return f"Erro na análise de conformidade: {e}"
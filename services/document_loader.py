@@ -1,128 +1,88 @@
 import streamlit as st
-import os, time, base64
-from pathlib import Path
-import fitz
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import AIMessage, HumanMessage
-
-@st.cache_resource # Removido show_spinner
-def obter_vector_store_de_uploads(lista_arquivos_pdf_upload, _embeddings_obj, google_api_key):
-    if not lista_arquivos_pdf_upload or not google_api_key or not _embeddings_obj:
-        return None, None
-
-    documentos_totais = []
-    nomes_arquivos_processados = []
-
+from core.config import PDF_MAX_PROCESSOS, FRAGMENTO_TAMANHO_MAXIMO
+from core.model_router import fabrica_de_llm, modelo_da_tarefa
+from services.clause_splitter import DivisorClausulas
+from services.ocr import ocr_pdf_com_gemini
+from services.pdf_text import extrair_paginas_pdf, iterar_paginas_em_paralelo
+from services.document_texts import hash_conteudo
+
+def _documentos_das_paginas(nome_arquivo, paginas):
+    return [
+        Document(page_content=texto, metadata={"source": nome_arquivo, "page": num_pagina, "method": metodo})
+        for num_pagina, texto, metodo in paginas
+    ]
+
+def extrair_camada_de_texto(nome_arquivo, pdf_bytes):
+    """
+    Texto das páginas de um PDF pela camada de texto, lido da memória (sem arquivo temporário).
+    Retorna os documentos por página; lista vazia quando o PDF não tem texto (ex: digitalizado).
+    """
+    return _documentos_das_paginas(nome_arquivo, extrair_paginas_pdf(pdf_bytes))
+
+def iterar_camadas_de_texto(arquivos, max_processos=PDF_MAX_PROCESSOS):
+    """Como `extrair_camada_de_texto` para vários (nome, bytes), em processos paralelos; entrega (índice, documentos) ao terminar cada um."""
+    for indice, paginas in iterar_paginas_em_paralelo([pdf_bytes for _, pdf_bytes in arquivos], max_processos):
+        yield indice, _documentos_das_paginas(arquivos[indice][0], paginas)
+
+def extrair_com_ocr(nome_arquivo, pdf_bytes, obter_llm_visao):
+    """OCR com Gemini Vision, para PDFs sem camada de texto (páginas em paralelo, com limite de taxa)."""
+    documentos_arquivo_atual = []
+    textos_paginas = ocr_pdf_com_gemini(pdf_bytes, obter_llm_visao)
+    for page_num, texto in enumerate(textos_paginas):
+        if texto is not None:
+            documentos_arquivo_atual.append(Document(
+                page_content=texto,
+                metadata={"source": nome_arquivo, "page": page_num, "method": "gemini_vision"}
+            ))
+    return documentos_arquivo_atual
+
+def obter_llm_visao(google_api_key):
+    """Fábrica (nome do modelo -> cliente) do modelo de visão, ou None se o cliente não puder ser criado."""
+    fabrica = fabrica_de_llm(0.1, google_api_key, request_timeout=300)
     try:
-        llm_vision = ChatGoogleGenerativeAI(
-            model="gemini-2.5-pro", temperature=0.1, request_timeout=300
-        )
+        fabrica(modelo_da_tarefa("ocr"))
+        return fabrica
     except Exception as e:
         st.warning(f"Não foi possível inicializar o modelo de visão do Gemini: {e}")
-        llm_vision = None
+        return None
+
+def extrair_documentos_de_uploads(lista_arquivos_pdf_upload, google_api_key):
+    """
+    Extrai o texto de cada PDF carregado (camada de texto em paralelo e, por fim, OCR com Gemini Vision).
+    Retorna os documentos por página, a lista de arquivos processados com sucesso
+    e o texto por página de cada arquivo, para ser reaproveitado pelas abas.
+    """
+    documentos_totais = []
+    nomes_arquivos_processados = []
+    textos_por_arquivo = {}
+    llm_vision = obter_llm_visao(google_api_key)
 
-    for arquivo_pdf_upload in lista_arquivos_pdf_upload:
-        nome_arquivo = arquivo_pdf_upload.name
-        documentos_arquivo_atual = []
-        texto_extraido_com_sucesso = False
-        temp_file_path = Path(f"temp_{nome_arquivo}")
+    arquivos = [(arquivo.name, arquivo.getvalue()) for arquivo in lista_arquivos_pdf_upload]
+    documentos_por_arquivo = dict(iterar_camadas_de_texto(arquivos))
 
-        try:
-            with open(temp_file_path, "wb") as f:
-                f.write(arquivo_pdf_upload.getbuffer())
+    for indice, (nome_arquivo, pdf_bytes) in enumerate(arquivos):
+        documentos_arquivo_atual = documentos_por_arquivo[indice]
 
-            # Tentativa 1: PyPDFLoader
+        if not documentos_arquivo_atual and llm_vision:
             try:
-                loader = PyPDFLoader(str(temp_file_path))
-                pages = loader.load()
-                for page_num, page_obj in enumerate(pages):
-                    if page_obj.page_content.strip():
-                        doc = Document(
-                            page_content=page_obj.page_content,
-                            metadata={"source": nome_arquivo, "page": page_num, "method": "pypdf"}
-                        )
-                        documentos_arquivo_atual.append(doc)
-                if documentos_arquivo_atual:
-                    texto_extraido_com_sucesso = True
+                documentos_arquivo_atual = extrair_com_ocr(nome_arquivo, pdf_bytes, llm_vision)
             except Exception:
-                pass # Tenta o próximo método
-
-            # Tentativa 2: PyMuPDF
-            if not texto_extraido_com_sucesso:
-                try:
-                    documentos_arquivo_atual = []
-                    doc_fitz = fitz.open(str(temp_file_path))
-                    for num_pagina, pagina in enumerate(doc_fitz):
-                        texto = pagina.get_text("text")
-                        if texto.strip():
-                            doc = Document(
-                                page_content=texto,
-                                metadata={"source": nome_arquivo, "page": num_pagina, "method": "pymupdf"}
-                            )
-                            documentos_arquivo_atual.append(doc)
-                    doc_fitz.close()
-                    if documentos_arquivo_atual:
-                        texto_extraido_com_sucesso = True
-                except Exception:
-                    pass # Tenta o próximo método
-
-            # Tentativa 3: Gemini Vision OCR
-            if not texto_extraido_com_sucesso and llm_vision:
-                documentos_arquivo_atual = []
-                try:
-                    arquivo_pdf_upload.seek(0)
-                    pdf_bytes = arquivo_pdf_upload.read()
-                    doc_fitz_vision = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-                    prompt = "Você é um especialista em OCR. Extraia todo o texto desta página."
-
-                    for page_num in range(len(doc_fitz_vision)):
-                        page = doc_fitz_vision.load_page(page_num)
-                        pix = page.get_pixmap(dpi=300)
-                        img_bytes = pix.tobytes("png")
-                        base64_image = base64.b64encode(img_bytes).decode("utf-8")
-
-                        human_message = HumanMessage(content=[
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": f"data:image/png;base64,{base64_image}"}
-                        ])
-
-                        ai_msg = llm_vision.invoke([human_message])
-
-                        if isinstance(ai_msg, AIMessage) and isinstance(ai_msg.content, str):
-                            doc = Document(
-                                page_content=ai_msg.content,
-                                metadata={"source": nome_arquivo, "page": page_num, "method": "gemini_vision"}
-                            )
-                            documentos_arquivo_atual.append(doc)
-                        time.sleep(2)
-
-                    doc_fitz_vision.close()
-                    if documentos_arquivo_atual:
-                        texto_extraido_com_sucesso = True
-                except Exception:
-                     pass # Falha não impede o resto
-
-            if texto_extraido_com_sucesso:
-                documentos_totais.extend(documentos_arquivo_atual)
-                nomes_arquivos_processados.append(nome_arquivo)
-            else:
-                st.error(f"Não foi possível extrair texto de {nome_arquivo}.")
-
-        finally:
-            if temp_file_path.exists():
-                try: os.remove(temp_file_path)
-                except: pass
-
-    if not documentos_totais:
-        return None, []
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
-    docs_fragmentados = splitter.split_documents(documentos_totais)
-    vector_store = FAISS.from_documents(docs_fragmentados, _embeddings_obj)
-    return vector_store, nomes_arquivos_processados
-
+                pass # Falha não impede o resto
+
+        if documentos_arquivo_atual:
+            documentos_totais.extend(documentos_arquivo_atual)
+            nomes_arquivos_processados.append(nome_arquivo)
+            textos_por_arquivo[nome_arquivo] = {
+                "hash": hash_conteudo(pdf_bytes),
+                "paginas": [doc.page_content for doc in documentos_arquivo_atual],
+            }
+        else:
+            st.error(f"Não foi possível extrair texto de {nome_arquivo}.")
+
+    return documentos_totais, nomes_arquivos_processados, textos_por_arquivo
+
+def fragmentar_documentos(documentos):
+    """Divide os documentos em fragmentos para indexação, um por cláusula (até FRAGMENTO_TAMANHO_MAXIMO caracteres)."""
+    splitter = DivisorClausulas(chunk_size=FRAGMENTO_TAMANHO_MAXIMO)
+    return splitter.split_documents(documentos)
@@ -0,0 +1,46 @@
+import hashlib
+import streamlit as st
+from typing import Dict, List
+
+def hash_conteudo(conteudo: bytes) -> str:
+    """Hash do conteúdo de um arquivo, usado como chave do texto extraído."""
+    return hashlib.sha256(conteudo).hexdigest()
+
+def registrar_textos_documentos(textos_por_arquivo: Dict[str, dict], substituir: bool = True):
+    """
+    Guarda na sessão o texto por página extraído na ingestão.
+    `textos_por_arquivo` mapeia nome do arquivo -> {"hash": ..., "paginas": [...]}.
+    """
+    if substituir or "textos_documentos" not in st.session_state:
+        st.session_state.textos_documentos = {}
+        st.session_state.hash_por_arquivo = {}
+    for nome, info in textos_por_arquivo.items():
+        st.session_state.textos_documentos[info["hash"]] = info["paginas"]
+        st.session_state.hash_por_arquivo[nome] = info["hash"]
+
+def limpar_textos_documentos():
+    """Esquece os textos da sessão (ex: ao abrir uma coleção salva)."""
+    st.session_state.textos_documentos = {}
+    st.session_state.hash_por_arquivo = {}
+
+def remover_texto_documento(nome_arquivo: str):
+    hash_arquivo = st.session_state.get("hash_por_arquivo", {}).pop(nome_arquivo, None)
+    if hash_arquivo and hash_arquivo not in st.session_state.hash_por_arquivo.values():
+        st.session_state.textos_documentos.pop(hash_arquivo, None)
+
+def listar_documentos_com_texto() -> List[str]:
+    """Nomes dos arquivos cujo texto está disponível na sessão."""
+    return list(st.session_state.get("hash_por_arquivo", {}).keys())
+
+def obter_hash_documento(nome_arquivo: str):
+    return st.session_state.get("hash_por_arquivo", {}).get(nome_arquivo)
+
+def obter_paginas(nome_arquivo: str) -> List[str]:
+    """Texto de cada página do arquivo, sem reabrir o PDF."""
+    hash_arquivo = obter_hash_documento(nome_arquivo)
+    if not hash_arquivo:
+        return []
+    return st.session_state.textos_documentos.get(hash_arquivo, [])
+
+def obter_texto_completo(nome_arquivo: str) -> str:
+    return "\n".join(obter_paginas(nome_arquivo))
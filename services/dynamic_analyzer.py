@@ -2,8 +2,9 @@ import streamlit as st
 from typing import List
 from pydantic import BaseModel, Field
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.output_parsers import PydanticOutputParser, OutputFixingParser
+from core.llm_engine import PRIORIDADE_LOTE, modelo_do_runnable, obter_motor_llm
+from core.model_router import fabrica_de_llm, invocar_roteado, modelo_da_tarefa
 from core.locale import TRANSLATIONS
 
 class PontoChave(BaseModel):
@@ -13,12 +14,12 @@ class PontoChave(BaseModel):
 class ListaPontosChave(BaseModel):
     pontos_chave: List[PontoChave]
 
-@st.cache_data
 def identificar_pontos_chave_dinamicos(textos_contratos: str, google_api_key: str, lang_code: str):
     if not textos_contratos or not google_api_key:
         return []
 
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.1)
+    obter_llm_tarefa = fabrica_de_llm(0.1, google_api_key)
+    llm = obter_llm_tarefa(modelo_da_tarefa("pontos_chave", escalar=True))
     
     # Atualiza a descrição do Pydantic dinamicamente com base no idioma
     PontoChave.model_fields['descricao'].description = TRANSLATIONS[lang_code]['dynamic_analyzer_field_description'].format(language=TRANSLATIONS[lang_code]["lang_selector_label"])
@@ -34,15 +35,17 @@ def identificar_pontos_chave_dinamicos(textos_contratos: str, google_api_key: st
         partial_variables={"format_instructions": parser.get_format_instructions()}
     )
     
-    chain = prompt | llm
+    cadeia = lambda modelo: prompt | obter_llm_tarefa(modelo)
 
     try:
         # CORREÇÃO: Usar o nome completo do idioma (ex: "Português", "English") conforme a chave 'lang_selector_label'
         language_name = TRANSLATIONS[lang_code]["lang_selector_label"]
-        resultado_bruto = chain.invoke({
+        # Faz parte da extração do dashboard: vai pelo motor do LLM em prioridade de lote
+        motor = obter_motor_llm()
+        resultado_bruto = invocar_roteado("pontos_chave", cadeia, {
             "textos_contratos": textos_contratos[:25000], 
             "language": language_name
-        })
+        }, PRIORIDADE_LOTE, validar=lambda resposta: bool(parser.parse(resposta.content).pontos_chave), motor=motor)
         
         # Tenta o parser normal primeiro
         try:
@@ -50,7 +53,9 @@ def identificar_pontos_chave_dinamicos(textos_contratos: str, google_api_key: st
         except Exception:
             # Se falhar, usa o parser de correção
             st.warning(TRANSLATIONS[lang_code].get("warning_ai_not_json", "A resposta inicial da IA não estava em JSON. Tentando corrigir...")) # Usando .get para evitar erro se a chave não estiver no locale
-            resultado_parseado = output_fixing_parser.parse(resultado_bruto.content)
+            resultado_parseado = motor.executar(
+                lambda: output_fixing_parser.aparse(resultado_bruto.content), modelo_do_runnable(llm), PRIORIDADE_LOTE
+            )
             
         return resultado_parseado.pontos_chave
         
@@ -1,69 +1,111 @@
 import streamlit as st
-import time
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Tuple
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.output_parsers import PydanticOutputParser, OutputFixingParser
+from core.llm_engine import PRIORIDADE_LOTE, MotorLLM, modelo_do_runnable, obter_motor_llm
+from core.model_router import ObterRunnable, fabrica_de_llm, iterar_roteado, modelo_da_tarefa
 from core.schemas import ListaDeEventos
 from core.locale import TRANSLATIONS
 
-@st.cache_data # Removido show_spinner
-def extrair_eventos_dos_contratos(docs: List[dict], google_api_key: str, lang_code: str):
+PROMPT_EVENTOS = (
+    "Analise o contrato {arquivo_fonte} e extraia eventos e datas. "
+    "A descrição de cada evento ('descricao_evento') deve ser em {language}.\n"
+    "{texto_contrato}\n\n{format_instructions}"
+)
+
+def _datas_validas(parsed: ListaDeEventos) -> bool:
+    """Toda data do evento deve vir em AAAA-MM-DD ou como não especificada."""
+    for e in parsed.eventos:
+        data = (e.data_evento_str or "").strip()
+        if data and data != "Não Especificado":
+            try:
+                datetime.strptime(data, "%Y-%m-%d")
+            except ValueError:
+                return False
+    return True
+
+def processar_eventos_em_paralelo(
+    docs: List[dict],
+    obter_llm_eventos: ObterRunnable,
+    lang_code: str,
+    prioridade: int = PRIORIDADE_LOTE,
+    motor: Optional[MotorLLM] = None,
+):
     """
-    Extrai eventos e prazos dos contratos, instruindo a IA a descrevê-los no idioma correto.
+    Extrai os eventos de cada documento em paralelo, pelo motor do LLM (concorrência e limite de
+    taxa compartilhados com as demais análises). A tarefa "eventos" usa o modelo rápido; respostas
+    que não validam no schema ou com datas fora do formato são refeitas no modelo avançado.
+    Retorna as linhas de eventos na ordem dos documentos e a lista de erros por arquivo.
     """
-    if not docs or not google_api_key:
-        return []
-
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0)
+    motor = motor or obter_motor_llm()
     parser = PydanticOutputParser(pydantic_object=ListaDeEventos)
-    
-    prompt_template = (
-        "Analise o contrato {arquivo_fonte} e extraia eventos e datas. "
-        "A descrição de cada evento ('descricao_evento') deve ser em {language}.\n"
-        "{texto_contrato}\n\n{format_instructions}"
-    )
-    
-    prompt = PromptTemplate.from_template(prompt_template)
-    fixer = OutputFixingParser.from_llm(parser=parser, llm=llm)
+    prompt = PromptTemplate.from_template(PROMPT_EVENTOS)
+    # O fixer só corrige o que nem o modelo avançado entregou no formato
+    llm_avancado = obter_llm_eventos(modelo_da_tarefa("eventos", escalar=True))
+    fixer = OutputFixingParser.from_llm(parser=parser, llm=llm_avancado)
+    language_name = TRANSLATIONS[lang_code]["lang_selector_label"]
 
-    eventos = []
-    
-    for i, doc in enumerate(docs):
+    prompts = [
+        prompt.format(
+            arquivo_fonte=doc["nome"],
+            language=language_name,
+            texto_contrato=doc["texto"][:25000],
+            format_instructions=parser.get_format_instructions()
+        )
+        for doc in docs
+    ]
+
+    def _linhas_do_documento(doc, resposta):
         try:
-            language_name = TRANSLATIONS[lang_code]["lang_selector_label"]
-            formatted_prompt = prompt.format(
-                arquivo_fonte=doc["nome"],
-                language=language_name,
-                texto_contrato=doc["texto"][:25000],
-                format_instructions=parser.get_format_instructions()
-            )
-            
-            resposta = llm.invoke(formatted_prompt)
-            
+            parsed = parser.parse(resposta.content)
+        except Exception:
+            parsed = motor.executar(lambda: fixer.aparse(resposta.content), modelo_do_runnable(llm_avancado), prioridade)
+
+        linhas = []
+        for e in parsed.eventos:
             try:
-                parsed = parser.parse(resposta.content)
-            except Exception:
-                parsed = fixer.parse(resposta.content)
+                data_obj = datetime.strptime(e.data_evento_str, "%Y-%m-%d").date()
+            except (ValueError, TypeError):
+                data_obj = None
+            linhas.append({
+                "Arquivo": doc["nome"],
+                "Evento": e.descricao_evento,
+                "Data": e.data_evento_str,
+                "DataObj": data_obj,
+                "Trecho": e.trecho_relevante
+            })
+        return linhas
 
-            for e in parsed.eventos:
-                try:
-                    data_obj = datetime.strptime(e.data_evento_str, "%Y-%m-%d").date()
-                except (ValueError, TypeError):
-                    data_obj = None
-                eventos.append({
-                    "Arquivo": doc["nome"],
-                    "Evento": e.descricao_evento,
-                    "Data": e.data_evento_str,
-                    "DataObj": data_obj,
-                    "Trecho": e.trecho_relevante
-                })
+    resultados: List[Tuple[list, Optional[Exception]]] = [None] * len(docs)
+    respostas = iterar_roteado(
+        "eventos", obter_llm_eventos, prompts, prioridade,
+        validar=lambda resposta: _datas_validas(parser.parse(resposta.content)), motor=motor,
+    )
+    for indice, resposta in respostas:
+        doc = docs[indice]
+        try:
+            if isinstance(resposta, Exception):
+                raise resposta
+            resultados[indice] = (_linhas_do_documento(doc, resposta), None)
         except Exception as e:
-            st.warning(f"Erro ao processar eventos em {doc['nome']}: {e}")
-            eventos.append({"Arquivo": doc["nome"], "Evento": f"Erro {e}", "Data": "", "DataObj": None, "Trecho": ""})
-        time.sleep(1.2)
-        
-    return eventos
+            resultados[indice] = ([{"Arquivo": doc["nome"], "Evento": f"Erro {e}", "Data": "", "DataObj": None, "Trecho": ""}], e)
+
+    eventos = [linha for linhas, _ in resultados for linha in linhas]
+    erros = [(doc["nome"], erro) for doc, (_, erro) in zip(docs, resultados) if erro is not None]
+    return eventos, erros
+
+def extrair_eventos_dos_contratos(docs: List[dict], google_api_key: str, lang_code: str):
+    """
+    Extrai eventos e prazos dos contratos, instruindo a IA a descrevê-los no idioma correto.
+    """
+    if not docs or not google_api_key:
+        return []
+
+    eventos, erros = processar_eventos_em_paralelo(docs, fabrica_de_llm(0, google_api_key), lang_code)
 
+    # Os avisos são emitidos aqui porque as threads de trabalho não têm contexto do Streamlit
+    for nome, erro in erros:
+        st.warning(f"Erro ao processar eventos em {nome}: {erro}")
 
+    return eventos
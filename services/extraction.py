@@ -1,14 +1,84 @@
+import re
 import streamlit as st
-import re, time
 from typing import Optional
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import Field, create_model
+from langchain.output_parsers import PydanticOutputParser
 from langchain.vectorstores import FAISS
+from langchain_core.utils.json import parse_json_markdown
+from core.config import RETRIEVER_K
+from core.llm_engine import PRIORIDADE_LOTE
+from core.llm_registry import obter_retriever
+from core.model_router import fabrica_de_cadeia, iterar_roteado
 from services.dynamic_analyzer import identificar_pontos_chave_dinamicos
 from core.locale import TRANSLATIONS # Import the TRANSLATIONS dictionary
 
-@st.cache_data(show_spinner="Extracting dynamic data from contracts...")
+# Use prompts neutros em inglês para a extração (RAG) interna para ser consistente
+PROMPT_CAMPO_UNICO = "Context:\n{contexto}\n\nBased on the context, answer concisely: {pergunta}\nAnswer:"
+PROMPT_MULTIPLOS_CAMPOS = (
+    "Context:\n{contexto}\n\n"
+    "Based on the context, answer each of the fields below concisely. "
+    "Use null when the context does not contain the answer.\n\n"
+    "{format_instructions}\n"
+)
+# Respostas de campo único que indicam que o modelo não achou a informação (PT/EN/ES)
+PADRAO_SEM_RESPOSTA = re.compile(
+    r"^\W*(?:null|none|n/?a|unknown|not (?:found|specified|mentioned|available)|"
+    r"n[ãa]o (?:encontrad[oa]|especificad[oa]|informad[oa]|mencionad[oa])|no (?:encontrad[oa]|especificad[oa]|disponible))\W*$",
+    re.IGNORECASE,
+)
+
+def _modelo_dos_campos(pontos_chave):
+    """Cria um schema Pydantic com um campo opcional para cada ponto chave."""
+    campos = {
+        p.campo: (Optional[str], Field(default=None, description=p.descricao))
+        for p in pontos_chave
+    }
+    return create_model("DadosContrato", **campos)
+
+def _contexto_unificado(retriever, pontos_chave) -> str:
+    """
+    Recupera os fragmentos relevantes para todos os campos e junta a união, sem repetições.
+    """
+    vistos = set()
+    trechos = []
+    for ponto in pontos_chave:
+        for doc in retriever.get_relevant_documents(ponto.descricao):
+            chave = (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+            if chave not in vistos:
+                vistos.add(chave)
+                trechos.append(doc.page_content)
+    return "\n\n---\n\n".join(trechos)
+
+def _interpretar_resposta_em_lote(conteudo: str, pontos_chave, parser) -> dict:
+    """
+    Interpreta a resposta com todos os campos. Quando o objeto completo não valida,
+    aproveita individualmente os campos que vieram corretos.
+    Campos ausentes ficam fora do dicionário retornado.
+    """
+    try:
+        return parser.parse(conteudo).model_dump(exclude_unset=True)
+    except Exception:
+        pass
+    try:
+        bruto = parse_json_markdown(conteudo)
+    except Exception:
+        return {}
+    if not isinstance(bruto, dict):
+        return {}
+    dados = {}
+    for ponto in pontos_chave:
+        if ponto.campo not in bruto:
+            continue
+        valor = bruto[ponto.campo]
+        if valor is None or isinstance(valor, (str, int, float)):
+            dados[ponto.campo] = None if valor is None else str(valor)
+    return dados
+
+def _resposta_de_campo_valida(result) -> bool:
+    """Critério para refazer o campo no modelo avançado: resposta vazia ou de "não encontrado"."""
+    resposta = result["text"].strip()
+    return bool(resposta) and not PADRAO_SEM_RESPOSTA.match(resposta)
+
 def extrair_dados_dos_contratos_dinamico(
     _vector_store: Optional[FAISS],
     _nomes_arquivos: list,
@@ -16,6 +86,12 @@ def extrair_dados_dos_contratos_dinamico(
     google_api_key: str,
     lang_code: str  # Recebe o código do idioma
 ):
+    """
+    Extrai os pontos chave de cada contrato com uma única chamada ao LLM por arquivo, com os
+    arquivos em paralelo. Apenas os campos que não puderem ser interpretados são perguntados
+    novamente, um a um. As chamadas usam o modelo rápido e sobem para o avançado quando a
+    resposta não pode ser interpretada ou o campo volta sem resposta.
+    """
     texts = TRANSLATIONS[lang_code] # Load texts for the current language
 
     if not _vector_store or not google_api_key or not _nomes_arquivos:
@@ -23,52 +99,62 @@ def extrair_dados_dos_contratos_dinamico(
 
     pontos_chave = identificar_pontos_chave_dinamicos(textos_completos, google_api_key, lang_code)
     if not pontos_chave:
-        # CORREÇÃO: Usar texto localizado
-        st.warning(texts.get("warning_ai_no_key_points", "The AI could not identify key points for extraction. The dashboard will not be generated."))
+        st.warning(texts["warning_ai_no_key_points"])
         return []
 
     st.info(f"Dynamic fields identified by AI: {[p.campo for p in pontos_chave]}")
 
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0)
-    resultados = []
-    
-    total_ops = len(_nomes_arquivos) * len(pontos_chave)
-    op_atual = 0
-    barra = st.empty()
+    parser = PydanticOutputParser(pydantic_object=_modelo_dos_campos(pontos_chave))
+    cadeia_lote = fabrica_de_cadeia(PROMPT_MULTIPLOS_CAMPOS, 0, google_api_key, format_instructions=parser.get_format_instructions())
+    cadeia_campo = fabrica_de_cadeia(PROMPT_CAMPO_UNICO, 0, google_api_key)
 
-    for nome_arquivo in _nomes_arquivos:
-        dados = {"arquivo_fonte": nome_arquivo}
-        retriever = _vector_store.as_retriever(search_kwargs={'filter': {'source': nome_arquivo}, 'k': 5})
+    # O contexto de cada arquivo é montado localmente; as chamadas de todos os arquivos vão juntas
+    # para o motor do LLM, em prioridade de lote (o chat passa na frente)
+    retrievers = [obter_retriever(_vector_store, k=RETRIEVER_K, fonte=nome) for nome in _nomes_arquivos]
+    entradas = [{"contexto": _contexto_unificado(retriever, pontos_chave)} for retriever in retrievers]
 
-        for ponto in pontos_chave:
-            op_atual += 1
-            
-            # CORREÇÃO: Usar texto localizado para a barra de progresso
-            progress_text = texts.get("spinner_extracting_data", f"Extracting '{ponto.campo}' from {nome_arquivo}...")
-            if progress_text.startswith("Extracting"):
-                # Se for o texto padrão em inglês, formatar com os dados
-                progress_text = f"Extracting '{ponto.campo}' from {nome_arquivo}..."
-            elif progress_text.startswith("Extraindo"):
-                # Se for o texto em português, formatar com os dados
-                progress_text = f"Extraindo '{ponto.campo}' de {nome_arquivo}..."
-            
-            barra.progress(op_atual / total_ops, text=progress_text)
-
-            contexto = "\n\n---\n\n".join([doc.page_content for doc in retriever.get_relevant_documents(ponto.descricao)])
-            
-            # Use a prompt neutra em inglês para a extração (RAG) interna para ser consistente
-            prompt = PromptTemplate.from_template("Context:\n{contexto}\n\nBased on the context, answer concisely: {pergunta}\nAnswer:")
-            chain = LLMChain(llm=llm, prompt=prompt)
+    resultados = [{"arquivo_fonte": nome} for nome in _nomes_arquivos]
+    extraidos_por_arquivo = [{} for _ in _nomes_arquivos]
+    barra = st.empty()
+    barra.progress(0.0, text=texts["spinner_extracting_file"].format(filename=_nomes_arquivos[0]))
+    respostas = iterar_roteado(
+        "extracao", cadeia_lote, entradas, PRIORIDADE_LOTE,
+        validar=lambda result: bool(_interpretar_resposta_em_lote(result["text"], pontos_chave, parser)),
+    )
+    for concluidos, (i, result) in enumerate(respostas, start=1):
+        nome_arquivo = _nomes_arquivos[i]
+        barra.progress(concluidos / len(_nomes_arquivos), text=texts["spinner_extracting_file"].format(filename=nome_arquivo))
+        if isinstance(result, Exception):
+            st.warning(texts["warning_extraction_error"].format(field="*", filename=nome_arquivo, e=result))
+            continue
+        extraidos_por_arquivo[i] = _interpretar_resposta_em_lote(result['text'], pontos_chave, parser)
 
+    # Fallback: pergunta de novo apenas os campos que faltaram na resposta em lote
+    pendentes, entradas_campo = [], []
+    for i, extraidos in enumerate(extraidos_por_arquivo):
+        for ponto in pontos_chave:
+            if ponto.campo in extraidos:
+                resultados[i][ponto.campo] = extraidos[ponto.campo]
+                continue
             try:
-                result = chain.invoke({"contexto": contexto, "pergunta": ponto.descricao})
-                dados[ponto.campo] = result['text'].strip()
+                contexto_campo = "\n\n---\n\n".join(
+                    doc.page_content for doc in retrievers[i].get_relevant_documents(ponto.descricao)
+                )
             except Exception as e:
-                # CORREÇÃO: Usar texto localizado para o warning
-                st.warning(texts.get("warning_extraction_error", f"Error in field {ponto.campo} for {nome_arquivo}: {e}"))
-                dados[ponto.campo] = "Extraction Error"
-            time.sleep(1.2)
+                st.warning(texts["warning_extraction_error"].format(field=ponto.campo, filename=_nomes_arquivos[i], e=e))
+                resultados[i][ponto.campo] = "Extraction Error"
+                continue
+            pendentes.append((i, ponto.campo))
+            entradas_campo.append({"contexto": contexto_campo, "pergunta": ponto.descricao})
+
+    for j, result in iterar_roteado("extracao_campo", cadeia_campo, entradas_campo, PRIORIDADE_LOTE, validar=_resposta_de_campo_valida):
+        i, campo = pendentes[j]
+        if isinstance(result, Exception):
+            st.warning(texts["warning_extraction_error"].format(field=campo, filename=_nomes_arquivos[i], e=result))
+            resultados[i][campo] = "Extraction Error"
+        else:
+            resultados[i][campo] = result['text'].strip()
 
-        resultados.append(dados)
     barra.empty()
-    return resultados
+    # Colunas na ordem dos pontos chave, independentemente da ordem em que as respostas chegaram
+    return [{"arquivo_fonte": r["arquivo_fonte"], **{p.campo: r[p.campo] for p in pontos_chave if p.campo in r}} for r in resultados]
@@ -0,0 +1,437 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from core.bm25 import IndiceBM25, registrar_indice_bm25
+from core.dedup import deduplicar_documentos, fontes_do_fragmento
+from core.file_lock import trava_de_arquivo
+from core.embedding_batches import dividir_em_lotes, iterar_lotes_de_embeddings
+from core.config import CACHE_DIR, INGESTAO_MAX_JOBS, INGESTAO_HEARTBEAT_EXPIRA, INGESTAO_RETENCAO_HORAS
+from core.model_router import fabrica_de_llm, modelo_da_tarefa
+from services.document_loader import iterar_camadas_de_texto, extrair_com_ocr, fragmentar_documentos
+from services.document_texts import hash_conteudo
+
+# Cada job fica em JOBS_DIR/<id>: job.json (estado), files/ (PDFs enviados) e um checkpoint por arquivo e etapa
+JOBS_DIR = CACHE_DIR / "ingestao"
+ETAPAS = ("extrair", "ocr", "fragmentar", "deduplicar", "embeddings", "indexar")
+
+_executor = ThreadPoolExecutor(max_workers=INGESTAO_MAX_JOBS, thread_name_prefix="ingestao")
+_lock = threading.Lock()
+_em_execucao: Dict[str, Future] = {}
+
+
+def _dir_job(job_id: str) -> Path:
+    return JOBS_DIR / job_id
+
+def _chave(nome_arquivo: str, hash_arquivo: str) -> str:
+    # Checkpoints por arquivo: o nome entra nos metadados dos fragmentos, então faz parte da chave
+    return hashlib.sha256(f"{nome_arquivo}\0{hash_arquivo}".encode("utf-8")).hexdigest()[:24]
+
+def _ler_job(job_id: str) -> Optional[dict]:
+    try:
+        return json.loads((_dir_job(job_id) / "job.json").read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _gravar_json(caminho: Path, dados) -> None:
+    # Grava num temporário e renomeia: uma queda no meio não deixa um checkpoint pela metade
+    temporario = caminho.with_suffix(caminho.suffix + ".tmp")
+    temporario.write_text(json.dumps(dados, ensure_ascii=False), encoding="utf-8")
+    os.replace(temporario, caminho)
+
+def _trava_job(job_id: str):
+    # Vários processos podem mexer no mesmo job (retomada pelo sinal de vida): toda alteração do
+    # job.json é ler-alterar-gravar sob esta trava de arquivo
+    return trava_de_arquivo(_dir_job(job_id) / "job.lock")
+
+def _atualizar_job(job_id: str, arquivo: Optional[str] = None, **campos) -> dict:
+    """Altera campos do job (ou de um arquivo do job) e renova o sinal de vida."""
+    with _trava_job(job_id):
+        job = _ler_job(job_id)
+        if arquivo is not None:
+            job["arquivos"][arquivo].update(campos)
+        else:
+            job.update(campos)
+        job["atualizado"] = time.time()
+        _gravar_json(_dir_job(job_id) / "job.json", job)
+        return job
+
+def limpar_jobs_antigos(horas: float = INGESTAO_RETENCAO_HORAS) -> None:
+    """Remove jobs (e seus checkpoints) sem atualização há mais de `horas`."""
+    if not JOBS_DIR.exists():
+        return
+    limite = time.time() - horas * 3600
+    for diretorio in JOBS_DIR.iterdir():
+        if diretorio.name in _em_execucao:
+            continue
+        job = _ler_job(diretorio.name)
+        if job is None or job.get("atualizado", 0) < limite:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+def _reabrir_job(job_id: str) -> Optional[dict]:
+    """
+    Limpa o erro do job e dos seus arquivos para que sejam tentados de novo, a partir do último
+    checkpoint de cada um. Como a deduplicação é feita entre todos os arquivos, quem já passou
+    dela volta à fragmentação (os embeddings já calculados vêm do cache). Jobs em execução não mudam.
+    """
+    if not (_dir_job(job_id) / "job.json").exists():
+        return None
+    with _trava_job(job_id):
+        job = _ler_job(job_id)
+        if job is None or job["estado"] == "executando":
+            return job
+        com_erro = [nome for nome, info in job["arquivos"].items() if info["erro"]]
+        if job["estado"] != "erro" and not com_erro:
+            return job
+        for info in job["arquivos"].values():
+            info["erro"] = None
+            if com_erro and info["etapa"] and ETAPAS.index(info["etapa"]) > ETAPAS.index("fragmentar"):
+                info["etapa"] = "fragmentar"
+        job.update(estado="pendente", etapa=ETAPAS[0], erro=None, atualizado=time.time())
+        _gravar_json(_dir_job(job_id) / "job.json", job)
+        return job
+
+def criar_job(arquivos: List[Tuple[str, bytes]]) -> str:
+    """
+    Registra um job de ingestão para os arquivos (nome, bytes do PDF) e retorna seu id.
+    O id depende apenas dos nomes e do conteúdo: reenviar os mesmos arquivos retoma o job existente,
+    e os arquivos que tinham falhado são tentados de novo.
+    """
+    hashes = {nome: hash_conteudo(conteudo) for nome, conteudo in arquivos}
+    job_id = hashlib.sha256(
+        "|".join(sorted(f"{nome}:{h}" for nome, h in hashes.items())).encode("utf-8")
+    ).hexdigest()[:16]
+    limpar_jobs_antigos()
+    if _reabrir_job(job_id) is not None:
+        return job_id
+
+    diretorio = _dir_job(job_id)
+    for subdir in ("files", "paginas", "fragmentos", "unicos", "vetores"):
+        (diretorio / subdir).mkdir(parents=True, exist_ok=True)
+    for nome, conteudo in arquivos:
+        caminho = diretorio / "files" / f"{hashes[nome]}.pdf"
+        if not caminho.exists():
+            caminho.write_bytes(conteudo)
+    _gravar_json(diretorio / "job.json", {
+        "id": job_id,
+        "estado": "pendente",
+        "etapa": ETAPAS[0],
+        "arquivos": {nome: {"hash": h, "etapa": None, "erro": None} for nome, h in hashes.items()},
+        "erro": None,
+        "criado": time.time(),
+        "atualizado": time.time(),
+    })
+    return job_id
+
+def submeter_job(job_id: str, embeddings, google_api_key: Optional[str] = None) -> bool:
+    """
+    Coloca o job na fila de execução do processo. Jobs concluídos, já em execução aqui ou com
+    sinal de vida recente de outro processo não são submetidos de novo; um job "executando" sem
+    sinal de vida há INGESTAO_HEARTBEAT_EXPIRA segundos foi interrompido e é retomado dos checkpoints.
+    Um job que terminou em erro é reaberto e tentado de novo.
+    """
+    job = _ler_job(job_id)
+    if job is None:
+        return False
+    if job["estado"] == "erro":
+        _reabrir_job(job_id)
+    with _lock:
+        futuro = _em_execucao.get(job_id)
+        if futuro is not None and not futuro.done():
+            return False
+        # Verificação e reserva sob a trava de arquivo: dois processos nunca retomam o mesmo job
+        with _trava_job(job_id):
+            job = _ler_job(job_id)
+            if job is None or job["estado"] == "concluido":
+                return False
+            if job["estado"] == "executando" and time.time() - job["atualizado"] < INGESTAO_HEARTBEAT_EXPIRA:
+                return False
+            job.update(estado="executando", atualizado=time.time())
+            _gravar_json(_dir_job(job_id) / "job.json", job)
+        # O sinal de vida começa já na reserva, para o job não parecer abandonado enquanto espera na fila
+        parar = threading.Event()
+        threading.Thread(target=_manter_sinal_de_vida, args=(job_id, parar), daemon=True).start()
+        _em_execucao[job_id] = _executor.submit(_executar_job, job_id, embeddings, google_api_key, parar)
+        return True
+
+def _manter_sinal_de_vida(job_id: str, parar: threading.Event) -> None:
+    while not parar.wait(INGESTAO_HEARTBEAT_EXPIRA / 3):
+        _atualizar_job(job_id)
+
+def estado_job(job_id: str) -> Optional[dict]:
+    """Estado do job com o progresso: etapas concluídas e total (arquivos × etapas)."""
+    job = _ler_job(job_id)
+    if job is None:
+        return None
+    total = len(job["arquivos"]) * len(ETAPAS)
+    # Arquivos com erro não avançam mais; contam como concluídos para a barra de progresso
+    concluidas = sum(
+        len(ETAPAS) if info["erro"] else (ETAPAS.index(info["etapa"]) + 1 if info["etapa"] else 0)
+        for info in job["arquivos"].values()
+    )
+    job["concluidas"], job["total"] = concluidas, total
+    job["progresso"] = concluidas / total if total else 1.0
+    return job
+
+def _executar_etapa(job_id: str, etapa: str, nome: str, info: dict, embeddings, obter_llm_visao) -> Optional[str]:
+    """Executa uma etapa (exceto extração, deduplicação e embeddings, feitas em lote) de um arquivo e grava o checkpoint. Retorna a mensagem de erro, se houver."""
+    diretorio = _dir_job(job_id)
+    chave = _chave(nome, info["hash"])
+    arquivo_paginas = diretorio / "paginas" / f"{chave}.json"
+
+    if etapa == "ocr":
+        # Só PDFs sem camada de texto (ex: digitalizados) passam pelo OCR
+        if json.loads(arquivo_paginas.read_text(encoding="utf-8")):
+            return None
+        llm_vision = obter_llm_visao()
+        if llm_vision is None:
+            return "modelo de visão indisponível para OCR"
+        pdf_bytes = (diretorio / "files" / f"{info['hash']}.pdf").read_bytes()
+        documentos = extrair_com_ocr(nome, pdf_bytes, llm_vision)
+        if not documentos:
+            return "nenhum texto extraído"
+        _gravar_json(arquivo_paginas, [{"texto": d.page_content, "metadata": d.metadata} for d in documentos])
+
+    elif etapa == "fragmentar":
+        paginas = json.loads(arquivo_paginas.read_text(encoding="utf-8"))
+        fragmentos = fragmentar_documentos([Document(page_content=p["texto"], metadata=p["metadata"]) for p in paginas])
+        _gravar_json(
+            diretorio / "fragmentos" / f"{chave}.json",
+            [{"texto": f.page_content, "metadata": f.metadata} for f in fragmentos]
+        )
+    return None
+
+def _extrair_em_lote(job_id: str, pendentes: List[Tuple[str, dict]]) -> None:
+    """Etapa de extração: a camada de texto dos arquivos pendentes é lida em processos paralelos."""
+    diretorio = _dir_job(job_id)
+    arquivos = [(nome, (diretorio / "files" / f"{info['hash']}.pdf").read_bytes()) for nome, info in pendentes]
+    for indice, documentos in iterar_camadas_de_texto(arquivos):
+        nome, info = pendentes[indice]
+        _gravar_json(
+            diretorio / "paginas" / f"{_chave(nome, info['hash'])}.json",
+            [{"texto": d.page_content, "metadata": d.metadata} for d in documentos]
+        )
+        _atualizar_job(job_id, arquivo=nome, etapa="extrair")
+
+def _deduplicar_em_lote(job_id: str, job: dict) -> None:
+    """
+    Etapa de deduplicação: os fragmentos de todos os arquivos do job são comparados, na ordem de
+    envio, e cada texto repetido fica só no primeiro arquivo em que aparece, com as referências
+    aos demais. Refeita por inteiro numa retomada, com o mesmo resultado.
+    """
+    diretorio = _dir_job(job_id)
+    ativos = [(nome, info) for nome, info in job["arquivos"].items() if not info["erro"]]
+    documentos = []
+    for nome, info in ativos:
+        fragmentos = json.loads((diretorio / "fragmentos" / f"{_chave(nome, info['hash'])}.json").read_text(encoding="utf-8"))
+        documentos.extend(Document(page_content=f["texto"], metadata=f["metadata"]) for f in fragmentos)
+    unicos = {nome: [] for nome, _ in ativos}
+    for doc in deduplicar_documentos(documentos):
+        unicos[doc.metadata["source"]].append({"texto": doc.page_content, "metadata": doc.metadata})
+    for nome, info in ativos:
+        _gravar_json(diretorio / "unicos" / f"{_chave(nome, info['hash'])}.json", unicos[nome])
+        if ETAPAS.index(info["etapa"]) < ETAPAS.index("deduplicar"):
+            _atualizar_job(job_id, arquivo=nome, etapa="deduplicar")
+
+def _ler_unicos(diretorio: Path, chave: str) -> List[dict]:
+    caminho = diretorio / "unicos" / f"{chave}.json"
+    if not caminho.exists():
+        # Job criado antes da etapa de deduplicação
+        caminho = diretorio / "fragmentos" / f"{chave}.json"
+    return json.loads(caminho.read_text(encoding="utf-8"))
+
+def _embeddings_em_lote(job_id: str, pendentes: List[Tuple[str, dict]], embeddings) -> None:
+    """
+    Etapa de embeddings: os fragmentos únicos de todos os arquivos pendentes vão em lotes simultâneos
+    (sem misturar arquivos num lote). Os vetores de um arquivo são gravados quando seu último
+    lote termina; um lote que falha em todas as tentativas marca só o seu arquivo com erro.
+    """
+    diretorio = _dir_job(job_id)
+    lotes, donos = [], []
+    faltando, matrizes, erros = {}, {}, {}
+    for nome, info in pendentes:
+        textos = [f["texto"] for f in _ler_unicos(diretorio, _chave(nome, info["hash"]))]
+        intervalos = dividir_em_lotes(len(textos))
+        faltando[nome] = len(intervalos)
+        if not intervalos:
+            # Todos os fragmentos já estão em arquivos anteriores do job
+            np.save(diretorio / "vetores" / f"{_chave(nome, info['hash'])}.npy", np.zeros((0, 0), dtype=np.float32))
+            _atualizar_job(job_id, arquivo=nome, etapa="embeddings")
+        for inicio, fim in intervalos:
+            lotes.append(textos[inicio:fim])
+            donos.append((nome, info, inicio, len(textos)))
+
+    for indice, vetores in iterar_lotes_de_embeddings(embeddings, lotes):
+        nome, info, inicio, total = donos[indice]
+        if nome in erros:
+            continue
+        if isinstance(vetores, Exception):
+            erros[nome] = str(vetores) or type(vetores).__name__
+            matrizes.pop(nome, None)
+            _atualizar_job(job_id, arquivo=nome, erro=erros[nome])
+            continue
+        if nome not in matrizes:
+            matrizes[nome] = np.empty((total, vetores.shape[1]), dtype=np.float32)
+        matrizes[nome][inicio:inicio + len(vetores)] = vetores
+        faltando[nome] -= 1
+        if faltando[nome] == 0:
+            chave = _chave(nome, info["hash"])
+            temporario = diretorio / "vetores" / f"{chave}.tmp.npy"
+            np.save(temporario, matrizes.pop(nome))
+            os.replace(temporario, diretorio / "vetores" / f"{chave}.npy")
+            _atualizar_job(job_id, arquivo=nome, etapa="embeddings")
+
+def _compartilhados_perdidos(job_id: str, job: dict) -> List[str]:
+    """
+    Arquivos que falharam depois da deduplicação guardando fragmentos que também aparecem em
+    arquivos restantes: sem eles, esses fragmentos sumiriam do índice dos demais.
+    """
+    diretorio = _dir_job(job_id)
+    restantes = {nome for nome, info in job["arquivos"].items() if not info["erro"]}
+    perdidos = []
+    for nome, info in job["arquivos"].items():
+        caminho = diretorio / "unicos" / f"{_chave(nome, info['hash'])}.json"
+        if not info["erro"] or not caminho.exists():
+            continue
+        for fragmento in json.loads(caminho.read_text(encoding="utf-8")):
+            fontes = fontes_do_fragmento(fragmento["metadata"])
+            if len(fontes) > 1 and restantes.intersection(fontes):
+                perdidos.append(nome)
+                break
+    return perdidos
+
+def _refazer_sem_perdidos(job_id: str, perdidos: List[str], embeddings) -> None:
+    """
+    Refaz a deduplicação só com os arquivos restantes, para que os fragmentos compartilhados
+    com os arquivos que falharam passem a um deles, e calcula os embeddings de novo (os textos
+    já vistos vêm do cache de embeddings).
+    """
+    diretorio = _dir_job(job_id)
+    job = _ler_job(job_id)
+    for nome in perdidos:
+        info = job["arquivos"][nome]
+        (diretorio / "unicos" / f"{_chave(nome, info['hash'])}.json").unlink(missing_ok=True)
+    for nome, info in job["arquivos"].items():
+        if not info["erro"]:
+            job = _atualizar_job(job_id, arquivo=nome, etapa="fragmentar")
+    _deduplicar_em_lote(job_id, job)
+    job = _ler_job(job_id)
+    _embeddings_em_lote(job_id, [(nome, info) for nome, info in job["arquivos"].items() if not info["erro"]], embeddings)
+
+def _montar_resultado(job_id: str, embeddings):
+    """Vector store, nomes processados e texto por página, montados a partir dos checkpoints (sem chamar a API)."""
+    job = _ler_job(job_id)
+    diretorio = _dir_job(job_id)
+    vector_store = None
+    nomes, textos_por_arquivo = [], {}
+    for nome, info in job["arquivos"].items():
+        if info["erro"]:
+            continue
+        chave = _chave(nome, info["hash"])
+        fragmentos = _ler_unicos(diretorio, chave)
+        vetores = np.load(diretorio / "vetores" / f"{chave}.npy")
+        # Um arquivo por vez entra no índice, sem juntar os vetores de todos antes
+        if fragmentos:
+            pares = zip([f["texto"] for f in fragmentos], vetores)
+            metadados = [f["metadata"] for f in fragmentos]
+            if vector_store is None:
+                vector_store = FAISS.from_embeddings(pares, embeddings, metadatas=metadados)
+            else:
+                vector_store.add_embeddings(pares, metadatas=metadados)
+        paginas = json.loads((diretorio / "paginas" / f"{chave}.json").read_text(encoding="utf-8"))
+        nomes.append(nome)
+        textos_por_arquivo[nome] = {"hash": info["hash"], "paginas": [p["texto"] for p in paginas]}
+    if vector_store is None:
+        return None, [], {}
+    # O índice lexical é montado junto com o vetorial, para a busca híbrida
+    registrar_indice_bm25(vector_store, IndiceBM25.do_vector_store(vector_store))
+    return vector_store, nomes, textos_por_arquivo
+
+def _tem_fragmentos(job_id: str, job: dict) -> bool:
+    """Se algum arquivo sem erro chegou ao fim com fragmentos para indexar."""
+    return any(
+        _ler_unicos(_dir_job(job_id), _chave(nome, info["hash"]))
+        for nome, info in job["arquivos"].items() if not info["erro"]
+    )
+
+def _executar_job(job_id: str, embeddings, google_api_key: Optional[str], parar: threading.Event) -> None:
+    """
+    Executa as etapas pendentes do job, uma etapa de cada vez para todos os arquivos
+    (todo o texto é extraído antes do OCR, que é lento e limitado por taxa).
+    Roda fora da thread do Streamlit: erros ficam no job.json, sem chamadas a `st`.
+    `parar` encerra o sinal de vida iniciado em `submeter_job`.
+    """
+    llm_vision = []
+
+    def obter_llm_visao():
+        if not llm_vision:
+            try:
+                fabrica = fabrica_de_llm(0.1, google_api_key, request_timeout=300)
+                fabrica(modelo_da_tarefa("ocr"))
+                llm_vision.append(fabrica)
+            except Exception:
+                llm_vision.append(None)
+        return llm_vision[0]
+
+    try:
+        job = _atualizar_job(job_id, estado="executando", erro=None)
+        for etapa in ETAPAS[:-1]:
+            job = _atualizar_job(job_id, etapa=etapa)
+            # Etapas já registradas no job.json têm checkpoint gravado e não são refeitas
+            pendentes = [
+                (nome, info) for nome, info in job["arquivos"].items()
+                if not info["erro"] and not (info["etapa"] and ETAPAS.index(info["etapa"]) >= ETAPAS.index(etapa))
+            ]
+            if etapa in ("extrair", "deduplicar", "embeddings"):
+                if pendentes:
+                    if etapa == "extrair":
+                        _extrair_em_lote(job_id, pendentes)
+                    elif etapa == "deduplicar":
+                        _deduplicar_em_lote(job_id, job)
+                    else:
+                        _embeddings_em_lote(job_id, pendentes, embeddings)
+                continue
+            for nome, info in pendentes:
+                try:
+                    erro = _executar_etapa(job_id, etapa, nome, info, embeddings, obter_llm_visao)
+                except Exception as e:
+                    erro = str(e) or type(e).__name__
+                if erro:
+                    _atualizar_job(job_id, arquivo=nome, erro=erro)
+                else:
+                    _atualizar_job(job_id, arquivo=nome, etapa=etapa)
+
+        # Cada fragmento repetido fica só no primeiro arquivo que o contém; se esse arquivo falhou
+        # nos embeddings, os demais são deduplicados de novo entre si (até não sobrar perda)
+        perdidos = _compartilhados_perdidos(job_id, _ler_job(job_id))
+        while perdidos:
+            _atualizar_job(job_id, etapa="deduplicar")
+            _refazer_sem_perdidos(job_id, perdidos, embeddings)
+            perdidos = _compartilhados_perdidos(job_id, _ler_job(job_id))
+
+        # O índice é montado dos checkpoints por quem buscar o resultado (`obter_resultado_job`),
+        # sem ficar guardado na memória do processo até alguém pedir
+        _atualizar_job(job_id, etapa="indexar")
+        job = _ler_job(job_id)
+        for nome, info in job["arquivos"].items():
+            if not info["erro"]:
+                _atualizar_job(job_id, arquivo=nome, etapa="indexar")
+        _atualizar_job(job_id, estado="concluido" if _tem_fragmentos(job_id, job) else "erro")
+    except Exception as e:
+        _atualizar_job(job_id, estado="erro", erro=str(e) or type(e).__name__)
+    finally:
+        parar.set()
+        with _lock:
+            _em_execucao.pop(job_id, None)
+
+def obter_resultado_job(job_id: str, embeddings):
+    """(vector store, nomes processados, texto por página) de um job concluído, montados dos checkpoints (sem chamar a API)."""
+    return _montar_resultado(job_id, embeddings)
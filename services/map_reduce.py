@@ -0,0 +1,90 @@
+from typing import Iterator, List, Optional, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from core.config import MAP_REDUCE_JANELA_CHARS, MAP_REDUCE_FATOR_REDUCAO
+from core.llm_engine import PRIORIDADE_NORMAL
+from core.model_router import ObterRunnable, invocar_roteado, iterar_roteado
+from core.locale import TRANSLATIONS
+
+def dividir_em_trechos(texto: str, janela: Optional[int] = None) -> List[str]:
+    """
+    Divide o contrato em trechos do tamanho da janela de map, com os mesmos
+    separadores e sobreposição usados na ingestão.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=janela or MAP_REDUCE_JANELA_CHARS, chunk_overlap=200)
+    return splitter.split_text(texto)
+
+def map_reduce_em_etapas(
+    texto: str,
+    tarefa: str,
+    obter_llm_tarefa: ObterRunnable,
+    objetivo: str,
+    prompt_final: str,
+    lang_code: str,
+    prioridade: int = PRIORIDADE_NORMAL,
+) -> Iterator[dict]:
+    """
+    Aplica `objetivo` ao contrato inteiro, sem truncar o texto.
+
+    Contratos que cabem numa janela vão direto para `prompt_final`, no lugar do marcador {texto}.
+    A substituição é literal, sem `str.format`: o prompt já vem formatado e pode conter chaves
+    (ex: no nome do arquivo ou na tradução).
+    Os demais são divididos em trechos analisados em paralelo (map), cujas notas são
+    combinadas em níveis de `MAP_REDUCE_FATOR_REDUCAO` (reduce) antes do prompt final.
+    Todas as chamadas passam pelo motor do LLM com a `prioridade` indicada, no modelo da `tarefa`.
+
+    Gera eventos {"tipo": "parcial", "parte", "total", "texto"} à medida que os trechos
+    terminam e, por fim, {"tipo": "final", "texto"}.
+    """
+    textos_idioma = TRANSLATIONS[lang_code]
+    language_name = textos_idioma["lang_selector_label"]
+
+    def _final(conteudo: str) -> str:
+        return prompt_final.replace("{texto}", conteudo)
+
+    def _invocar(prompt: str) -> str:
+        return invocar_roteado(tarefa, obter_llm_tarefa, prompt, prioridade).content
+
+    def _invocar_todos(prompts: List[str]) -> Iterator[Tuple[int, str]]:
+        for indice, resposta in iterar_roteado(tarefa, obter_llm_tarefa, prompts, prioridade):
+            if isinstance(resposta, Exception):
+                raise resposta
+            yield indice, resposta.content
+
+    trechos = dividir_em_trechos(texto)
+    if len(trechos) <= 1:
+        yield {"tipo": "final", "texto": _invocar(_final(texto))}
+        return
+
+    # Map: uma nota por trecho, entregue assim que fica pronta
+    total = len(trechos)
+    notas: List[Optional[str]] = [None] * total
+
+    prompts = [
+        textos_idioma["map_reduce_map_prompt"].format(
+            parte=parte + 1, total=total, objetivo=objetivo, language=language_name, texto=trecho
+        )
+        for parte, trecho in enumerate(trechos)
+    ]
+    for indice, nota in _invocar_todos(prompts):
+        notas[indice] = nota
+        yield {"tipo": "parcial", "parte": indice + 1, "total": total, "texto": nota}
+
+    # Reduce hierárquico: combina grupos de notas até caberem numa única janela
+    notas = [n for n in notas if n and n.strip() != "-"]
+    while len(notas) > MAP_REDUCE_FATOR_REDUCAO or sum(len(n) for n in notas) > MAP_REDUCE_JANELA_CHARS:
+        grupos = [notas[i:i + MAP_REDUCE_FATOR_REDUCAO] for i in range(0, len(notas), MAP_REDUCE_FATOR_REDUCAO)]
+        if len(grupos) == 1 and len(grupos[0]) == 1:
+            break
+
+        prompts = [
+            textos_idioma["map_reduce_combine_prompt"].format(
+                objetivo=objetivo, language=language_name, texto="\n\n---\n\n".join(grupo)
+            )
+            for grupo in grupos
+        ]
+        combinadas: List[Optional[str]] = [None] * len(grupos)
+        for indice, nota in _invocar_todos(prompts):
+            combinadas[indice] = nota
+        notas = combinadas
+
+    yield {"tipo": "final", "texto": _invocar(_final("\n\n---\n\n".join(notas)))}
@@ -0,0 +1,60 @@
+import base64
+import threading
+from typing import List, Optional
+import fitz
+from langchain_core.messages import AIMessage, HumanMessage
+from core.config import OCR_MAX_CONCORRENCIA, OCR_REQUISICOES_POR_MINUTO
+from core.concurrency import LimitadorTaxa, mapear_em_paralelo
+from core.llm_engine import PRIORIDADE_LOTE
+from core.model_router import ObterRunnable, invocar_roteado
+
+PROMPT_OCR = "Você é um especialista em OCR. Extraia todo o texto desta página."
+
+def _tem_texto(ai_msg) -> bool:
+    return isinstance(ai_msg, AIMessage) and isinstance(ai_msg.content, str) and bool(ai_msg.content.strip())
+
+def ocr_pdf_com_gemini(
+    pdf_bytes: bytes,
+    obter_llm_visao: ObterRunnable,
+    max_em_voo: Optional[int] = None,
+    limitador: Optional[LimitadorTaxa] = None,
+    dpi: int = 300,
+) -> List[Optional[str]]:
+    """
+    Executa OCR página a página com o modelo de visão, com concorrência limitada. As chamadas
+    passam pelo motor do LLM em prioridade de lote; `max_em_voo` limita também as imagens em memória.
+    `obter_llm_visao` recebe o nome do modelo: a tarefa "ocr" usa o modelo rápido, e páginas
+    que voltam sem texto são refeitas no modelo avançado.
+    Retorna o texto de cada página na ordem original (None para páginas que falharam).
+    """
+    max_em_voo = max_em_voo or OCR_MAX_CONCORRENCIA
+    limitador = limitador or LimitadorTaxa.por_minuto(OCR_REQUISICOES_POR_MINUTO, capacidade=max_em_voo)
+
+    doc_fitz = fitz.open(stream=pdf_bytes, filetype="pdf")
+    # O PyMuPDF não é seguro para renderização simultânea do mesmo documento
+    lock_render = threading.Lock()
+
+    def _ocr_pagina(page_num: int) -> Optional[str]:
+        try:
+            with lock_render:
+                pix = doc_fitz.load_page(page_num).get_pixmap(dpi=dpi)
+                img_bytes = pix.tobytes("png")
+            base64_image = base64.b64encode(img_bytes).decode("utf-8")
+
+            human_message = HumanMessage(content=[
+                {"type": "text", "text": PROMPT_OCR},
+                {"type": "image_url", "image_url": f"data:image/png;base64,{base64_image}"}
+            ])
+
+            limitador.adquirir()
+            ai_msg = invocar_roteado("ocr", obter_llm_visao, [human_message], PRIORIDADE_LOTE, validar=_tem_texto)
+            if isinstance(ai_msg, AIMessage) and isinstance(ai_msg.content, str):
+                return ai_msg.content
+        except Exception:
+            pass # Falha de uma página não impede as demais
+        return None
+
+    try:
+        return mapear_em_paralelo(_ocr_pagina, range(len(doc_fitz)), max_workers=max_em_voo)
+    finally:
+        doc_fitz.close()
@@ -0,0 +1,85 @@
+import io
+import multiprocessing
+import sys
+import threading
+import types
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import fitz
+
+# Leitura da camada de texto dos PDFs direto dos bytes. O parsing é limitado pela CPU (e pelo GIL),
+# então vários PDFs são lidos em paralelo num pool de processos; este módulo importa só o PyMuPDF,
+# para que cada processo filho suba rápido.
+
+# (número da página, texto, método de extração)
+Pagina = Tuple[int, str, str]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_tamanho = 0
+_lock_pool = threading.Lock()
+
+
+def extrair_paginas_pdf(pdf_bytes: bytes) -> List[Pagina]:
+    """Páginas com texto de um PDF em memória: PyMuPDF primeiro (bem mais rápido) e pypdf, se instalado, como alternativa."""
+    try:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            paginas = [(num, pagina.get_text("text"), "pymupdf") for num, pagina in enumerate(doc)]
+        paginas = [p for p in paginas if p[1].strip()]
+        if paginas:
+            return paginas
+    except Exception:
+        pass # Tenta o próximo método
+
+    try:
+        from pypdf import PdfReader
+        leitor = PdfReader(io.BytesIO(pdf_bytes))
+        paginas = [(num, pagina.extract_text() or "", "pypdf") for num, pagina in enumerate(leitor.pages)]
+        return [p for p in paginas if p[1].strip()]
+    except Exception:
+        return []
+
+@contextmanager
+def _main_sem_script():
+    """
+    O "spawn" executa de novo, em cada processo filho, o arquivo de `__main__` quando ele não tem
+    `__spec__`. Sob o `streamlit run` esse arquivo é o app.py, que recarregaria a aplicação inteira
+    em cada filho; enquanto os processos sobem, `__main__` é trocado por um módulo vazio.
+    """
+    original = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = original
+
+def _submeter(lista_pdf_bytes: Sequence[bytes], max_processos: int) -> Dict[Future, int]:
+    # Um pool por processo, reaproveitado entre chamadas: subir os processos filhos custa mais que ler um PDF.
+    # Com "spawn" os filhos sobem dentro do `submit`, então o envio também fica sob `_main_sem_script`.
+    global _pool, _pool_tamanho
+    with _lock_pool, _main_sem_script():
+        if _pool is None or _pool_tamanho != max_processos or getattr(_pool, "_broken", False):
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # "spawn" também no Linux: um fork a partir das threads do Streamlit pode herdar locks travados
+            _pool = ProcessPoolExecutor(max_workers=max_processos, mp_context=multiprocessing.get_context("spawn"))
+            _pool_tamanho = max_processos
+        return {_pool.submit(extrair_paginas_pdf, pdf_bytes): indice for indice, pdf_bytes in enumerate(lista_pdf_bytes)}
+
+def iterar_paginas_em_paralelo(lista_pdf_bytes: Sequence[bytes], max_processos: int) -> Iterator[Tuple[int, List[Pagina]]]:
+    """
+    Entrega (índice, páginas) de cada PDF à medida que termina. Com um único PDF ou um único
+    processo, a leitura é feita aqui mesmo. PDFs que derrubam o processo filho voltam sem páginas.
+    """
+    if max_processos <= 1 or len(lista_pdf_bytes) <= 1:
+        for indice, pdf_bytes in enumerate(lista_pdf_bytes):
+            yield indice, extrair_paginas_pdf(pdf_bytes)
+        return
+
+    futuros = _submeter(lista_pdf_bytes, max_processos)
+    for futuro in as_completed(futuros):
+        try:
+            paginas = futuro.result()
+        except Exception:
+            paginas = []
+        yield futuros[futuro], paginas
@@ -1,10 +1,16 @@
-import streamlit as st
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from core.model_router import fabrica_de_llm
 from core.locale import TRANSLATIONS
+from services.map_reduce import map_reduce_em_etapas
+
+def analisar_riscos_em_etapas(texto, nome_arquivo, google_api_key, lang_code):
+    """
+    Analisa os riscos do contrato inteiro em map-reduce, gerando as notas parciais à medida que ficam prontas.
+    """
+    prompt_text = TRANSLATIONS[lang_code]["risks_prompt"].format(nome=nome_arquivo, language=TRANSLATIONS[lang_code]["lang_selector_label"])
+    prompt_final = prompt_text + "\n\nTEXTO DO CONTRATO:\n{texto}\n\nANÁLISE DE RISCOS:"
+
+    yield from map_reduce_em_etapas(texto, "riscos", fabrica_de_llm(0.2, google_api_key), prompt_text, prompt_final, lang_code)
 
-@st.cache_data # Removido show_spinner
 def analisar_documento_para_riscos(texto, nome_arquivo, google_api_key, lang_code):
     """
     Analisa um documento para riscos, agora com prompt sensível ao idioma.
@@ -12,19 +18,9 @@ def analisar_documento_para_riscos(texto, nome_arquivo, google_api_key, lang_cod
     if not texto or not google_api_key:
         return "Erro: sem texto ou API."
 
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.2)
-    
-    prompt_text = TRANSLATIONS[lang_code]["risks_prompt"].format(nome=nome_arquivo, language=TRANSLATIONS[lang_code]["lang_selector_label"])
-    
-    prompt = PromptTemplate.from_template(
-        prompt_text + "\n\nTEXTO DO CONTRATO:\n{texto}\n\nANÁLISE DE RISCOS:"
-    )
-    
-    chain = LLMChain(llm=llm, prompt=prompt)
     try:
-        res = chain.invoke({"texto": texto[:30000]})
-        return res['text']
+        for evento in analisar_riscos_em_etapas(texto, nome_arquivo, google_api_key, lang_code):
+            if evento["tipo"] == "final":
+                return evento["texto"]
     except Exception as e:
         return f"Erro na análise de riscos: {e}"
-
-
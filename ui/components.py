@@ -0,0 +1,21 @@
+import streamlit as st
+
+def exibir_map_reduce_progressivo(eventos, texts):
+    """
+    Consome os eventos de `map_reduce_em_etapas`, mostrando cada nota parcial assim que chega.
+    Retorna o texto final.
+    """
+    barra = st.empty()
+    parciais = st.container()
+    concluidos = 0
+    for evento in eventos:
+        if evento["tipo"] == "parcial":
+            concluidos += 1
+            barra.progress(concluidos / evento["total"])
+            with parciais.expander(texts["map_reduce_partial_label"].format(parte=evento["parte"], total=evento["total"])):
+                st.markdown(evento["texto"])
+        elif evento["tipo"] == "final":
+            barra.empty()
+            return evento["texto"]
+    barra.empty()
+    return ""
@@ -1,8 +1,16 @@
 import streamlit as st
+from core.llm_registry import invalidar_vector_store
+from core.model_router import metricas_por_tarefa
+from core.semantic_cache import invalidar_cache_semantico
 from services.collections import (
-    listar_colecoes_salvas, salvar_colecao_atual, carregar_colecao
+    listar_colecoes_salvas, salvar_colecao_atual, carregar_colecao, precisa_migrar,
+    adicionar_documentos_a_colecao, remover_documento_da_colecao
+)
+from services.document_loader import extrair_documentos_de_uploads, fragmentar_documentos
+from services.ingestion import criar_job, submeter_job, estado_job, obter_resultado_job
+from services.document_texts import (
+    registrar_textos_documentos, limpar_textos_documentos, remover_texto_documento
 )
-from services.document_loader import obter_vector_store_de_uploads
 
 def render_sidebar(embeddings_global, google_api_key, texts):
     """
@@ -19,19 +27,53 @@ def render_sidebar(embeddings_global, google_api_key, texts):
     if uploaded_files:
         if st.sidebar.button(texts["sidebar_process_button"], use_container_width=True):
             if google_api_key and embeddings_global:
-                with st.spinner(texts["sidebar_spinner_processing"]):
-                    vs, nomes = obter_vector_store_de_uploads(uploaded_files, embeddings_global, google_api_key)
-                if vs:
-                    st.session_state.vector_store_atual = vs
-                    st.session_state.nomes_arquivos_atuais = nomes
-                    st.session_state.arquivos_pdf_originais = uploaded_files
-                    st.session_state.messages = [] # Limpa o chat
-                    if "dados_extraidos" in st.session_state:
-                         del st.session_state.dados_extraidos # Limpa dados do dashboard
-                    st.rerun()
+                # O processamento roda em segundo plano; o id do job na URL sobrevive a um recarregamento da página
+                job_id = criar_job([(arquivo.name, arquivo.getvalue()) for arquivo in uploaded_files])
+                submeter_job(job_id, embeddings_global, google_api_key)
+                st.session_state.job_ingestao = job_id
+                st.session_state.erros_ingestao = []
+                st.query_params["job"] = job_id
             else:
                 st.sidebar.error(texts["error_api_key"])
 
+        # Com uma coleção aberta, os novos arquivos podem ser acrescentados sem reprocessar os demais
+        colecao_atual = st.session_state.get("colecao_atual")
+        if colecao_atual and st.session_state.get("vector_store_atual"):
+            if st.sidebar.button(texts["sidebar_add_to_collection_button"].format(colecao=colecao_atual), use_container_width=True):
+                if google_api_key and embeddings_global:
+                    with st.spinner(texts["sidebar_spinner_processing"]):
+                        documentos, nomes_novos, textos = extrair_documentos_de_uploads(uploaded_files, google_api_key)
+                        nomes = adicionar_documentos_a_colecao(
+                            colecao_atual,
+                            st.session_state.vector_store_atual,
+                            fragmentar_documentos(documentos) if documentos else [],
+                            nomes_novos,
+                            embeddings_global
+                        )
+                    if nomes is not None:
+                        st.session_state.nomes_arquivos_atuais = nomes
+                        registrar_textos_documentos(textos, substituir=False)
+                        invalidar_cache_semantico(st.session_state.get("id_colecao"))
+                        st.session_state.messages = []
+                        if "dados_extraidos" in st.session_state:
+                             del st.session_state.dados_extraidos
+                        st.sidebar.success(texts["sidebar_collection_updated"].format(colecao=colecao_atual))
+                else:
+                    st.sidebar.error(texts["error_api_key"])
+
+    # Job de ingestão em andamento (ou retomado pela URL depois de recarregar a página)
+    if "job_ingestao" not in st.session_state and st.query_params.get("job"):
+        st.session_state.job_ingestao = st.query_params["job"]
+        if google_api_key and embeddings_global:
+            submeter_job(st.session_state.job_ingestao, embeddings_global, google_api_key)
+    if st.session_state.get("job_ingestao"):
+        with st.sidebar:
+            _acompanhar_ingestao(st.session_state.job_ingestao, embeddings_global, texts)
+    for erro in st.session_state.get("erros_ingestao", []):
+        st.sidebar.warning(erro)
+
+    if st.session_state.get("estatisticas_cache_embeddings"):
+        st.sidebar.caption(texts["sidebar_embedding_cache_stats"].format(**st.session_state.estatisticas_cache_embeddings))
 
     st.sidebar.markdown("---")
     
@@ -40,14 +82,36 @@ def render_sidebar(embeddings_global, google_api_key, texts):
         colecao_salvar = st.sidebar.text_input(texts["sidebar_save_collection_label"])
         if st.sidebar.button(texts["sidebar_save_collection_button"], use_container_width=True):
             if "vector_store_atual" in st.session_state:
-                salvar_colecao_atual(
+                if salvar_colecao_atual(
                     colecao_salvar,
                     st.session_state.vector_store_atual,
                     st.session_state.nomes_arquivos_atuais
-                )
+                ):
+                    st.session_state.colecao_atual = colecao_salvar
+                    invalidar_cache_semantico(f"colecao:{colecao_salvar}")
+                    st.session_state.id_colecao = f"colecao:{colecao_salvar}"
     else:
         st.sidebar.info(texts["sidebar_save_collection_warning"])
 
+    # Remover documento da coleção aberta
+    colecao_atual = st.session_state.get("colecao_atual")
+    if colecao_atual and st.session_state.get("nomes_arquivos_atuais"):
+        arquivo_remover = st.sidebar.selectbox(
+            texts["sidebar_remove_document_label"],
+            options=st.session_state.nomes_arquivos_atuais,
+            key="arquivo_remover_select"
+        )
+        if st.sidebar.button(texts["sidebar_remove_document_button"], use_container_width=True):
+            nomes = remover_documento_da_colecao(colecao_atual, st.session_state.vector_store_atual, arquivo_remover)
+            if nomes is not None:
+                st.session_state.nomes_arquivos_atuais = nomes
+                remover_texto_documento(arquivo_remover)
+                invalidar_cache_semantico(st.session_state.get("id_colecao"))
+                st.session_state.messages = []
+                if "dados_extraidos" in st.session_state:
+                     del st.session_state.dados_extraidos
+                st.rerun()
+
 
     # Carregar Coleção
     colecoes_existentes = listar_colecoes_salvas()
@@ -59,15 +123,78 @@ def render_sidebar(embeddings_global, google_api_key, texts):
         )
         if st.sidebar.button(texts["sidebar_load_collection_button"], use_container_width=True):
             if colecao_selecionada and google_api_key and embeddings_global:
-                vs, nomes = carregar_colecao(colecao_selecionada, embeddings_global)
-                if vs:
-                    st.session_state.vector_store_atual = vs
-                    st.session_state.nomes_arquivos_atuais = nomes
-                    st.session_state.arquivos_pdf_originais = None
-                    st.session_state.messages = []
-                    if "dados_extraidos" in st.session_state:
-                         del st.session_state.dados_extraidos
-                    st.rerun()
+                # Coleções no formato antigo só abrem depois da migração explícita (sem pickle ao carregar)
+                if _colecao_no_formato_antigo(colecao_selecionada):
+                    st.sidebar.error(texts["sidebar_load_collection_legacy"].format(colecao=colecao_selecionada))
+                else:
+                    vs, nomes = carregar_colecao(colecao_selecionada, embeddings_global)
+                    if vs:
+                        invalidar_vector_store(st.session_state.get("vector_store_atual"))
+                        st.session_state.vector_store_atual = vs
+                        st.session_state.nomes_arquivos_atuais = nomes
+                        st.session_state.arquivos_pdf_originais = None
+                        st.session_state.colecao_atual = colecao_selecionada
+                        st.session_state.id_colecao = f"colecao:{colecao_selecionada}"
+                        limpar_textos_documentos()
+                        st.session_state.messages = []
+                        if "dados_extraidos" in st.session_state:
+                             del st.session_state.dados_extraidos
+                        st.rerun()
             else:
                 st.sidebar.error(texts["sidebar_load_collection_error"])
 
+    # Latência e custo das chamadas ao LLM por tarefa e modelo, para ajustar o roteamento
+    metricas = metricas_por_tarefa()
+    if metricas:
+        with st.sidebar.expander(texts["sidebar_llm_metrics_expander"]):
+            st.caption(texts["sidebar_llm_metrics_caption"])
+            st.dataframe(metricas, hide_index=True, use_container_width=True)
+
+def _colecao_no_formato_antigo(nome_colecao):
+    try:
+        return precisa_migrar(nome_colecao)
+    except (OSError, ValueError):
+        return False  # Manifesto ausente ou ilegível: carregar_colecao mostra o erro
+
+@st.fragment(run_every=1.0)
+def _acompanhar_ingestao(job_id, embeddings_global, texts):
+    """Mostra o progresso do job de ingestão e, ao terminar, ativa os documentos processados."""
+    job = estado_job(job_id)
+    if job is None:
+        _encerrar_ingestao()
+        st.rerun(scope="app")
+    if job["estado"] in ("pendente", "executando"):
+        etapa = texts[f"ingestion_stage_{job['etapa']}"]
+        st.progress(job["progresso"], text=texts["sidebar_ingestion_progress"].format(
+            etapa=etapa, concluidas=job["concluidas"], total=job["total"]
+        ))
+        return
+
+    st.session_state.erros_ingestao = [
+        texts["sidebar_ingestion_file_error"].format(arquivo=nome, erro=info["erro"])
+        for nome, info in job["arquivos"].items() if info["erro"]
+    ]
+    vs, nomes, textos = obter_resultado_job(job_id, embeddings_global) if job["estado"] == "concluido" else (None, [], {})
+    if hasattr(embeddings_global, "estatisticas"):
+        st.session_state.estatisticas_cache_embeddings = embeddings_global.estatisticas()
+    if vs:
+        invalidar_vector_store(st.session_state.get("vector_store_atual"))
+        st.session_state.vector_store_atual = vs
+        st.session_state.nomes_arquivos_atuais = nomes
+        st.session_state.arquivos_pdf_originais = nomes
+        st.session_state.colecao_atual = None
+        # Os mesmos arquivos geram o mesmo id, e as respostas já dadas sobre eles são reaproveitadas
+        st.session_state.id_colecao = "uploads:" + "|".join(sorted(t["hash"] for t in textos.values()))
+        registrar_textos_documentos(textos)
+        st.session_state.messages = [] # Limpa o chat
+        if "dados_extraidos" in st.session_state:
+             del st.session_state.dados_extraidos # Limpa dados do dashboard
+    else:
+        st.session_state.erros_ingestao.append(texts["sidebar_ingestion_failed"])
+    _encerrar_ingestao()
+    st.rerun(scope="app")
+
+def _encerrar_ingestao():
+    st.session_state.job_ingestao = None
+    if "job" in st.query_params:
+        del st.query_params["job"]
@@ -1,7 +1,10 @@
+import time
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
+from core.config import RETRIEVER_K, CACHE_SEMANTICO_LIMIAR, CACHE_SEMANTICO_TTL, CACHE_SEMANTICO_MAX_ITENS
+from core.llm_registry import obter_prompt
+from core.model_router import fabrica_de_llm
+from core.semantic_cache import obter_cache_semantico
+from services.chat import recuperar_contexto, responder_em_fluxo, MedidorLatencia
 
 def render_chat_tab(embeddings_global, google_api_key, texts, lang_code):
     """
@@ -20,38 +23,73 @@ def render_chat_tab(embeddings_global, google_api_key, texts, lang_code):
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
             if msg.get("sources"):
-                with st.expander(texts["chat_expander_sources"]):
-                    for doc in msg["sources"]:
-                        metadata = doc.metadata
-                        st.markdown(f"**{texts['chat_source_label']}** `{metadata.get('source', 'N/A')}` ({texts['chat_page_label']} {metadata.get('page', 'N/A')})")
-                        st.markdown(f"> {doc.page_content.strip()}")
-                        st.markdown("---")
+                _exibir_fontes(msg["sources"], texts)
+            if msg.get("metricas"):
+                st.caption(texts["chat_latency_caption"].format(**msg["metricas"]))
+            if msg.get("similaridade_cache"):
+                st.caption(texts["chat_semantic_cache_caption"].format(similaridade=msg["similaridade_cache"]))
 
     user_input = st.chat_input(texts["chat_input_placeholder"])
     if user_input:
         st.session_state.messages.append({"role": "user", "content": user_input})
         with st.chat_message("user"): st.markdown(user_input)
 
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.1)
-        retriever = st.session_state.vector_store_atual.as_retriever(search_kwargs={"k": 5})
+        # Cliente e prompt vêm do registro do processo: nada é recriado a cada pergunta
+        llm = fabrica_de_llm(0.1, google_api_key)
+        prompt = obter_prompt(texts["chat_prompt"], language=lang_code)
 
-        prompt_template_str = texts["chat_prompt"]
-        prompt = PromptTemplate.from_template(prompt_template_str)
-
-        chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever,
-            return_source_documents=True,
-            chain_type_kwargs={"prompt": prompt.partial(language=lang_code)}
-        )
+        cache = None
+        if st.session_state.get("id_colecao"):
+            cache = obter_cache_semantico(
+                st.session_state.id_colecao, lang_code,
+                CACHE_SEMANTICO_LIMIAR, CACHE_SEMANTICO_TTL, CACHE_SEMANTICO_MAX_ITENS
+            )
 
         with st.chat_message("assistant"):
-            with st.spinner(texts["chat_spinner_thinking"]):
-                try:
-                    result = chain.invoke({"query": user_input})
-                    st.session_state.messages.append({"role": "assistant", "content": result["result"], "sources": result["source_documents"]})
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"{texts['chat_error']} {e}")
+            inicio = time.perf_counter()
+            try:
+                # Pergunta equivalente a uma já respondida nesta coleção: sem busca nem chamada ao LLM
+                vetor_pergunta = embeddings_global.embed_query(user_input) if cache is not None else None
+                anterior = cache.buscar(vetor_pergunta) if cache is not None else None
+                if anterior:
+                    st.markdown(anterior["resposta"])
+                    _exibir_fontes(anterior["fontes"], texts)
+                    st.caption(texts["chat_semantic_cache_caption"].format(similaridade=anterior["similaridade"]))
+                    st.session_state.messages.append({
+                        "role": "assistant", "content": anterior["resposta"], "sources": anterior["fontes"],
+                        "similaridade_cache": anterior["similaridade"]
+                    })
+                    return
+
+                # As fontes aparecem assim que a busca termina, antes de a resposta começar
+                with st.spinner(texts["chat_spinner_thinking"]):
+                    fontes = recuperar_contexto(st.session_state.vector_store_atual, user_input, k=RETRIEVER_K)
+                _exibir_fontes(fontes, texts)
+
+                medidor = MedidorLatencia(
+                    responder_em_fluxo(llm, prompt, fontes, user_input), inicio
+                )
+                resposta = st.write_stream(medidor)
+                metricas = {"primeiro_token": medidor.primeiro_token, "total": medidor.total}
+                st.caption(texts["chat_latency_caption"].format(**metricas))
+
+                st.session_state.setdefault("metricas_chat", []).append({"pergunta": user_input, **metricas})
+                st.session_state.messages.append({"role": "assistant", "content": resposta, "sources": fontes, "metricas": metricas})
+                if cache is not None and resposta:
+                    cache.gravar(vetor_pergunta, user_input, resposta, fontes)
+            except Exception as e:
+                st.error(f"{texts['chat_error']} {e}")
 
+def _exibir_fontes(fontes, texts):
+    with st.expander(texts["chat_expander_sources"]):
+        for doc in fontes:
+            metadata = doc.metadata
+            st.markdown(f"**{texts['chat_source_label']}** `{metadata.get('source', 'N/A')}` ({texts['chat_page_label']} {metadata.get('page', 'N/A')})")
+            # Trecho repetido em outros documentos (guardado uma vez só na indexação)
+            outras = [r for r in metadata.get("referencias", []) if (r.get("source"), r.get("page")) != (metadata.get("source"), metadata.get("page"))]
+            if outras:
+                st.caption(texts["chat_also_in_label"].format(
+                    referencias=", ".join(f"{r.get('source')} ({texts['chat_page_label']} {r.get('page')})" for r in outras)
+                ))
+            st.markdown(f"> {doc.page_content.strip()}")
+            st.markdown("---")
@@ -1,17 +1,27 @@
 import streamlit as st
-from services.compliance import verificar_conformidade_documento
-import fitz
+import pandas as pd
+from services.compliance import verificar_conformidade_documento, verificar_conformidade_em_lote
+from services.document_texts import listar_documentos_com_texto, obter_texto_completo, obter_hash_documento
 
 def render_conformidade_tab(embeddings_global, google_api_key, texts, lang_code):
     st.header(texts["compliance_header"])
 
-    arquivos_carregados = st.session_state.get("arquivos_pdf_originais")
-    if not arquivos_carregados or len(arquivos_carregados) < 2:
+    nomes_arquivos = listar_documentos_com_texto()
+    if len(nomes_arquivos) < 2:
         st.info(texts["compliance_info_load_docs"])
         return
 
-    nomes_arquivos = [f.name for f in arquivos_carregados]
-    
+    modo_lote = st.radio(
+        texts["compliance_mode_label"],
+        options=[False, True],
+        format_func=lambda lote: texts["compliance_mode_batch"] if lote else texts["compliance_mode_single"],
+        horizontal=True,
+        key="compliance_mode"
+    )
+    if modo_lote:
+        _render_conformidade_em_lote(nomes_arquivos, embeddings_global, google_api_key, texts, lang_code)
+        return
+
     col1, col2 = st.columns(2)
     with col1:
         ref_nome = st.selectbox(texts["compliance_selectbox_ref"], options=nomes_arquivos, key="ref_select")
@@ -22,27 +32,57 @@ def render_conformidade_tab(embeddings_global, google_api_key, texts, lang_code)
     if ref_nome and doc_nome and ref_nome != doc_nome:
         if st.button(texts["compliance_button"], use_container_width=True):
             with st.spinner(texts["spinner_checking_compliance"]):
-                ref_obj = next((f for f in arquivos_carregados if f.name == ref_nome), None)
-                doc_obj = next((f for f in arquivos_carregados if f.name == doc_nome), None)
-
-                if ref_obj and doc_obj:
-                    def extrair_texto(arquivo_obj):
-                        try:
-                            arquivo_obj.seek(0)
-                            texto = ""
-                            with fitz.open(stream=arquivo_obj.read(), filetype="pdf") as doc:
-                                for page in doc:
-                                    texto += page.get_text() + "\n"
-                            return texto
-                        except Exception as e:
-                            st.error(texts["compliance_error_read"].format(filename=arquivo_obj.name, e=e))
-                            return ""
-                    
-                    ref_text, doc_text = extrair_texto(ref_obj), extrair_texto(doc_obj)
-                    
-                    if ref_text and doc_text:
-                        relatorio = verificar_conformidade_documento(ref_text, ref_nome, doc_text, doc_nome, google_api_key, lang_code)
-                        st.markdown(relatorio)
+                ref_text, doc_text = obter_texto_completo(ref_nome), obter_texto_completo(doc_nome)
+
+                if ref_text and doc_text:
+                    relatorio = verificar_conformidade_documento(ref_text, ref_nome, doc_text, doc_nome, google_api_key, lang_code, embeddings_global)
+                    st.markdown(relatorio)
     elif ref_nome and doc_nome and ref_nome == doc_nome:
         st.warning(texts["compliance_warning_same_doc"])
 
+def _render_conformidade_em_lote(nomes_arquivos, embeddings_global, google_api_key, texts, lang_code):
+    """Compara todos os documentos carregados com uma única referência, com a tabela sendo preenchida aos poucos."""
+    ref_nome = st.selectbox(texts["compliance_selectbox_ref"], options=nomes_arquivos, key="ref_select_lote")
+    if not ref_nome or not st.button(texts["compliance_batch_button"], use_container_width=True):
+        return
+
+    documentos = [
+        {"nome": nome, "texto": obter_texto_completo(nome), "hash": obter_hash_documento(nome)}
+        for nome in nomes_arquivos if nome != ref_nome
+    ]
+    colunas = [texts["compliance_batch_col_doc"], texts["compliance_batch_col_status"],
+               texts["compliance_batch_col_identical"], texts["compliance_batch_col_divergent"]]
+    linhas = {
+        doc["nome"]: [doc["nome"], texts["compliance_batch_status_pending"], None, None]
+        for doc in documentos
+    }
+    tabela = st.empty()
+    tabela.dataframe(pd.DataFrame(linhas.values(), columns=colunas), use_container_width=True)
+    barra = st.progress(0.0)
+
+    relatorios = {}
+    eventos = verificar_conformidade_em_lote(
+        obter_texto_completo(ref_nome), ref_nome, obter_hash_documento(ref_nome),
+        documentos, google_api_key, lang_code, embeddings_global
+    )
+    try:
+        for concluidos, (nome, resultado, do_cache) in enumerate(eventos, start=1):
+            if "erro" in resultado:
+                linhas[nome][1] = texts["compliance_batch_status_error"]
+                relatorios[nome] = f"Erro na análise de conformidade: {resultado['erro']}"
+            else:
+                linhas[nome][1:] = [
+                    texts["compliance_batch_status_cached"] if do_cache else texts["compliance_batch_status_done"],
+                    resultado["identicas"], resultado["divergentes"]
+                ]
+                relatorios[nome] = resultado["relatorio"]
+            tabela.dataframe(pd.DataFrame(linhas.values(), columns=colunas), use_container_width=True)
+            barra.progress(concluidos / len(documentos))
+    except Exception as e:
+        st.error(f"Erro na análise de conformidade: {e}")
+    barra.empty()
+
+    for doc in documentos:
+        if doc["nome"] in relatorios:
+            with st.expander(doc["nome"]):
+                st.markdown(relatorios[doc["nome"]])
@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 from services.extraction import extrair_dados_dos_contratos_dinamico
-import fitz
+from services.document_texts import listar_documentos_com_texto, obter_texto_completo
 
 def render_dashboard_tab(embeddings_global, google_api_key, texts, lang_code):
     """
@@ -16,24 +16,14 @@ def render_dashboard_tab(embeddings_global, google_api_key, texts, lang_code):
         return
 
     if st.button(texts["dashboard_button_generate"], use_container_width=True):
-        arquivos_carregados = st.session_state.get("arquivos_pdf_originais")
-        if not arquivos_carregados:
+        nomes_arquivos = listar_documentos_com_texto()
+        if not nomes_arquivos:
             st.warning(texts["dashboard_warning_no_files"])
             return
 
         with st.spinner(texts["dashboard_spinner_generating"]):
-            textos_completos_juntos = ""
-            for arquivo in arquivos_carregados:
-                try:
-                    arquivo.seek(0)
-                    pdf_bytes = arquivo.read()
-                    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                        for page in doc:
-                            textos_completos_juntos += page.get_text() + "\n"
-                        textos_completos_juntos += "\n\n---\n\n"
-                except Exception as e:
-                    st.error(texts["dashboard_error_read_file"].format(filename=arquivo.name, error=e))
-            
+            textos_completos_juntos = "\n\n---\n\n".join(obter_texto_completo(nome) for nome in nomes_arquivos)
+
             if textos_completos_juntos.strip():
                 dados = extrair_dados_dos_contratos_dinamico(
                     st.session_state.vector_store_atual,
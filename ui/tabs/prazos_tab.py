@@ -1,33 +1,25 @@
 import streamlit as st
 from services.events import extrair_eventos_dos_contratos
+from services.document_texts import listar_documentos_com_texto, obter_texto_completo
 import pandas as pd
-import fitz
 
 def render_prazos_tab(embeddings_global, google_api_key, texts, lang_code):
     st.header(texts["deadlines_header"])
 
-    arquivos_carregados = st.session_state.get("arquivos_pdf_originais")
-    if not arquivos_carregados:
+    nomes_arquivos = listar_documentos_com_texto()
+    if not nomes_arquivos:
         st.info(texts["deadlines_info_load_docs"])
         return
 
     if st.button(texts["deadlines_button"], use_container_width=True):
         documentos_com_texto = []
         with st.spinner(texts["spinner_extracting_deadlines"]):
-            for arquivo in arquivos_carregados:
-                try:
-                    arquivo.seek(0)
-                    pdf_bytes = arquivo.read()
-                    texto_completo = ""
-                    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                        for page in doc:
-                            texto_completo += page.get_text() + "\n"
-                    if texto_completo.strip():
-                        documentos_com_texto.append({"nome": arquivo.name, "texto": texto_completo})
-                    else:
-                        st.warning(texts["deadlines_warning_no_text"].format(filename=arquivo.name))
-                except Exception as e:
-                    st.error(texts["deadlines_error_read"].format(filename=arquivo.name, e=e))
+            for nome_arquivo in nomes_arquivos:
+                texto_completo = obter_texto_completo(nome_arquivo)
+                if texto_completo.strip():
+                    documentos_com_texto.append({"nome": nome_arquivo, "texto": texto_completo})
+                else:
+                    st.warning(texts["deadlines_warning_no_text"].format(filename=nome_arquivo))
 
             if documentos_com_texto:
                 eventos = extrair_eventos_dos_contratos(documentos_com_texto, google_api_key, lang_code)
@@ -1,15 +1,16 @@
 import streamlit as st
-from services.summarizer import gerar_resumo_executivo
+from services.summarizer import resumir_em_etapas
+from services.document_texts import listar_documentos_com_texto, obter_texto_completo, obter_hash_documento
+from ui.components import exibir_map_reduce_progressivo
 
 def render_resumo_tab(embeddings_global, google_api_key, texts, lang_code):
     st.header(texts["summary_header"])
 
-    arquivos_carregados = st.session_state.get("arquivos_pdf_originais")
-    if not arquivos_carregados:
+    nomes_arquivos = listar_documentos_com_texto()
+    if not nomes_arquivos:
         st.info(texts["summary_info_load_docs"])
         return
 
-    nomes_arquivos = [f.name for f in arquivos_carregados]
     arquivo_selecionado_nome = st.selectbox(
         texts["summary_selectbox_label"],
         options=nomes_arquivos,
@@ -18,11 +19,22 @@ def render_resumo_tab(embeddings_global, google_api_key, texts, lang_code):
     )
 
     if arquivo_selecionado_nome:
-        arquivo_obj = next((f for f in arquivos_carregados if f.name == arquivo_selecionado_nome), None)
-        if arquivo_obj:
-            if st.button(texts["summary_button"].format(filename=arquivo_selecionado_nome), use_container_width=True):
+        if st.button(texts["summary_button"].format(filename=arquivo_selecionado_nome), use_container_width=True):
+            # Resumos já gerados nesta sessão são reaproveitados sem nova chamada ao LLM
+            resumos = st.session_state.setdefault("resumos_gerados", {})
+            chave = (obter_hash_documento(arquivo_selecionado_nome), lang_code)
+            if chave not in resumos:
+                texto = obter_texto_completo(arquivo_selecionado_nome)
+                if not texto.strip():
+                    st.warning(texts["summary_warning_no_text"])
+                    return
                 with st.spinner(texts["spinner_generating_summary"]):
-                    arquivo_obj.seek(0)
-                    resumo = gerar_resumo_executivo(arquivo_obj.read(), arquivo_obj.name, google_api_key, lang_code)
-                st.markdown(resumo)
+                    try:
+                        resumos[chave] = exibir_map_reduce_progressivo(
+                            resumir_em_etapas(texto, google_api_key, lang_code), texts
+                        )
+                    except Exception as e:
+                        st.error(f"Erro no resumo: {e}")
+                        return
+            st.markdown(resumos[chave])
 
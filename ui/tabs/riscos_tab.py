@@ -1,16 +1,16 @@
 import streamlit as st
-from services.risks import analisar_documento_para_riscos
-import fitz
+from services.risks import analisar_riscos_em_etapas
+from services.document_texts import listar_documentos_com_texto, obter_texto_completo, obter_hash_documento
+from ui.components import exibir_map_reduce_progressivo
 
 def render_riscos_tab(embeddings_global, google_api_key, texts, lang_code):
     st.header(texts["risks_header"])
 
-    arquivos_carregados = st.session_state.get("arquivos_pdf_originais")
-    if not arquivos_carregados:
+    nomes_arquivos = listar_documentos_com_texto()
+    if not nomes_arquivos:
         st.info(texts["risks_info_load_docs"])
         return
 
-    nomes_arquivos = [f.name for f in arquivos_carregados]
     arquivo_selecionado_nome = st.selectbox(
         texts["risks_selectbox_label"],
         options=nomes_arquivos,
@@ -19,24 +19,22 @@ def render_riscos_tab(embeddings_global, google_api_key, texts, lang_code):
     )
     
     if arquivo_selecionado_nome:
-        arquivo_obj = next((f for f in arquivos_carregados if f.name == arquivo_selecionado_nome), None)
-        if arquivo_obj:
-            if st.button(texts["risks_button"].format(filename=arquivo_selecionado_nome), use_container_width=True):
+        if st.button(texts["risks_button"].format(filename=arquivo_selecionado_nome), use_container_width=True):
+            # Análises já feitas nesta sessão são reaproveitadas sem nova chamada ao LLM
+            relatorios = st.session_state.setdefault("relatorios_riscos", {})
+            chave = (obter_hash_documento(arquivo_selecionado_nome), lang_code)
+            if chave not in relatorios:
+                texto_completo = obter_texto_completo(arquivo_selecionado_nome)
+                if not texto_completo.strip():
+                    st.warning(texts["risks_warning_no_text"])
+                    return
                 with st.spinner(texts["spinner_analyzing_risks"]):
-                    texto_completo = ""
                     try:
-                        arquivo_obj.seek(0)
-                        pdf_bytes = arquivo_obj.read()
-                        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                            for page in doc:
-                                texto_completo += page.get_text() + "\n"
+                        relatorios[chave] = exibir_map_reduce_progressivo(
+                            analisar_riscos_em_etapas(texto_completo, arquivo_selecionado_nome, google_api_key, lang_code), texts
+                        )
                     except Exception as e:
-                        st.error(texts["risks_error_extract"].format(e=e))
+                        st.error(f"Erro na análise de riscos: {e}")
                         return
-
-                    if texto_completo.strip():
-                        relatorio = analisar_documento_para_riscos(texto_completo, arquivo_obj.name, google_api_key, lang_code)
-                        st.markdown(relatorio)
-                    else:
-                        st.warning(texts["risks_warning_no_text"])
+            st.markdown(relatorios[chave])
 